@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Fused per-entity aggregation: one factorize + bincount pass per key column.
+
+Tables are registered as pandas-style named aggregations
+(Name=(column, stat)); every table sharing a key is served from one
+partial state per key. Partial states hold only row counts and per-column
+non-null counts and sums (plus sums of squares where a std is wanted), so
+states computed on separate chunks, workers or days can be added together
+and finalized later.
+
+A cube registers several key columns together: one state over their
+observed combinations, from which every table keyed on one of them is
+rolled up, so those tables cost one pass between them and the cube itself
+can be sliced any other way later (store.py).
+"""
+import numpy as np
+import pandas as pd
+
+STATS = ('size', 'count', 'sum', 'mean', 'std')
+ROWS = '__rows'
+
+
+def _codes(key):
+    # categorical keys keep every category, so states from different chunks line up
+    if isinstance(key.dtype, pd.CategoricalDtype):
+        cats = key.cat.categories
+        index = pd.CategoricalIndex(cats, categories=cats, ordered=key.cat.ordered)
+        return key.cat.codes.to_numpy(), index.rename(key.name)
+    codes, uniques = pd.factorize(key, sort=True)
+    return codes, pd.Index(uniques, name=key.name)
+
+
+def _combinations(df, keys):
+    """Codes of the observed combinations of `keys` and their MultiIndex, sorted; a null is a label of its own."""
+    codes, levels = [], []
+    for key in keys:
+        c, index = _codes(df[key])
+        codes.append(np.where(c < 0, len(index), c))
+        levels.append(index)
+    radix = [len(index) + 1 for index in levels]
+    combos, inverse = np.unique(np.ravel_multi_index(codes, radix), return_inverse=True)
+    parts = np.unravel_index(combos, radix)
+    level_codes = [np.where(p == len(index), -1, p) for p, index in zip(parts, levels)]
+    return inverse.reshape(-1), pd.MultiIndex(levels=levels, codes=level_codes, names=list(keys))
+
+
+def partial(df, key, columns, squares=()):
+    """Mergeable state of `columns` grouped by `key` (rows with a null key are dropped).
+
+    A tuple `key` groups by the combinations of its columns (a cube), nulls included.
+    Sums of squares are only kept for the `squares` columns, the ones a std is asked of.
+    """
+    codes, index = _combinations(df, key) if isinstance(key, tuple) else _codes(df[key])
+    valid = codes >= 0
+    keep = None if valid.all() else valid
+    if keep is not None:
+        codes = codes[keep]
+    k = len(index)
+    rows = np.bincount(codes, minlength=k).astype(float)
+    state = {ROWS: rows}
+    for c in columns:
+        v = pd.to_numeric(df[c], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        if keep is not None:
+            v = v[keep]
+        ok = ~np.isnan(v)
+        if ok.all():
+            n, cv = rows, codes
+        else:
+            cv, v = codes[ok], v[ok]
+            n = np.bincount(cv, minlength=k).astype(float)
+        state[f'{c}|n'] = n
+        state[f'{c}|sum'] = np.bincount(cv, weights=v, minlength=k)
+        if c in squares:
+            state[f'{c}|sumsq'] = np.bincount(cv, weights=v * v, minlength=k)
+    return pd.DataFrame(state, index=index)
+
+
+def merge(states):
+    """Add partial states of the same key together."""
+    states = [s for s in states if s is not None]
+    if not states:
+        return None
+    # an empty chunk adds nothing, and its untyped key index would spoil the concat
+    states = [s for s in states if s[ROWS].sum() > 0] or states[:1]
+    if len(states) == 1:
+        return states[0]
+    levels = list(range(states[0].index.nlevels)) if states[0].index.nlevels > 1 else 0
+    return pd.concat(states).groupby(level=levels, sort=True, observed=True, dropna=False).sum()
+
+
+def rollup(state, key):
+    """The state of one key of a cube state, summed over the other keys (a null `key` is dropped)."""
+    level = state.index.get_level_values(key)
+    return state.groupby(level, sort=True, observed=False).sum().rename_axis(key)
+
+
+def finalize(state, spec, observed=True):
+    """Evaluate named aggregations {out: (column, stat)} against a partial state.
+
+    observed=False keeps categories no row fell into, as groupby(observed=False) does.
+    """
+    if observed:
+        state = state[state[ROWS] > 0]
+    out = {}
+    rows = state[ROWS]
+    for name, (col, stat) in spec.items():
+        if stat == 'size':
+            out[name] = rows
+            continue
+        n, s = state[f'{col}|n'], state[f'{col}|sum']
+        if stat == 'count':
+            out[name] = n
+        elif stat == 'sum':
+            out[name] = s
+        elif stat == 'mean':
+            out[name] = s / n.where(n > 0)
+        elif stat == 'std':
+            var = (state[f'{col}|sumsq'] - s * s / n.where(n > 0)) / (n - 1).where(n > 1)
+            out[name] = np.sqrt(var.clip(lower=0))
+        else:
+            raise ValueError(f'Unknown stat {stat!r}; expected one of {STATS}')
+    res = pd.DataFrame(out, index=state.index)
+    # counts come back as integers, like pandas' count/size
+    for name, (col, stat) in spec.items():
+        if stat in ('size', 'count'):
+            res[name] = res[name].astype('int64')
+    return res
+
+
+class Engine:
+    """Registry of per-key tables computed together.
+
+    >>> eng = Engine()
+    >>> eng.add('students', 'STUDENT ID', Attended=('IS_PRESENT', 'sum'), Att_Rate=('IS_PRESENT', 'mean'))
+    >>> tables = eng.run(df)          # {'students': DataFrame indexed by STUDENT ID}
+    """
+
+    def __init__(self):
+        self.tables, self.cubes = {}, []
+
+    def add(self, name, key, observed=True, **spec):
+        for col, stat in spec.values():
+            if stat not in STATS:
+                raise ValueError(f'Unknown stat {stat!r} for {name}; expected one of {STATS}')
+        self.tables[name] = (key, spec, observed)
+
+    def cube(self, *keys):
+        """Serve every table on one of `keys` from one state over their combinations."""
+        self.cubes.append(tuple(k for k in keys if k))
+
+    def source(self, key):
+        """The state key a table on `key` is finalized from: the cube holding it, else `key` itself."""
+        return next((c for c in self.cubes if key in c), key)
+
+    def columns(self):
+        """state key -> (value columns in first-seen order, columns needing squares) over every table it serves."""
+        need = {c: ([], set()) for c in self.cubes}
+        for key, spec, _ in self.tables.values():
+            cols, squares = need.setdefault(self.source(key), ([], set()))
+            for col, stat in spec.values():
+                if stat != 'size' and col not in cols:
+                    cols.append(col)
+                if stat == 'std':
+                    squares.add(col)
+        return need
+
+    def partials(self, df):
+        return {key: partial(df, key, cols, squares) for key, (cols, squares) in self.columns().items()}
+
+    def finalize(self, states):
+        def state(key):
+            src = self.source(key)
+            return states[key] if src == key else rollup(states[src], key)
+        return {name: finalize(state(key), spec, observed) for name, (key, spec, observed) in self.tables.items()}
+
+    def run(self, df):
+        return self.finalize(self.partials(df))
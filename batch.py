@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Batch inputs: many workbooks (one per centre per month) read concurrently into one Raw_data frame.
+
+    files = batch.paths('exports/2024-*.xlsx')      # or a directory of .xlsx
+    raw = batch.load(files, workers=4)             # each through its own ingest cache
+
+Every workbook goes through ingest.load_raw, so an unchanged file is read
+from its .ingest_cache/ Parquet instead of being parsed again. Frames are
+stacked in file order (sorted by name, so later months come last) and
+dedupe() drops sessions exported by more than one file, keeping the latest
+file's copy.
+"""
+import glob, os, time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import dates, ingest
+
+PATTERN = '*.xlsx'   # workbooks picked up from a directory
+
+
+def paths(spec):
+    """Workbooks named by `spec`: a directory, a glob or one path (a list of these also works), sorted and unique."""
+    specs = [spec] if isinstance(spec, str) else list(spec)
+    found = []
+    for s in specs:
+        found += glob.glob(os.path.join(s, PATTERN)) if os.path.isdir(s) else glob.glob(s)
+    # Excel's lock files (~$name.xlsx) aren't workbooks
+    found = sorted({os.path.abspath(p) for p in found if not os.path.basename(p).startswith('~$')})
+    if not found:
+        raise FileNotFoundError(f'No workbooks match {spec!r}')
+    return found
+
+
+def _load(xlsx):
+    return ingest.load_raw(xlsx, ingest.sheet_names(xlsx)[0])
+
+
+def load(files, workers=1):
+    """The first sheet of every workbook in `files`, stacked in order; rows keep their file in .attrs['files']."""
+    t0 = time.time()
+    workers = max(1, min(workers, len(files)))
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            frames = list(pool.map(_load, files))
+    else:
+        frames = [_load(f) for f in files]
+    for f, df in zip(files, frames):
+        print(f"  {os.path.basename(f)}: {len(df):,} rows", flush=True)
+    raw = pd.concat(frames, ignore_index=True)
+    raw.attrs['files'] = [(f, len(df)) for f, df in zip(files, frames)]
+    print(f"  {len(files)} workbooks, {len(raw):,} rows ({time.time() - t0:.1f}s)", flush=True)
+    return raw
+
+
+def dedupe(raw, keys, start=None):
+    """`raw` without sessions a later workbook exported again: for each `keys` value only the rows of
+    the last file holding it are kept (repeats within one file are that file's own data).
+
+    `start` is a datetime column among `keys`; it is compared parsed, so one
+    session exported in two layouts is still a duplicate."""
+    key = raw[keys]
+    if start:
+        key = key.assign(**{start: dates.parse(raw[start]).values})
+    sizes = [n for _, n in raw.attrs.get('files', [(None, len(raw))])]
+    file = pd.Series(np.repeat(np.arange(len(sizes)), sizes), index=raw.index)
+    dup = (file < file.groupby([key[c] for c in key.columns], dropna=False).transform('max')).to_numpy()
+    out = raw[~dup].reset_index(drop=True)
+    out.attrs = dict(raw.attrs, duplicates=int(dup.sum()))
+    print(f"  Sessions exported again by a later workbook, dropped: {dup.sum():,} (on {', '.join(keys)})", flush=True)
+    return out
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Benchmark: dates.parse vs pd.to_datetime on synthetic mixed-layout datetime columns.
+
+Usage: python bench_dates.py [rows]   (default 1,000,000)
+
+'inferred' is the old single call, whose format comes from the first value
+(other layouts become NaT); 'mixed' is pandas' per-element format='mixed'.
+Parity is checked against a row-wise strptime over synth's known layouts.
+"""
+import datetime, sys, time, warnings
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+import dates, synth
+
+COLUMNS = ['CLASS_START_DATETIME', 'ACTUAL_START_DATETIME']
+
+
+def ref_parse(s):
+    def one(v):
+        if not isinstance(v, str):
+            return v
+        for fmt in synth.DATETIME_FORMATS:
+            try:
+                return datetime.datetime.strptime(v, fmt)
+            except ValueError:
+                pass
+        return None
+    return pd.to_datetime(s.map(one), errors='coerce')
+
+
+def timed(fn, *args, **kw):
+    t = time.perf_counter()
+    out = fn(*args, **kw)
+    return out, time.perf_counter() - t
+
+
+def main(n):
+    warnings.filterwarnings('ignore')
+    raw = synth.raw_frame(n)
+    print(f"{n:,} rows")
+    print(f"{'column':<24}{'distinct':>9}{'method':>10}{'seconds':>9}{'NaT':>9}  parity")
+    ok = True
+    for col in COLUMNS:
+        s = raw[col]
+        ref = ref_parse(s)
+        dates._cache.clear()
+        cold, t_cold = timed(dates.parse, s)
+        warm, t_warm = timed(dates.parse, s)   # every string tried is cached per layout
+        first = next(v for v in s.dropna() if isinstance(v, str))
+        inferred, t_inf = timed(pd.to_datetime, s, errors='coerce', format=guess_datetime_format(first))
+        mixed, t_mix = timed(pd.to_datetime, s, errors='coerce', format='mixed', dayfirst=True)
+        for name, values, t in [('inferred', inferred, t_inf), ('mixed', mixed, t_mix),
+                                ('dates', cold.values, t_cold), ('cached', warm.values, t_warm)]:
+            match = values.equals(ref)
+            ok &= match or name in ('inferred', 'mixed')
+            print(f"{col if name == 'inferred' else '':<24}{s.nunique() if name == 'inferred' else '':>9}"
+                  f"{name:>10}{t:>9.2f}{values.isna().sum():>9,}  {'OK' if match else 'MISMATCH'}")
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000) else 1)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Benchmark: longitudinal.frame vs pandas groupby shift/rolling on synthetic sessions.
+
+Usage: python bench_longitudinal.py [rows] [students]   (default 1,000,000 rows, 20,000 students)
+
+The reference sorts the same way and uses groupby().shift / cumsum /
+rolling('28D') per feature; both sides are timed at a few sizes so the
+growth with history length shows.
+"""
+import sys, time
+import numpy as np
+import pandas as pd
+import longitudinal
+
+DAY = pd.Timedelta(days=1)
+
+
+def sessions(n, students, seed=0):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365 * 24 * 60, n), unit='min')
+    df = pd.DataFrame({'student': rng.integers(0, students, n), 'start': start,
+                       'present': (rng.random(n) < 0.6).astype(float),
+                       'score': np.round(rng.random(n) * 100, 1),
+                       'delay': rng.normal(5, 10, n).round()})
+    df.loc[rng.random(n) < 0.05, 'score'] = np.nan
+    df.loc[rng.random(n) < 0.01, 'start'] = pd.NaT
+    return df
+
+
+def reference(df):
+    d = df[df['start'].notna()].sort_values(['student', 'start'], kind='stable')
+    g = d.groupby('student', sort=False)
+    out = pd.DataFrame(index=d.index)
+    run = (d['present'] == 0).astype(int).groupby(d['student']).cumsum()
+    out['STREAK'] = d['present'].groupby([d['student'], run]).cumsum()
+    out['PRIOR_STREAK'] = out['STREAK'].groupby(d['student']).shift(fill_value=0)
+    w = f'{longitudinal.WINDOW_DAYS}D'
+    for name, col in [('ATT_4W', 'present'), ('SCORE_4W', 'score')]:
+        r = d.set_index('start').groupby('student', sort=False)[col].rolling(w, min_periods=1).mean()
+        out[name] = r.to_numpy()
+    out['PREV_DELAY'] = g['delay'].shift()
+    seen = d['start'].where(d['present'] == 1).groupby(d['student']).ffill()
+    out['DAYS_SINCE_ATTENDED'] = (d['start'] - seen.groupby(d['student']).shift()) / DAY
+    return out.reindex(df.index)
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def main(n, students):
+    ok = True
+    print(f"{'rows':>10}{'students':>10}{'reference':>11}{'vectorized':>12}  parity")
+    for rows in sorted({n // 4, n // 2, n}):
+        df = sessions(rows, students)
+        ref, t_ref = timed(reference, df)
+        got, t_vec = timed(longitudinal.frame, df['student'], df['start'], df['present'], df['score'], df['delay'])
+        match = np.allclose(got.to_numpy(), ref[longitudinal.COLUMNS].to_numpy(), equal_nan=True)
+        ok &= match
+        print(f"{rows:>10,}{students:>10,}{t_ref:>11.2f}{t_vec:>12.2f}  {'OK' if match else 'MISMATCH'}")
+    return ok
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:3]]
+    sys.exit(0 if main(*(args + [1_000_000, 20_000][len(args):])) else 1)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Benchmark: cleaning + analysis on 1..N worker processes vs the serial stages.
+
+Usage: python bench_parallel.py [rows] [max_workers]   (default 1,000,000 rows, all cores)
+
+A batch of two synthetic workbooks (pipeline.batch_run) is then written
+with one worker and with max_workers, and the two reports must match.
+
+On one core the workers take turns on it, so the times show the pool's
+overhead rather than any scaling; run it on the cores --workers would use.
+"""
+import contextlib, io, os, shutil, sys, tempfile, time
+import pandas as pd
+import dtypes, pipeline, schema, synth
+
+
+def serial(typed, S):
+    cleaned = pipeline.clean(typed, S)
+    return cleaned, pipeline.engine(S).run(pipeline.features(typed, cleaned, S))
+
+
+def same_tables(a, b):
+    """Student tables must match exactly; other keys may differ in the last bits of a sum."""
+    for name in a:
+        if name == 'students':
+            pd.testing.assert_frame_equal(a[name], b[name], check_exact=True)
+        else:
+            pd.testing.assert_frame_equal(a[name], b[name], check_exact=False, rtol=1e-9, check_index_type=False)
+
+
+def batch_parity(n, workers):
+    """Sheets that differ between batch reports over two `n`-row workbooks on 1 and `workers` processes."""
+    d = tempfile.mkdtemp()
+    reports = {}
+    try:
+        os.makedirs(os.path.join(d, 'in'))
+        for seed in range(2):
+            synth.write_workbook(os.path.join(d, 'in', f'{seed}.xlsx'), n, seed)
+        for w in sorted({1, workers}):
+            pipeline.WORKERS, out = w, os.path.join(d, f'report_{w}.xlsx')
+            with contextlib.redirect_stdout(io.StringIO()):
+                pipeline.batch_run(os.path.join(d, 'in'), out, report_to=os.path.join(d, f'run_{w}.json'))
+            reports[w] = pd.read_excel(out, sheet_name=None)
+    finally:
+        pipeline.WORKERS = 1
+        shutil.rmtree(d, ignore_errors=True)
+    a, b = reports[1], reports[workers]
+    bad = [name for name in a.keys() ^ b.keys()]
+    for name in a.keys() & b.keys():
+        try:
+            pd.testing.assert_frame_equal(a[name], b[name], check_exact=False, rtol=1e-9)
+        except AssertionError:
+            bad.append(name)
+    return sorted(bad)
+
+
+def main(n, max_workers):
+    raw = synth.raw_frame(n)
+    S = schema.resolve(raw.columns)
+    typed = dtypes.optimize(raw, S)
+    with contextlib.redirect_stdout(io.StringIO()):
+        t = time.perf_counter()
+        ref_clean, ref_tables = serial(typed, S)
+        t_serial = time.perf_counter() - t
+    print(f"{n:,} rows, {os.cpu_count()} cores")
+    if os.cpu_count() == 1:
+        print("one core: workers share it, so this measures pool overhead, not scaling")
+    print(f"{'workers':<9}{'seconds':>9}{'speedup':>9}  parity")
+    print(f"{'serial':<9}{t_serial:>9.2f}{1:>8.1f}x  -")
+    ok, w = True, 1
+    while w <= max_workers:
+        with contextlib.redirect_stdout(io.StringIO()):
+            t = time.perf_counter()
+            cleaned, tables = pipeline.parallel_clean(typed, S, w)
+            dt = time.perf_counter() - t
+        try:
+            pd.testing.assert_frame_equal(cleaned, ref_clean, check_exact=True)
+            same_tables(ref_tables, tables)
+            match = True
+        except AssertionError:
+            match = False
+        ok &= match
+        print(f"{w:<9}{dt:>9.2f}{t_serial / dt:>8.1f}x  {'OK' if match else 'MISMATCH'}")
+        w = w * 2 if w * 2 <= max_workers or w == max_workers else max_workers
+    rows = min(n, 5_000)
+    bad = batch_parity(rows, max_workers)
+    ok &= not bad
+    print(f"batch of 2 x {rows:,} rows, 1 vs {max_workers} workers: {'MISMATCH ' + ', '.join(bad) if bad else 'OK'}")
+    return ok
+
+
+if __name__ == '__main__':
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    cores = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    sys.exit(0 if main(rows, cores) else 1)
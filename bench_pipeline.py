@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Benchmark: the pipeline end to end on synthetic workbooks, stage by stage.
+
+Usage: python bench_pipeline.py [rows ...] [--seed S] [--save out.json] [--baseline old.json]
+       (default 10,000 100,000 1,000,000 rows)
+
+Each size runs in a fresh process on a cold cache and times read, clean,
+transform, analyze and write, with the peak RSS reached by the end of each.
+Workbooks are generated once per size and seed into bench_data/ and reused.
+--save writes the results as JSON; --baseline compares against an earlier
+file and exits non-zero if a stage got more than --tolerance slower.
+"""
+import argparse, contextlib, datetime, io, json, os, platform, resource, shutil, subprocess, sys, tempfile, time
+import pandas as pd
+import ingest, pipeline, synth, xlsx_writer
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_data')
+STAGES = ('read', 'clean', 'transform', 'analyze', 'write')
+MIN_DELTA = 0.05   # seconds; slower by less than this is noise, whatever the ratio
+
+
+def workbook(n, seed=0):
+    path = os.path.join(DATA_DIR, f'synth_{n}_{seed}.xlsx')
+    if not os.path.exists(path):
+        os.makedirs(DATA_DIR, exist_ok=True)
+        print(f"  generating {path}...", flush=True)
+        synth.write_workbook(path, n, seed)
+    return path
+
+
+def peak_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # ru_maxrss is in KiB on Linux
+
+
+def run_stages(src):
+    """{'seconds': {stage: s}, 'peak_mb': {stage: MB}} for one cold run on a copy of `src`."""
+    tmp = tempfile.mkdtemp()
+    xlsx = os.path.join(tmp, os.path.basename(src))
+    shutil.copy(src, xlsx)
+    seconds, peak, v = {}, {}, {}
+
+    def read():
+        v['raw'] = ingest.load_raw(xlsx, ingest.sheet_names(xlsx)[0])
+        v['S'] = pipeline.resolve_schema(v['raw'])
+        v['info'] = pipeline.profile(v['raw'])
+
+    def clean():
+        v['typed'] = pipeline.typed(v['raw'], v['S'])
+        v['clean'] = pipeline.clean(v['typed'], v['S'])
+        v['info']['dq'] = pipeline.dq(v['clean'])
+
+    def transform():
+        v['df'] = pipeline.transform(v['clean'], v['S'])
+
+    def analyze():
+        rows = pipeline.features(v['typed'], v['clean'], v['S'])
+        v['results'] = pipeline.analysis(rows, v['S'])
+        v['results'].update(pipeline.trends(rows, pipeline.history(rows, v['S'])))
+
+    def write():
+        xlsx_writer.save(pipeline.export(xlsx, v['info'], v['df'], v['results']), xlsx)
+
+    try:
+        for name, fn in zip(STAGES, (read, clean, transform, analyze, write)):
+            t = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                fn()
+            seconds[name] = round(time.perf_counter() - t, 3)
+            peak[name] = round(peak_mb(), 1)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return {'seconds': seconds, 'peak_mb': peak}
+
+
+def measure(n, seed):
+    """run_stages in a child process, so every size starts from an empty heap."""
+    path = workbook(n, seed)
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', path],
+                         capture_output=True, text=True, check=True).stdout
+    res = json.loads(out.strip().splitlines()[-1])
+    res['seconds']['total'] = round(sum(res['seconds'].values()), 3)
+    res['peak_mb']['total'] = max(res['peak_mb'].values())
+    return res
+
+
+def git_rev():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def report(results, baseline=None, tolerance=0.2):
+    """Print one table per size; returns the number of stages slower than the baseline allows."""
+    slower = 0
+    for n, res in results['runs'].items():
+        old = (baseline or {}).get('runs', {}).get(n)
+        print(f"\n{int(n):,} rows")
+        print(f"{'stage':<11}{'seconds':>9}{'peak MB':>9}" + (f"{'baseline':>10}{'ratio':>7}" if old else ''))
+        for stage in STAGES + ('total',):
+            s = res['seconds'][stage]
+            line = f"{stage:<11}{s:>9.2f}{res['peak_mb'][stage]:>9.0f}"
+            if old and stage in old['seconds']:
+                b = old['seconds'][stage]
+                ratio = s / b if b else float('inf')
+                flag = stage != 'total' and ratio > 1 + tolerance and s - b > MIN_DELTA
+                slower += flag
+                line += f"{b:>10.2f}{ratio:>6.2f}x" + ('  SLOWER' if flag else '')
+            print(line)
+    return slower
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('rows', nargs='*', type=int, default=[10_000, 100_000, 1_000_000])
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--save', help='write the results to this JSON file')
+    ap.add_argument('--baseline', help='earlier --save output to compare against')
+    ap.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown per stage (default 0.2 = 20%%)')
+    ap.add_argument('--child', help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    if args.child:
+        print(json.dumps(run_stages(args.child)))
+        return 0
+
+    results = {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'git': git_rev(),
+               'python': platform.python_version(), 'pandas': pd.__version__,
+               'machine': f'{platform.system()} {platform.machine()}', 'cpus': os.cpu_count(),
+               'seed': args.seed, 'runs': {}}
+    for n in args.rows:
+        print(f"Running {n:,} rows...", flush=True)
+        results['runs'][str(n)] = measure(n, args.seed)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    slower = report(results, baseline, args.tolerance)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(f"\nSaved to {args.save}")
+    return 1 if slower else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""Benchmark: the DATA_QUALITY profile (profiling.scan + report) vs the cleaning step it summarises.
+
+Usage: python bench_profiling.py [rows]   (default 1,000,000)
+
+Both run on the same synthetic Raw_data (synth.raw_frame), typed as the
+pipeline has it, at a few sizes. The typed stage, shown too, codes the
+datetime columns once for both of them.
+Parity: the profile's rule counts must equal the ones clean() counts while
+fixing, and the profile of four chunks merged must equal the whole one's.
+"""
+import contextlib, io, sys, time
+import numpy as np
+import dates, pipeline, profiling, schema, synth
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def main(n):
+    ok = True
+    print(f"{'rows':>10}{'typed':>8}{'clean':>8}{'profile':>9}{'ratio':>7}  parity")
+    for rows in sorted({n // 4, n // 2, n}):
+        raw = synth.raw_frame(rows)
+        S = schema.resolve(raw.columns)
+        with contextlib.redirect_stdout(io.StringIO()):
+            typed, t_typed = timed(pipeline.typed, raw, S)
+            dates._cache.clear()   # a run's cleaning starts cold, not from the smaller sizes' strings
+            cleaned, t_clean = timed(pipeline.clean, typed, S)
+        prof, t_prof = timed(lambda: profiling.report(profiling.scan(typed, S, dtypes=raw.dtypes)))
+        parts = [profiling.scan(raw.iloc[i].reset_index(drop=True), S, mergeable=True)
+                 for i in np.array_split(np.arange(rows), 4)]
+        merged = profiling.report(profiling.merge(parts))
+        match = (prof['dq'] == cleaned.attrs['rules'] and merged['dq'] == prof['dq']
+                 and all(merged[k].equals(prof[k]) for k in ('layouts', 'encodings'))
+                 and merged['columns']['Dtype'].equals(prof['columns']['Dtype']))
+        ok &= match
+        print(f"{rows:>10,}{t_typed:>8.2f}{t_clean:>8.2f}{t_prof:>9.2f}{t_prof / t_clean:>7.2f}  {'OK' if match else 'MISMATCH'}")
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000) else 1)
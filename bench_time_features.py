@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Benchmark: vectorized time features vs the row-wise lambdas they replaced.
+
+Usage: python bench_time_features.py [rows]   (default 1,000,000)
+"""
+import sys, time
+import numpy as np
+import pandas as pd
+import aggregate, time_features
+
+# --- reference implementations, as previously written in the scripts ---
+def ref_week(dt):
+    wk = dt.dt.day.apply(lambda d: f'W{min((d-1)//7+1, 4)}' if pd.notna(d) else None)
+    # with any NaT the day column is float and the lambda printed 'W1.0'..'W3.0' next to 'W4';
+    # the vectorized version always emits W1..W4, so compare on the intended labels
+    return wk.str.replace(r'\.0$', '', regex=True)
+
+def ref_day(dt):
+    return dt.dt.day_name()
+
+def ref_hour_bucket(dt):
+    return dt.dt.hour.apply(
+        lambda h: 'Morning' if h < 12 else ('Afternoon' if h < 17 else 'Evening') if pd.notna(h) else None)
+
+def ref_on_time(band, keys):
+    return band.groupby(keys).apply(lambda x: (x == 'On Time').sum() / len(x) * 100).round(1)
+
+def on_time_pct(band, keys):
+    # as the pipeline has it: an ON_TIME flag per row, averaged per teacher by the aggregate engine
+    eng = aggregate.Engine()
+    eng.add('teachers', 'key', OnTime_Pct=('ON_TIME', 'mean'))
+    df = pd.DataFrame({'key': keys, 'ON_TIME': (band == 'On Time').astype(float)})
+    return (eng.run(df)['teachers']['OnTime_Pct'] * 100).round(1)
+
+
+def timed(fn, *args):
+    t = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - t
+
+
+def same(a, b):
+    a = a.astype(object).where(a.notna(), None)
+    b = b.astype(object).where(b.notna(), None)
+    return a.equals(b)
+
+
+def main(n):
+    rng = np.random.default_rng(0)
+    start = pd.Timestamp('2024-01-01')
+    dt = pd.Series(start + pd.to_timedelta(rng.integers(0, 90 * 24 * 60, n), unit='min'))
+    dt[rng.random(n) < 0.05] = pd.NaT                      # unparseable datetimes
+    delay = pd.Series(rng.normal(6, 10, n)).where(rng.random(n) > 0.05)
+    teachers = pd.Series(rng.integers(0, 500, n)).map('Teacher {}'.format)
+
+    band = time_features.punctuality(delay)
+    cases = [
+        ('week_of_month', ref_week, time_features.week_of_month, (dt,)),
+        ('day_of_week', ref_day, time_features.day_of_week, (dt,)),
+        ('hour_bucket', ref_hour_bucket, time_features.hour_bucket, (dt,)),
+        ('on_time_pct', ref_on_time, on_time_pct, (band, teachers)),
+    ]
+    print(f"{n:,} rows")
+    print(f"{'feature':<15}{'row-wise s':>12}{'vectorized s':>14}{'speedup':>9}  parity")
+    ok = True
+    for name, ref, new, args in cases:
+        a, ta = timed(ref, *args)
+        b, tb = timed(new, *args)
+        match = same(a, b)
+        ok &= match
+        print(f"{name:<15}{ta:>12.3f}{tb:>14.3f}{ta / tb:>8.1f}x  {'OK' if match else 'MISMATCH'}")
+    return ok
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000) else 1)
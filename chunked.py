@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Out-of-core helpers: a frame kept on disk as parts and read back one part at a time"""
+import os, shutil
+import pandas as pd
+
+
+class Spool:
+    """Frame parts pickled under `path` in arrival order.
+
+    Iterating yields the parts, passed through `fn`, one at a time. len(),
+    `columns`, `dtypes` and `shape` describe the frame the parts add up to
+    (the column side from the first part), so a Spool can stand in for
+    that frame wherever it is only streamed: xlsx_writer's split sheets,
+    sidecars and link sheet.
+    """
+
+    def __init__(self, path, fn=None):
+        self.path, self.fn = path, fn
+        self.parts, self.rows = [], 0
+        self._head = None
+
+    @classmethod
+    def create(cls, path):
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return cls(path)
+
+    def append(self, df):
+        part = os.path.join(self.path, f'part-{len(self.parts):05d}.pkl')
+        df.to_pickle(part)
+        self.parts.append(part)
+        self.rows += len(df)
+
+    def map(self, fn):
+        """The same parts, each passed through `fn` as it is read."""
+        view = Spool(self.path, fn)
+        view.parts, view.rows = self.parts, self.rows
+        return view
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        for part in self.parts:
+            df = pd.read_pickle(part)
+            yield df if self.fn is None else self.fn(df)
+
+    @property
+    def head(self):
+        if self._head is None:
+            self._head = next(iter(self)).head(0) if self.parts else pd.DataFrame()
+        return self._head
+
+    @property
+    def columns(self):
+        return self.head.columns
+
+    @property
+    def dtypes(self):
+        return self.head.dtypes
+
+    @property
+    def shape(self):
+        return (self.rows, len(self.columns))
+
+    def remove(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Datetime parsing for mixed-layout columns: every layout detected once and parsed with an explicit format.
+
+    p = dates.parse(df['CLASS_START_DATETIME'])
+    p.values    # datetime64[ns] Series
+    p.layouts   # ['%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M', None, ...], most frequent first
+    p.codes     # per row: index into p.layouts, BLANK or UNPARSED
+
+A column is factorized, so each distinct value is parsed once however often
+it repeats. The strings are parsed one layout at a time with a vectorized
+pd.to_datetime(format=...): the layouts passed in first, then the ones
+detect() finds in what is left. What a string reads as under a layout
+(or that it doesn't fit it) is cached per layout, so earlier calls (other
+chunks) answer for the strings they tried, whatever column or workbook
+they came from. Native datetimes (Excel date cells) are the layout None.
+"""
+import warnings
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+MAX_LAYOUTS = 8        # text layouts detected per column; anything left after them is unparseable
+SAMPLE = 200           # distinct leftover strings candidate layouts are scored on
+GUESSES = 12           # of those, strings a layout is guessed from
+CACHE_MAX = 500_000    # distinct strings remembered across calls, per layout
+NAT_STRINGS = {'', 'NaT', 'nat', 'NAT', 'nan', 'NaN', 'NAN'}   # text pandas reads as a missing datetime
+BLANK, UNPARSED = -1, -2   # codes of missing and unparseable values
+NAT = np.iinfo(np.int64).min
+
+Parsed = namedtuple('Parsed', 'values layouts codes')
+_cache = {}   # layout -> {string: datetime64[ns] as int64, NAT when it doesn't fit the layout}
+
+
+def _ns(values):
+    return pd.DatetimeIndex(values).as_unit('ns').asi8
+
+
+def _guess(strings):
+    """The format, of those guessed from `strings` day-first or not, that parses most of them."""
+    best, hits = None, 0
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        candidates = dict.fromkeys(guess_datetime_format(s, dayfirst=d) for d in (False, True)
+                                    for s in strings[::max(len(strings) // GUESSES, 1)])
+    for fmt in filter(None, candidates):
+        n = pd.to_datetime(strings, format=fmt, errors='coerce').notna().sum()
+        if n > hits:
+            best, hits = fmt, n
+    return best
+
+
+def _formatted(strings, fmt):
+    """pd.to_datetime(strings, format=fmt) as int64 (NAT where a string doesn't fit), through the cache."""
+    memo = _cache.setdefault(fmt, {})
+    hits = [memo.get(u) for u in strings]
+    miss = np.fromiter((h is None for h in hits), dtype=bool, count=len(strings))
+    out = np.fromiter((NAT if h is None else h for h in hits), dtype=np.int64, count=len(strings))
+    if miss.any():
+        out[miss] = _ns(pd.to_datetime(strings[miss], format=fmt, errors='coerce'))
+        if len(memo) > CACHE_MAX:
+            memo.clear()
+        memo.update(zip(strings[miss], out[miss].tolist()))
+    return out
+
+
+def _index(layouts, layout):
+    if layout not in layouts:
+        layouts.append(layout)
+    return layouts.index(layout)
+
+
+def _parse(s, layouts):
+    codes, uniques = pd.factorize(s)
+    uniques = np.asarray(uniques, dtype=object)
+    ns = np.full(len(uniques), NAT, dtype=np.int64)
+    lay = np.full(len(uniques), UNPARSED, dtype=np.int8)
+    text = np.fromiter((isinstance(u, str) for u in uniques), dtype=bool, count=len(uniques))
+    blank = text & pd.Series(uniques).isin(NAT_STRINGS).to_numpy()
+    lay[blank] = BLANK
+
+    native = np.flatnonzero(~text)
+    if len(native):
+        got = _ns(pd.to_datetime(pd.Series(uniques[native]), errors='coerce'))
+        ok = got != NAT
+        if ok.any():
+            ns[native[ok]], lay[native[ok]] = got[ok], _index(layouts, None)
+
+    todo = np.flatnonzero(text & ~blank)
+
+    def apply(fmt):
+        nonlocal todo
+        got = _formatted(uniques[todo], fmt)
+        ok = got != NAT
+        ns[todo[ok]], lay[todo[ok]] = got[ok], _index(layouts, fmt)
+        todo = todo[~ok]
+        return ok.any()
+
+    for fmt in [f for f in layouts if f is not None]:
+        if len(todo):
+            apply(fmt)
+    for _ in range(MAX_LAYOUTS):
+        if not len(todo):
+            break
+        sample = uniques[todo[np.unique(np.linspace(0, len(todo) - 1, SAMPLE).astype(int))]]
+        fmt = _guess(sample)
+        if fmt is None or not apply(fmt):
+            break
+
+    values = np.append(ns, NAT)[codes].view('M8[ns]')   # code -1 (null) picks up the trailing NaT
+    row_codes = np.append(lay, np.int8(BLANK))[codes]
+    return pd.Series(values, index=s.index, name=s.name), row_codes
+
+
+def parse(s, layouts=None):
+    """Parsed values, layouts and per-row layout codes of `s`.
+
+    With `layouts` (e.g. from detect() on the whole column) those are tried
+    first and keep their codes, so slices of a column parse alike; without,
+    layouts are numbered most frequent first."""
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return Parsed(s, [None], np.where(s.notna().to_numpy(), 0, BLANK).astype(np.int8))
+    order = list(layouts or [])
+    values, codes = _parse(s, order)
+    if layouts is None and len(order) > 1:
+        counts = np.bincount(codes[codes >= 0], minlength=len(order))
+        rank = np.argsort(-counts, kind='stable')
+        remap = np.empty(len(order), dtype=np.int8)
+        remap[rank] = np.arange(len(order))
+        codes = np.where(codes >= 0, remap[np.maximum(codes, 0)], codes).astype(np.int8)
+        order = [order[i] for i in rank]
+    return Parsed(values, order, codes)
+
+
+def detect(s):
+    """The layouts of `s`, most frequent first: strftime formats, or None for native datetimes."""
+    return parse(s).layouts
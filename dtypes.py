@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""Load-time typing: narrow integers, categorical labels and a per-column memory report"""
+import numpy as np
+import pandas as pd
+
+# roles whose columns are labels to group by or compare, never numbers to compute with
+CATEGORY_ROLES = ('student', 'teacher', 'exam', 'grade', 'class_id', 'cancel', 'attendance')
+CATEGORY_MAX_RATIO = 0.5   # any other object column is categorical if at most this share of its values is distinct
+
+
+def downcast(s):
+    """Integers in the narrowest width that holds every value.
+
+    Floats stay float64: scores, rates and ratings feed rounded derived
+    values, and float32 arithmetic would move their .x5 roundings."""
+    if pd.api.types.is_integer_dtype(s.dtype) and not pd.api.types.is_bool_dtype(s.dtype):
+        return pd.to_numeric(s, downcast='integer')   # signed, so differences can't wrap around
+    return s
+
+
+def categorical(s):
+    return s if isinstance(s.dtype, pd.CategoricalDtype) else s.astype('category')
+
+
+def coded(s):
+    """`s` as a categorical of its values in order of first appearance: one hash pass and no sort,
+    which mixed text and datetime cells wouldn't survive."""
+    codes, uniques = pd.factorize(s)
+    return pd.Series(pd.Categorical.from_codes(codes, uniques), index=s.index, name=s.name)
+
+
+def optimize(df, S):
+    """`df` with label roles and low-cardinality text as categoricals and integers narrowed.
+
+    Datetime role columns are coded() as they come, so cleaning (dates.parse)
+    and the quality profile both start from their codes instead of hashing
+    every cell again."""
+    role = S['roles']
+    labels = {role[r] for r in CATEGORY_ROLES if role.get(r)}
+    datetimes = {c for r, c in role.items() if c and r in ('class_start', 'class_end', 'actual_start', 'actual_end')}
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c in labels:
+            s = categorical(s)
+        elif c in datetimes and s.dtype == object:
+            s = coded(s)
+        elif s.dtype == object and c not in datetimes and s.nunique() <= CATEGORY_MAX_RATIO * len(s):
+            s = categorical(s)
+        else:
+            s = downcast(s)
+        out[c] = s
+    return pd.DataFrame(out, index=df.index)
+
+
+def memory_report(before, after):
+    """Per-column dtype and deep memory use before and after, largest saving first, plus a total row."""
+    mb = lambda df: df.memory_usage(deep=True, index=False) / 2**20
+    rep = pd.DataFrame({'dtype_before': before.dtypes.astype(str), 'dtype_after': after.dtypes.astype(str),
+                        'MB_before': mb(before), 'MB_after': mb(after)})
+    rep = rep.loc[(rep['MB_before'] - rep['MB_after']).sort_values(ascending=False).index]
+    rep.loc['TOTAL'] = ['', '', rep['MB_before'].sum(), rep['MB_after'].sum()]
+    rep['Saved_%'] = (100 * (1 - rep['MB_after'] / rep['MB_before'].replace(0, np.nan))).round(1)
+    return rep.round({'MB_before': 2, 'MB_after': 2})
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Incremental analysis: keep the aggregation state on disk and fold in only new sessions.
+
+The saved state is the aggregate.Engine partial state per key (row counts,
+non-null counts and sums) of each engine, plus the carry of the students'
+histories (longitudinal.fold), stamped with the number of Raw_data rows it
+covers, a hash of those rows, the registered tables, a key of the code that
+folded it and the datetime layouts the rows were parsed with. A run only
+cleans and aggregates the rows appended after them, parsed with the same
+layouts. Any change to the tables, the code or the already processed rows
+falls back to a full rebuild.
+
+Reading Raw_data and checking the processed rows still touch every row;
+only what comes after (cleaning, features, folding) is limited to the new ones.
+"""
+import hashlib, json, os
+import numpy as np
+import pandas as pd
+import aggregate, ingest
+
+
+def _paths(xlsx):
+    d = ingest.cache_dir(xlsx)
+    stem = os.path.splitext(os.path.basename(xlsx))[0]
+    return os.path.join(d, f'{stem}.state.pkl'), os.path.join(d, f'{stem}.state.json')
+
+
+def spec_key(engine):
+    """Changes whenever a registered table does, so stale state is rebuilt."""
+    return hashlib.sha1(repr((sorted(engine.tables.items()), engine.cubes)).encode()).hexdigest()[:12]
+
+
+def fingerprint(raw, rows):
+    """Hash of the first `rows` raw rows, every value of them."""
+    if rows == 0 or len(raw) < rows:
+        return None
+    return hashlib.sha1(pd.util.hash_pandas_object(raw.iloc[:rows], index=False).to_numpy().tobytes()).hexdigest()
+
+
+class Incremental:
+    """Saved state of `engines` ({name: aggregate.Engine}) for `xlsx`, checked against the freshly
+    loaded `raw` frame and `code` (a key of the code folding it).
+
+    Build it on the loaded Raw_data, take the rows pending() selects, clean
+    them with `formats` (None after a rebuild: detect them) and call update()
+    with their rows for each engine and the history carry to get the
+    finalized tables. reset() drops the saved state, for a rebuild.
+    """
+
+    def __init__(self, xlsx, engines, raw, code=''):
+        self.xlsx, self.engines = xlsx, engines
+        self.rows, self.fingerprint = len(raw), fingerprint(raw, len(raw))
+        self.spec = {'code': code, **{name: spec_key(e) for name, e in engines.items()}}
+        self.reset()
+        state_path, meta_path = _paths(xlsx)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            saved = pd.read_pickle(state_path)
+        except (OSError, ValueError):
+            print("  Incremental: no saved state, full rebuild", flush=True)
+            return
+        if meta.get('spec') != self.spec:
+            print("  Incremental: registered tables or code changed, full rebuild", flush=True)
+        elif meta['rows'] > len(raw) or meta.get('fingerprint') != fingerprint(raw, meta['rows']):
+            print("  Incremental: processed rows changed, full rebuild", flush=True)
+        else:
+            self.states, self.carry, self.meta, self.formats = saved['states'], saved['carry'], meta, meta['formats']
+
+    def reset(self):
+        self.states, self.carry, self.meta, self.formats = None, None, None, None
+
+    def pending(self):
+        """Mask of rows not folded into the saved state yet: the ones appended after it."""
+        done = self.meta['rows'] if self.meta else 0
+        mask = np.arange(self.rows) >= done
+        print(f"  Incremental: {mask.sum():,} rows appended after the {done:,} processed", flush=True)
+        return mask
+
+    def update(self, rows, formats, carry=None):
+        """Fold the new rows, cleaned with `formats`, into the state (`rows`: {engine name: its rows
+        of them}), save it with `carry` (the history carry after them) and finalize every table,
+        as {engine name: tables}."""
+        old = self.states or {}
+        states = {}
+        for name, eng in self.engines.items():
+            saved = old.get(name, {})
+            states[name] = {key: aggregate.merge([saved.get(key), state]) for key, state in eng.partials(rows[name]).items()}
+        state_path, meta_path = _paths(self.xlsx)
+        os.makedirs(os.path.dirname(state_path), exist_ok=True)
+        pd.to_pickle({'states': states, 'carry': carry}, ingest.tmp_path(state_path))
+        os.replace(ingest.tmp_path(state_path), state_path)
+        ingest.write_json(meta_path, {'spec': self.spec, 'rows': self.rows, 'fingerprint': self.fingerprint,
+                                      'formats': formats})
+        return {name: eng.finalize(states[name]) for name, eng in self.engines.items()}
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Raw_data ingest: parse the workbook once, then reuse a typed columnar cache"""
+import hashlib, itertools, json, os
+import pandas as pd
+from openpyxl import load_workbook
+
+try:
+    import pyarrow  # noqa: F401
+    CACHE_FMT = 'parquet'
+except ImportError:
+    CACHE_FMT = 'pkl'
+
+CACHE_DIR = '.ingest_cache'
+# infer_dtype results that Parquet/Arrow can store as a single typed column
+TYPED_KINDS = {'string', 'empty', 'boolean', 'integer', 'floating', 'decimal',
+               'datetime', 'datetime64', 'date', 'time', 'timedelta', 'bytes'}
+
+
+def tmp_path(path):
+    """Temp name for writing `path` before an os.replace; per process, so concurrent runs never share one."""
+    return f'{path}.{os.getpid()}.tmp'
+
+
+def write_json(path, obj):
+    tmp = tmp_path(path)
+    with open(tmp, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def cache_dir(xlsx):
+    return os.path.join(os.path.dirname(os.path.abspath(xlsx)), CACHE_DIR)
+
+
+def _cache_paths(xlsx, sheet):
+    d = cache_dir(xlsx)
+    stem = f"{os.path.splitext(os.path.basename(xlsx))[0]}.{sheet}"
+    return d, os.path.join(d, f'{stem}.{CACHE_FMT}'), os.path.join(d, f'{stem}.json')
+
+
+def mixed_columns(df):
+    """Object columns Excel filled with more than one type (e.g. 1 and 'Present')."""
+    return [c for c in df.columns
+            if df[c].dtype == object and pd.api.types.infer_dtype(df[c], skipna=True) not in TYPED_KINDS]
+
+
+def _mixed_path(data_path):
+    return os.path.splitext(data_path)[0] + '.mixed.pkl'
+
+
+def _write_cache(df, data_path):
+    """Typed columns go to Parquet; mixed-type object columns can't be one
+    Arrow type, so they are pickled alongside with their values untouched."""
+    mixed = mixed_columns(df) if CACHE_FMT == 'parquet' else []
+    if CACHE_FMT == 'parquet':
+        df.drop(columns=mixed).to_parquet(tmp_path(data_path), index=False)
+    else:
+        df.to_pickle(tmp_path(data_path))
+    if mixed:
+        df[mixed].to_pickle(tmp_path(_mixed_path(data_path)))
+        os.replace(tmp_path(_mixed_path(data_path)), _mixed_path(data_path))
+    os.replace(tmp_path(data_path), data_path)
+    return mixed
+
+
+def _read_cache(data_path, meta):
+    if CACHE_FMT != 'parquet':
+        return pd.read_pickle(data_path)
+    df = pd.read_parquet(data_path)
+    if meta.get('mixed'):
+        df = pd.concat([df, pd.read_pickle(_mixed_path(data_path))], axis=1)
+    return df[meta['columns']]
+
+
+def content_hash(path, block=1 << 20):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def frame_hash(df):
+    """Content hash of a parsed sheet, independent of the workbook bytes around it."""
+    h = hashlib.sha1(json.dumps([str(c) for c in df.columns]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _fresh_meta(xlsx, sheet):
+    """Cache metadata if it still describes `xlsx`, else None.
+
+    size+mtime is the fast path; on mismatch the content hash decides, so a
+    touched or copied file with identical bytes still hits the cache."""
+    _, data_path, meta_path = _cache_paths(xlsx, sheet)
+    meta = _read_meta(meta_path)
+    if not meta or meta.get('format') != CACHE_FMT or not os.path.exists(data_path):
+        return None
+    st = os.stat(xlsx)
+    if meta['size'] == st.st_size and meta['mtime_ns'] == st.st_mtime_ns:
+        return meta
+    if meta['size'] != st.st_size or meta['sha1'] != content_hash(xlsx):
+        return None
+    meta['mtime_ns'] = st.st_mtime_ns
+    write_json(meta_path, meta)
+    return meta
+
+
+def _cached_metas(xlsx):
+    d, _, _ = _cache_paths(xlsx, '')
+    stem = os.path.splitext(os.path.basename(xlsx))[0] + '.'
+    if not os.path.isdir(d):
+        return []
+    return [os.path.join(d, f) for f in sorted(os.listdir(d)) if f.startswith(stem) and f.endswith('.json')]
+
+
+def sheet_names(xlsx):
+    for meta_path in _cached_metas(xlsx):
+        meta = _read_meta(meta_path)
+        if meta and 'sheet' in meta and _fresh_meta(xlsx, meta['sheet']):
+            return meta['sheet_names']
+    return pd.ExcelFile(xlsx).sheet_names
+
+
+def mark_fresh(xlsx, sheet='Raw_data', sheet_names=None):
+    """Re-stamp the cache after we saved `xlsx` ourselves.
+
+    The scripts only append derived sheets, so `sheet` is unchanged and the
+    cached frame stays valid for the new file bytes."""
+    _, data_path, meta_path = _cache_paths(xlsx, sheet)
+    meta = _read_meta(meta_path)
+    if not meta or not os.path.exists(data_path):
+        return
+    st = os.stat(xlsx)
+    meta.update(size=st.st_size, mtime_ns=st.st_mtime_ns, sha1=content_hash(xlsx))
+    if sheet_names is not None:
+        meta['sheet_names'] = list(sheet_names)
+    write_json(meta_path, meta)
+
+
+def load_raw(xlsx, sheet='Raw_data'):
+    """Return `sheet` of `xlsx` as a DataFrame, from cache when the source is unchanged.
+
+    `sheet` is a name or a 0-based index, as for pd.read_excel."""
+    meta = _fresh_meta(xlsx, sheet)
+    _, data_path, meta_path = _cache_paths(xlsx, sheet)
+    if meta:
+        print(f"  Ingest cache hit: {data_path}", flush=True)
+        return _read_cache(data_path, meta)
+
+    print(f"  Ingest cache miss, parsing {sheet!r} from Excel...", flush=True)
+    xl = pd.ExcelFile(xlsx)
+    df = xl.parse(sheet)
+    df.columns = [str(c) for c in df.columns]
+    os.makedirs(os.path.dirname(data_path), exist_ok=True)
+    mixed = _write_cache(df, data_path)
+    st = os.stat(xlsx)
+    write_json(meta_path, {'sheet': sheet, 'sheet_names': xl.sheet_names, 'format': CACHE_FMT,
+                           'columns': list(df.columns), 'mixed': mixed, 'frame_sha1': frame_hash(df),
+                           'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'sha1': content_hash(xlsx)})
+    return df
+
+
+def frame_key(xlsx, sheet='Raw_data'):
+    """frame_hash of `sheet`, read from the cache metadata when it is fresh.
+
+    Unlike the file hash it survives our own saves and edits to other sheets,
+    so it can key work derived from the sheet's contents."""
+    meta = _fresh_meta(xlsx, sheet)
+    if meta and 'frame_sha1' in meta:
+        return meta['frame_sha1']
+    df = load_raw(xlsx, sheet)
+    _, _, meta_path = _cache_paths(xlsx, sheet)
+    meta = _read_meta(meta_path)
+    if 'frame_sha1' not in meta:   # cache written before frame hashes were recorded
+        meta['frame_sha1'] = frame_hash(df)
+        write_json(meta_path, meta)
+    return meta['frame_sha1']
+
+
+def iter_raw(xlsx, sheet='Raw_data', rows=100_000):
+    """Yield `sheet` as DataFrames of at most `rows` rows, never the whole sheet at once.
+
+    Streams row batches of the Parquet cache when it is fresh (and holds no
+    mixed columns, which are pickled whole), else the workbook itself through
+    openpyxl's read-only mode; nothing is cached on the way. At least one,
+    possibly empty, frame is yielded so the header is always seen."""
+    meta = _fresh_meta(xlsx, sheet)
+    _, data_path, _ = _cache_paths(xlsx, sheet)
+    if meta and CACHE_FMT == 'parquet' and not meta.get('mixed'):
+        import pyarrow.parquet as pq
+        print(f"  Ingest cache hit: {data_path}, streaming {rows:,}-row batches", flush=True)
+        pf = pq.ParquetFile(data_path)
+        yielded = False
+        for batch in pf.iter_batches(batch_size=rows):
+            yielded = True
+            yield batch.to_pandas()
+        if not yielded:
+            yield pf.schema_arrow.empty_table().to_pandas()
+        return
+
+    print(f"  Streaming {sheet!r} from Excel, {rows:,} rows at a time...", flush=True)
+    wb = load_workbook(xlsx, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet] if isinstance(sheet, str) else wb.worksheets[sheet]
+        it = ws.iter_rows(values_only=True)
+        header = [f'Unnamed: {i}' if c is None else str(c) for i, c in enumerate(next(it, ()))]
+        yielded = False
+        while True:
+            block = list(itertools.islice(it, rows))
+            if not block:
+                break
+            # blank rows are dropped, as pd.read_excel does
+            block = [r[:len(header)] for r in block if any(v is not None for v in r)]
+            yielded = True
+            yield pd.DataFrame.from_records(block, columns=header).infer_objects()
+        if not yielded:
+            yield pd.DataFrame(columns=header)
+    finally:
+        wb.close()
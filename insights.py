@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""EXECUTIVE_SUMMARY text computed from the analysis results, never from the rows again.
+
+    sections = insights.summary(results)   # [(header, [(title, detail), ...]), ...]
+
+Each ANALYSIS_* frame an insight reads carries its unrounded engine table
+in .attrs['stats'] (per group counts, means and, where asked for, stds),
+so every figure, effect size and p-value here comes from stored counts and
+sums. Rates are compared with a two-proportion z-test and Cohen's h, means
+with a Welch z-test and Cohen's d; groups are large enough for the normal
+approximation. An insight whose table is missing or empty is left out.
+"""
+import math
+import numpy as np
+
+ALPHA = 0.05                    # p-value below which a difference is called significant
+EFFECTS = [(0.2, 'negligible'), (0.5, 'small'), (0.8, 'medium'), (math.inf, 'large')]   # |d| or |h| upper bounds
+LOW_ATTENDANCE = 0.5            # students below this attendance rate get an alert
+TARGET_ON_TIME, TARGET_CANCEL = 0.95, 0.03
+
+
+def _p(z):
+    return math.erfc(abs(z) / math.sqrt(2))
+
+
+def rates(p1, n1, p2, n2):
+    """(Cohen's h, two-sided p) of rate p1 over n1 trials against p2 over n2."""
+    pooled = (p1 * n1 + p2 * n2) / (n1 + n2)
+    se = math.sqrt(pooled * (1 - pooled) * (1 / n1 + 1 / n2))
+    h = 2 * math.asin(math.sqrt(p1)) - 2 * math.asin(math.sqrt(p2))
+    return h, _p((p1 - p2) / se) if se > 0 else 1.0
+
+
+def means(m1, s1, n1, m2, s2, n2):
+    """(Cohen's d, two-sided p) of mean m1 (std s1, n1 values) against m2 (s2, n2)."""
+    se = math.sqrt(s1 ** 2 / n1 + s2 ** 2 / n2)
+    sd = math.sqrt(((n1 - 1) * s1 ** 2 + (n2 - 1) * s2 ** 2) / max(n1 + n2 - 2, 1))
+    return (m1 - m2) / sd if sd > 0 else 0.0, _p((m1 - m2) / se) if se > 0 else 1.0
+
+
+def pool(n, mean, std):
+    """(n, mean, std) of several groups taken together."""
+    n, mean, std = (np.asarray(x, dtype=float) for x in (n, mean, std))
+    ok = n > 0
+    n, mean, std = n[ok], mean[ok], np.nan_to_num(std[ok])
+    total = n.sum()
+    if total == 0:
+        return 0, math.nan, math.nan
+    m = (n * mean).sum() / total
+    ss = ((n - 1) * std ** 2 + n * (mean - m) ** 2).sum()
+    return total, m, math.sqrt(ss / (total - 1)) if total > 1 else 0.0
+
+
+def evidence(effect, p, symbol):
+    if math.isnan(effect):
+        return '(effect not measurable)'
+    size = next(word for bound, word in EFFECTS if abs(effect) < bound)
+    verdict = 'significant' if p < ALPHA else 'could be chance'
+    return f'({size} effect, {symbol}={abs(effect):.2f}; {verdict}, p={p:.2g})'
+
+
+def _more(a, b, unit=''):
+    """'x higher' / 'x lower' of a against b, relative when unit is '' else in points."""
+    if unit:
+        diff = a - b
+    else:
+        diff = (a / b - 1) * 100 if b else math.nan
+        unit = '%'
+    return f"{abs(diff):.1f}{unit} {'higher' if diff >= 0 else 'lower'}"
+
+
+def _stats(results, name):
+    t = results.get(name)
+    s = None if t is None else t.attrs.get('stats')
+    return None if s is None or len(s) == 0 else s
+
+
+def _attendance(results):
+    s = _stats(results, 'AttendVsScores')
+    if s is None:
+        return None
+    hi, lo = s.iloc[-1:], s.iloc[:2]   # 75-100% vs under 50%
+    n1, m1, s1 = pool(hi['n'], hi['mean'], hi['std'])
+    n2, m2, s2 = pool(lo['n'], lo['mean'], lo['std'])
+    if not (n1 and n2):
+        return None
+    d, p = means(m1, s1, n1, m2, s2, n2)
+    return ('Attendance and performance',
+            f'Students with >75% attendance average {m1:.1f}% in classwork, {_more(m1, m2)} than students '
+            f'under 50% attendance ({m2:.1f}%; {int(n1)} vs {int(n2)} students) {evidence(d, p, "d")}.')
+
+
+def _both(s, n):
+    """True when `s` has an 'On Time' and a 'Very Late' group, both with some `n`."""
+    return s is not None and all(g in s.index and s.loc[g, n] > 0 for g in ('On Time', 'Very Late'))
+
+
+def _punctuality(results):
+    s, c = _stats(results, 'PunctualityVsRating'), _stats(results, 'DelayCarryover')
+    if not _both(s, '_Rating_N'):
+        return None
+    on, late = s.loc['On Time'], s.loc['Very Late']
+    d, p = means(on['Avg_Rating'], on['_Rating_Std'], on['_Rating_N'],
+                 late['Avg_Rating'], late['_Rating_Std'], late['_Rating_N'])
+    text = (f'Classes starting within 5 min are rated {on["Avg_Rating"]:.2f}/5 vs {late["Avg_Rating"]:.2f} '
+            f'when over 15 min late {evidence(d, p, "d")}.')
+    if _both(c, 'Classes'):
+        on, late = c.loc['On Time'], c.loc['Very Late']
+        h, p = rates(late['Att_Rate'], late['Classes'], on['Att_Rate'], on['Classes'])
+        text += (f" A student's next class after a >15 min delay is attended {late['Att_Rate']:.1%} of the time "
+                 f"vs {on['Att_Rate']:.1%} after an on-time class {evidence(h, p, 'h')}.")
+    return 'Teacher punctuality, ratings and next-class attendance', text
+
+
+def _time_of_day(results):
+    s = _stats(results, 'TimeAttendance')
+    if s is None or len(s) < 2:
+        return None
+    s = s[s['_N'] > 0]
+    worst = s['Att_Rate'].idxmin()
+    rest = s.drop(index=worst)
+    p_rest = (rest['Att_Rate'] * rest['_N']).sum() / rest['_N'].sum()
+    h, p = rates(s.loc[worst, 'Att_Rate'], s.loc[worst, '_N'], p_rest, rest['_N'].sum())
+    return (f'{worst} classes have the lowest attendance',
+            f'{worst} attendance is {s.loc[worst, "Att_Rate"]:.1%} vs {p_rest:.1%} for other times of day, '
+            f'{_more(s.loc[worst, "Att_Rate"], p_rest)} {evidence(h, p, "h")}; average engagement '
+            f'{s.loc[worst, "Avg_Engagement"]:.1f} vs {(rest["Avg_Engagement"] * rest["_N"]).sum() / rest["_N"].sum():.1f}.')
+
+
+def _exams(results):
+    s = _stats(results, 'ExamInsights')
+    if s is None or len(s) < 2:
+        return None
+    best, worst = s['Avg_Engagement'].idxmax(), s['Avg_Engagement'].idxmin()
+    b, w = s.loc[best], s.loc[worst]
+    d, p = means(b['Avg_Engagement'], b['_Engagement_Std'], b['_Engagement_N'],
+                 w['Avg_Engagement'], w['_Engagement_Std'], w['_Engagement_N'])
+    return (f'{best} batch has the highest engagement',
+            f'{best} averages {b["Avg_Engagement"]:.1f} engagement ({b["HW_Submit_Rate"]:.0%} homework submission, '
+            f'{b["Avg_CW_Score"]:.1f}% classwork) vs {w["Avg_Engagement"]:.1f} for {worst}, the lowest '
+            f'({w["HW_Submit_Rate"]:.0%}, {w["Avg_CW_Score"]:.1f}%) {evidence(d, p, "d")}.')
+
+
+def _submission(results):
+    s = _stats(results, 'SubmitVsScore')
+    if s is None or not (s['_CW_Score_N'].iloc[[0, -1]] > 1).all():
+        return None
+    lo, hi = s.iloc[0], s.iloc[-1]
+    d, p = means(hi['Avg_CW_Score'], hi['_CW_Score_Std'], hi['_CW_Score_N'],
+                 lo['Avg_CW_Score'], lo['_CW_Score_Std'], lo['_CW_Score_N'])
+    return ('Submission and scores',
+            f'Sessions with {s.index[-1]} of assignments submitted score {hi["Avg_CW_Score"]:.1f}% in classwork, '
+            f'{_more(hi["Avg_CW_Score"], lo["Avg_CW_Score"])} than those with {s.index[0]} '
+            f'({lo["Avg_CW_Score"]:.1f}%) {evidence(d, p, "d")}.')
+
+
+def _operations(results):
+    items = []
+    e = _stats(results, 'ExamInsights')
+    if e is not None and '_Cancel_Rate' in e:
+        rate = (e['_Cancel_Rate'] * e['_Rows']).sum() / e['_Rows'].sum()
+        worst = e['_Cancel_Rate'].idxmax()
+        items.append(('Class cancellations',
+                      f'{rate:.1%} of sessions were cancelled ({int(round(rate * e["_Rows"].sum())):,} of '
+                      f'{int(e["_Rows"].sum()):,}), highest in {worst} ({e.loc[worst, "_Cancel_Rate"]:.1%}).'))
+    t, s = results.get('TeacherPerformance'), _stats(results, 'PunctualityVsRating')
+    if t is not None and s is not None and s['Count'].sum():
+        late = 1 - s.loc['On Time', 'Count'] / s['Count'].sum() if 'On Time' in s.index else math.nan
+        habitual = int((t['OnTime_Pct'] < 50).sum())
+        items.append(('Teacher lateness',
+                      f'{late:.1%} of classes start more than 5 min late; {habitual} of {len(t)} teachers are on time '
+                      f'in under half their classes (average delay {t["Avg_Delay_Mins"].mean():.1f} min).'))
+    if e is not None:
+        low = e.sort_values('HW_Submit_Rate').iloc[:2]
+        items.append(('Homework submission',
+                      f'Lowest homework submission: {" and ".join(f"{x} {r:.0%}" for x, r in low["HW_Submit_Rate"].items())} '
+                      f'(all batches {(e["HW_Submit_Rate"] * e["Total_Sessions"]).sum() / e["Total_Sessions"].sum():.0%}).'))
+    return items
+
+
+def _student_actions(results):
+    items = []
+    s = _stats(results, 'StudentBehaviour')
+    if s is not None:
+        low = int((s['Att_Rate'] < LOW_ATTENDANCE).sum())
+        items.append(('Attendance intervention alerts',
+                      f'Alert the {low:,} students below {LOW_ATTENDANCE:.0%} attendance, with mentor follow-up '
+                      'within a week of the drop.'))
+    e = _stats(results, 'ExamInsights')
+    if e is not None:
+        low = list(e.sort_values('HW_Submit_Rate').index[:2])
+        items.append(('Gamify homework submission',
+                      f'Leaderboards, streaks and rewards for consistent submission, starting with {" and ".join(map(str, low))}.'))
+    t = _stats(results, 'TimeAttendance')
+    d = _stats(results, 'DayAttendance')
+    if t is not None and d is not None:
+        items.append(('Reschedule low-attendance slots',
+                      f'Move key sessions out of {t["Att_Rate"].idxmin()} and {d["Att_Rate"].idxmin()} slots, the '
+                      f'lowest-attended ({t["Att_Rate"].min():.1%} and {d["Att_Rate"].min():.1%}).'))
+    return items
+
+
+def _teacher_actions(results):
+    items = []
+    s = _stats(results, 'PunctualityVsRating')
+    if s is not None and 'On Time' in s.index and s['Count'].sum():
+        items.append(('Teacher punctuality scorecard',
+                      f'Monthly punctuality scorecards: {s.loc["On Time", "Count"] / s["Count"].sum():.1%} of classes start '
+                      f'on time today; make {TARGET_ON_TIME:.0%} a KPI.'))
+    top, bottom = results.get('Top10Teachers'), results.get('Bottom10Teachers')
+    if top is not None and bottom is not None and len(top) and len(bottom):
+        items.append(('Coach bottom-10 teachers',
+                      f'Bottom 10 average a teacher score of {bottom["Teacher_Score"].mean():.1f} vs '
+                      f'{top["Teacher_Score"].mean():.1f} for the top 10; pair them with top performers.'))
+    e = _stats(results, 'ExamInsights')
+    if e is not None and '_Cancel_Rate' in e:
+        rate = (e['_Cancel_Rate'] * e['_Rows']).sum() / e['_Rows'].sum()
+        items.append(('Reduce cancellations',
+                      f'48-hour notice and auto-assigned substitutes, taking cancellations from {rate:.1%} '
+                      f'to under {TARGET_CANCEL:.0%}.'))
+    return items
+
+
+def summary(results):
+    """[(section header, [(title, detail)])] of the EXECUTIVE_SUMMARY sheet, items numbered."""
+    keys = [f(results) for f in (_attendance, _punctuality, _time_of_day, _exams, _submission)]
+    sections = [
+        ('🔍 5 KEY INSIGHTS', [k for k in keys if k]),
+        ('⚠️ 3 MAJOR OPERATIONS PROBLEMS', _operations(results)),
+        ('📈 3 STUDENT LEARNING RECOMMENDATIONS', _student_actions(results)),
+        ('🎓 3 TEACHER PERFORMANCE RECOMMENDATIONS', _teacher_actions(results)),
+    ]
+    return [(header, [(f'{i}. {title}', detail) for i, (title, detail) in enumerate(items, 1)])
+            for header, items in sections]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Run instrumentation: wall time, CPU time, rows and peak memory per span, saved as a JSON run report.
+
+    with instrument.span('clean', title="\\n=== CLEANING ===") as sp:
+        df = ...
+        sp['rows'] = len(df)
+
+Spans nest; a span's name is its path ('analysis/4.1 Student behaviour').
+A span prints its title on entry and its timings on exit, in place of
+bare progress lines. Peak memory is the RSS high-water mark while the span
+was open: on Linux it is reset at every span entry, so each span gets its
+own peak; elsewhere it is the process high-water mark so far.
+
+PROFILE and TRACEMALLOC name one span path each to run under cProfile
+(stats saved next to the report) or tracemalloc (top allocation sites put
+in the report).
+"""
+import cProfile, datetime, json, os, platform, pstats, resource, sys, time, tracemalloc
+from contextlib import contextmanager
+
+PROFILE = None       # span path, e.g. 'clean' or 'analysis/4.2 Teacher performance'
+TRACEMALLOC = None   # span path
+TRACE_TOP = 15       # allocation sites kept per traced span
+
+_CLEAR_REFS = '/proc/self/clear_refs'
+_spans, _open, _start = [], [], {}
+
+
+def reset():
+    """Start a new run report: forget closed spans and restart the run clocks."""
+    _spans.clear()
+    _start.update(wall=time.perf_counter(), cpu=time.process_time(),
+                  date=datetime.datetime.now().isoformat(timespec='seconds'))
+
+
+reset()
+
+
+def _hwm_mb():
+    """RSS high-water mark in MB (since the last reset where that is possible)."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # KiB on Linux, bytes on macOS
+
+
+def _reset_hwm():
+    try:
+        with open(_CLEAR_REFS, 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _carry_peak():
+    """Fold the current high-water mark into every open span before it is reset."""
+    mb = _hwm_mb()
+    for rec in _open:
+        rec['peak_rss_mb'] = max(rec['peak_rss_mb'], mb)
+
+
+@contextmanager
+def span(name, title=None, rows=None):
+    """Time and measure the enclosed block; yields its record so `rows` can be filled in."""
+    path = f"{_open[-1]['name']}/{name}" if _open else name
+    if title:
+        print(title, flush=True)
+    _carry_peak()
+    _reset_hwm()
+    rec = {'name': path, 'start_s': round(time.perf_counter() - _start['wall'], 3), 'rows': rows,
+           'peak_rss_mb': 0.0}
+    _open.append(rec)
+    prof = cProfile.Profile() if path == PROFILE else None
+    traced = path == TRACEMALLOC and not tracemalloc.is_tracing()
+    if traced:
+        tracemalloc.start()
+    wall, cpu = time.perf_counter(), time.process_time()
+    if prof:
+        prof.enable()
+    try:
+        yield rec
+    finally:
+        if prof:
+            prof.disable()
+        rec['wall_s'] = round(time.perf_counter() - wall, 4)
+        rec['cpu_s'] = round(time.process_time() - cpu, 4)
+        _carry_peak()
+        _open.pop()
+        rec['peak_rss_mb'] = round(rec['peak_rss_mb'], 1)
+        if prof:
+            rec['profile'] = prof
+        if traced:
+            snap = tracemalloc.take_snapshot()
+            rec['tracemalloc'] = {
+                'peak_mb': round(tracemalloc.get_traced_memory()[1] / 2**20, 1),
+                'top': [{'site': str(s.traceback), 'mb': round(s.size / 2**20, 2), 'count': s.count}
+                        for s in snap.statistics('lineno')[:TRACE_TOP]]}
+            tracemalloc.stop()
+        _spans.append(rec)
+        rows = f", {rec['rows']:,} rows" if rec['rows'] is not None else ''
+        print(f"  [{path}] {rec['wall_s']:.2f}s wall, {rec['cpu_s']:.2f}s cpu{rows}, "
+              f"peak {rec['peak_rss_mb']:.0f} MB", flush=True)
+
+
+def report(**extra):
+    """The run so far as a JSON-ready dict: totals plus every closed span, in start order."""
+    spans = sorted(({k: v for k, v in r.items() if k != 'profile'} for r in _spans), key=lambda r: r['start_s'])
+    return {'date': _start['date'], 'argv': sys.argv, 'python': platform.python_version(),
+            'wall_s': round(time.perf_counter() - _start['wall'], 3),
+            'cpu_s': round(time.process_time() - _start['cpu'], 3),
+            'peak_rss_mb': round(max([r['peak_rss_mb'] for r in _spans] + [_hwm_mb()]), 1),
+            **extra, 'spans': spans}
+
+
+def save(path, **extra):
+    """Write report() to `path`, and the cProfile stats of the PROFILE span to `path` minus .json plus .prof."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(report(**extra), f, indent=1, default=str)
+    for rec in _spans:
+        if 'profile' in rec:
+            prof_path = os.path.splitext(path)[0] + '.prof'
+            rec['profile'].dump_stats(prof_path)
+            print(f"\ncProfile of [{rec['name']}] saved to {prof_path}; top functions:", flush=True)
+            pstats.Stats(rec['profile']).sort_stats('cumulative').print_stats(20)
+    print(f"Run report: {path}", flush=True)
+    return path
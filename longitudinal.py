@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Per-student history features, from one sort of the sessions by (student, class start).
+
+    hist = longitudinal.frame(rows['STUDENT ID'], rows['CLASS_START_DATETIME'],
+                              rows['IS_PRESENT'], rows['CW_SCORE_PCT'], rows['TEACHER_IS_LATE_BY_MINS'])
+
+Every feature is a prefix sum, a running maximum or a shift over the
+sorted arrays, with student boundaries as resets, and the trailing
+windows are two searchsorted bounds on a (student, seconds) key, so after
+the sort the cost is a fixed number of passes however long a history is.
+Rows without a student or a class start get NaN.
+
+fold() also returns a carry: per student the classes of the last
+WINDOW_DAYS, the streak going into them and when they last attended.
+Passing it to the next fold() continues every history from there, so
+appended sessions (incremental.py) are placed without their history.
+"""
+import numpy as np
+import pandas as pd
+
+WINDOW_DAYS = 28   # trailing window of ATT_4W / SCORE_4W, this class included
+COLUMNS = ['STREAK', 'PRIOR_STREAK', 'ATT_4W', 'SCORE_4W', 'PREV_DELAY', 'DAYS_SINCE_ATTENDED']
+DAY = 86_400
+NAT = np.iinfo(np.int64).min
+
+
+def _seconds(start):
+    t = np.asarray(start, dtype='datetime64[ns]').view(np.int64)
+    return np.where(t == NAT, NAT, t // 10**9)
+
+
+def order(student, sec):
+    """Positions of the rows with a student and a start, sorted by (student, start), ties in row order;
+    plus the student codes and start seconds of those positions, and the students by code."""
+    codes, uniques = pd.factorize(student)
+    ok = np.flatnonzero((codes >= 0) & (sec != NAT))
+    perm = np.lexsort((sec[ok], codes[ok]))
+    return ok[perm], codes[ok][perm], sec[ok][perm], np.asarray(uniques, dtype=object)
+
+
+def _window_sum(x, lo):
+    # sum of x[lo[i]..i] for every i
+    c = np.concatenate([[0.0], np.cumsum(x)])
+    return c[1:] - c[lo]
+
+
+def _floats(values, n):
+    return np.full(n, np.nan) if values is None else np.asarray(pd.to_numeric(values, errors='coerce'), dtype=float)
+
+
+def late(carry, student, start):
+    """Rows starting before their student's last class in `carry`: fold() can't place them after it."""
+    if carry is None:
+        return 0
+    last = carry['window'].groupby('student')['sec'].max()
+    before = pd.Series(np.asarray(student, dtype=object)).map(last).to_numpy(dtype=float)
+    sec = _seconds(start)
+    return int(((sec != NAT) & (sec < before)).sum())
+
+
+def frame(student, start, present, score=None, delay=None):
+    """COLUMNS for every row, indexed like `student`.
+
+    STREAK: classes attended in a row up to and including this one;
+    PRIOR_STREAK: the same before it. ATT_4W / SCORE_4W: attendance rate
+    and mean score over the student's classes in the trailing WINDOW_DAYS.
+    PREV_DELAY: teacher delay of the student's previous class.
+    DAYS_SINCE_ATTENDED: since the last earlier class attended."""
+    return fold(student, start, present, score, delay)[0]
+
+
+def fold(student, start, present, score=None, delay=None, carry=None):
+    """frame() of these rows after the rows `carry` was folded from (None: no earlier rows), and
+    the carry after them. No row may start before its student's last carried class (late())."""
+    n = len(student)
+    w = carry['window'] if carry is not None else pd.DataFrame(
+        {'student': pd.Series(dtype=object), 'sec': pd.Series(dtype=np.int64),
+         **{c: pd.Series(dtype=float) for c in ('present', 'score', 'delay')}})
+    m = len(w)
+    # carried rows go first, so on a tie in class start they come before the new ones, as in sheet order
+    keys = np.concatenate([w['student'].to_numpy(dtype=object), np.asarray(student, dtype=object)]) if m else student
+    pos, g, sec, students = order(keys, np.concatenate([w['sec'].to_numpy(dtype=np.int64), _seconds(start)]))
+    k = len(pos)
+    idx = np.arange(k)
+    first = np.ones(k, dtype=bool)
+    first[1:] = g[1:] != g[:-1]
+    head = np.maximum.accumulate(np.where(first, idx, 0))   # first row of each row's student
+
+    def col(name, values):
+        return np.concatenate([w[name].to_numpy(dtype=float), _floats(values, n)])[pos]
+
+    def prev(x, fill):
+        out = np.empty(k)
+        out[1:] = x[:-1]
+        out[first] = fill[first] if isinstance(fill, np.ndarray) else fill
+        return out
+
+    # per student code: the streak going into its carried rows and when it last attended before them
+    prior, attended = np.zeros(len(students)), np.full(len(students), np.nan)
+    if carry is not None:
+        at = pd.Index(students).get_indexer(carry['students'].index)
+        prior[at], attended[at] = carry['students']['PRIOR_STREAK'], carry['students']['LAST_ATTENDED']
+
+    p, score, delay = col('present', present), col('score', score), col('delay', delay)
+    att = np.nan_to_num(p)   # unknown attendance breaks a streak
+    out = {}
+    # a streak restarts after the last absence or at the student's first class, where it goes on from the carry
+    base = np.maximum.accumulate(np.where(first | (att == 0), idx, 0))
+    cs = np.cumsum(att)
+    out['STREAK'] = cs - cs[base] + att[base] + np.where((base == head) & (att[head] == 1), prior[g], 0)
+    out['PRIOR_STREAK'] = prev(out['STREAK'], prior[g])
+
+    # one sorted key for every student: windows never reach into the previous student
+    span = (sec.max() - sec.min() if k else 0) + WINDOW_DAYS * DAY + 1
+    key = g.astype(np.int64) * span + (sec - (sec.min() if k else 0))
+    lo = np.searchsorted(key, key - WINDOW_DAYS * DAY, side='right')
+    for name, x in [('ATT_4W', p), ('SCORE_4W', score)]:
+        known = ~np.isnan(x)
+        cnt = _window_sum(known.astype(float), lo)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            out[name] = np.where(cnt > 0, _window_sum(np.where(known, x, 0), lo) / cnt, np.nan)
+
+    out['PREV_DELAY'] = prev(delay, np.nan)
+    last = prev(np.maximum.accumulate(np.where(att == 1, idx, -1)).astype(float), -1.0).astype(np.int64)
+    seen = last >= head
+    out['DAYS_SINCE_ATTENDED'] = np.where(seen, sec - sec[np.maximum(last, 0)], sec - attended[g]) / DAY
+
+    new = pos >= m
+    res = np.full((n, len(COLUMNS)), np.nan)
+    res[pos[new] - m] = np.column_stack([out[c] for c in COLUMNS])[new]
+    hist = pd.DataFrame(res, index=student.index, columns=COLUMNS)
+
+    # carry on: each student's classes in the trailing window of their last one
+    tail = np.ones(k, dtype=bool)   # last row of each student
+    tail[:-1] = first[1:]
+    end = sec[tail][np.cumsum(first) - 1]
+    keep = sec > end - WINDOW_DAYS * DAY
+    window = pd.DataFrame({'student': students[g[keep]], 'sec': sec[keep], 'present': p[keep],
+                           'score': score[keep], 'delay': delay[keep]})
+    ever = np.maximum.accumulate(np.where(att == 1, idx, -1))[tail]
+    starts = keep.copy()
+    starts[1:] &= first[1:] | ~keep[:-1]
+    states = pd.DataFrame({'PRIOR_STREAK': out['PRIOR_STREAK'][starts],
+                           'LAST_ATTENDED': np.where(ever >= head[tail], sec[np.maximum(ever, 0)], attended[g[tail]])},
+                          index=pd.Index(students[g[starts]], name='student'))
+    return hist, {'window': window, 'students': states}
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Flag normalization: attendance, cancel and submission encodings mapped per distinct value"""
+import numbers
+import numpy as np
+import pandas as pd
+
+# canonical label -> accepted spellings (compared upper-cased and stripped)
+ATTENDANCE = {'Present': ('PRESENT', '1', 'Y', 'YES', 'TRUE'),
+              'Absent':  ('ABSENT', '0', 'N', 'NO', 'FALSE')}
+CANCEL = {'Cancelled': ('CANCELLED', 'CANCELED', 'CANCEL', '1', 'TRUE', 'YES')}
+SUBMIT_YES = ('YES', 'Y', 'TRUE', 'SUBMITTED')
+SUBMIT_NO = ('NO', 'N', 'FALSE', 'NOT SUBMITTED')
+
+
+def _per_unique(s, fn, missing, dtype):
+    """Apply `fn` to each distinct value of `s` and broadcast back through the
+    factorized codes; the cost in Python scales with distinct values, not rows."""
+    codes, uniques = pd.factorize(s)
+    # the trailing sentinel is what code -1 (null) picks up
+    mapped = np.array([fn(u) for u in uniques] + [missing], dtype=dtype)
+    return mapped[codes]
+
+
+def canonical(s, labels):
+    """`s` as a categorical over the keys of `labels`; unrecognised values and nulls become NaN."""
+    lookup = {v: i for i, spellings in enumerate(labels.values()) for v in spellings}
+    codes = _per_unique(s, lambda u: lookup.get(str(u).upper().strip(), -1), -1, np.int8)
+    return pd.Series(pd.Categorical.from_codes(codes, list(labels)), index=s.index, name=s.name)
+
+
+def _submission_value(u):
+    if isinstance(u, numbers.Number):
+        return float(u)
+    t = str(u).upper().strip()
+    if t in SUBMIT_YES:
+        return 1.0
+    if t in SUBMIT_NO:
+        return 0.0
+    return pd.to_numeric(t, errors='coerce')
+
+
+def submission(s):
+    """Numeric submission counts from mixed 0/1/count, Yes/No and True/False encodings."""
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return s.astype(float)
+    return pd.Series(_per_unique(s, _submission_value, np.nan, float), index=s.index, name=s.name)
+
+
+def misspelled(s, labels):
+    """True where a value of `s` is not written exactly as one of the canonical labels (nulls are False)."""
+    return _per_unique(s, lambda u: u not in labels, False, bool)
+
+
+def textual(s):
+    """True where a value of `s` is text rather than a number (nulls are False)."""
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return np.zeros(len(s), dtype=bool)
+    return _per_unique(s, lambda u: isinstance(u, str), False, bool)
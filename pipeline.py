@@ -0,0 +1,1316 @@
+#!/usr/bin/env python3
+"""Assignment pipeline: read, clean, transform, analyse and export as memoized stages.
+
+Each stage declares the stages it reads from. Its output is pickled under
+.ingest_cache/<workbook>.stages/, keyed by its inputs' keys and the source of
+the stage (plus the helpers it lists in `uses`), so a rerun only recomputes
+stages whose data or code changed. The root key is the content hash of
+Raw_data, which survives our own saves. The workbook is parsed at most once
+(through the ingest cache) and saved once, by the export step, which is
+skipped when the output already holds its current sheets. With OUTPUT
+(--output) the derived sheets go to a separate report workbook instead and
+the source is never written, so runs are safe to repeat or overlap.
+--batch combines many workbooks (batch.py) into one such report.
+
+    python pipeline.py data.xlsx report.xlsx --only 4.2,4.4 --skip-cleaned-data
+
+--only rewrites just those sections of an existing report from the cached
+stages, --sample 5% runs on a stratified share of the rows, and --format
+parquet|csv writes one file per table into a directory.
+"""
+import argparse, contextlib, hashlib, inspect, io, json, os, time, warnings
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import numpy as np
+from openpyxl.styles import PatternFill, Font, Alignment
+import aggregate, batch, chunked, dates, dtypes, incremental, ingest, insights, instrument, longitudinal, normalize, profiling, rules, schema, store, time_features, xlsx_package, xlsx_writer
+warnings.filterwarnings('ignore')
+# stages hand frames to each other without defensive copies; columns are copied when first written
+pd.set_option('mode.copy_on_write', True)
+
+XLSX = "/home/wasim/Documents/github/DATA-INTERN-ASSIGNMENT/Assignment_data_dictionary.xlsx"
+# CLEANED_DATA export: 'sheets' writes every row (CLEANED_DATA_1..N past Excel's row limit),
+# 'parquet'/'csv' write a sidecar file next to the workbook plus a CLEANED_DATA link sheet
+CLEANED_EXPORT = 'sheets'
+# True: the ANALYSIS_* sheets (and the summary) only clean and fold rows appended since the saved state into it.
+# Understanding, DATA_QUALITY and CLEANED_DATA are still rebuilt from every row; --only 4.1,...,4.6,summary skips them.
+INCREMENTAL = False
+# rows per chunk (e.g. 200_000) to stream Raw_data out of core when it doesn't fit in memory; None reads it whole.
+# A chunked run memoizes nothing and ignores INCREMENTAL.
+CHUNK_ROWS = None
+WORKERS = 1   # processes cleaning and aggregating Raw_data partitions (--workers); 1 runs the stages in this process
+REPORTS_KEPT = 100   # run reports (instrument.py) kept per workbook
+# report workbook for the derived sheets (--output); None writes them back into XLSX
+OUTPUT = None
+REPORT_RAW = False   # with OUTPUT: copy XLSX's own sheets into the report too, unparsed (--with-raw)
+
+# --only: report() sections -> (the engine tables they read, the ANALYSIS_* frames they make);
+# 4.6 is the trends stage
+SECTIONS = {
+    '4.1': (['students'], ['AttendVsScores', 'Top10vsBottom10', 'StudentBehaviour', 'Top10pctStudents']),
+    '4.2': (['teachers'], ['TeacherPerformance', 'Top10Teachers', 'Bottom10Teachers']),
+    '4.3': (['exams'], ['ExamInsights']),
+    '4.4': (['hours', 'days', 'punctuality'], ['TimeAttendance', 'DayAttendance', 'PunctualityVsRating']),
+    '4.5': (['grades', 'submit', 'weeks'], ['GradeWiseStats', 'SubmitVsScore', 'WeekTrends']),
+    '4.6': ([], ['DelayCarryover', 'AttendanceStreaks', 'AbsenceGap']),
+}
+PARTS = ['understanding', 'quality', 'cleaned', 'summary']   # the other sheets, by --only name
+# SECTIONS and PARTS to compute and write (--only); the output's other sheets are kept as they are.
+# None writes everything. Not memoized unless whole, and ignored by chunked and batch runs.
+ONLY = None
+SKIP_CLEANED = False   # leave CLEANED_DATA out of the output and skip computing it (--skip-cleaned-data)
+FORMAT = 'xlsx'   # 'parquet'/'csv': one file per table in a directory instead of a workbook (--format)
+SAMPLE = None   # share of Raw_data rows to run on, drawn within every exam x grade (--sample 5%); None for all
+SAMPLE_SEED = 0
+
+STORE = None   # also write the SQLite analytics store (store.py): True for .ingest_cache/<workbook>.sqlite, or a path (--store)
+
+# name -> (function, input stage names, modules/functions that version it, memoize on disk)
+STAGES = {}
+
+
+def stage(name, inputs=(), uses=(), memo=True):
+    def register(fn):
+        STAGES[name] = (fn, tuple(inputs), tuple(uses), memo)
+        return fn
+    return register
+
+
+def code_version(fn, uses=()):
+    h = hashlib.sha1(inspect.getsource(fn).encode())
+    for obj in uses:
+        h.update(inspect.getsource(obj).encode())
+    return h.hexdigest()
+
+
+def sample(raw, share, seed=SAMPLE_SEED):
+    """`share` of the rows of `raw`, drawn within every exam x grade stratum and kept in sheet order."""
+    role = schema.resolve(raw.columns)['roles']
+    strata = [c for c in (role['exam'], role['grade']) if c]
+    if strata:
+        picked = raw.groupby(strata, dropna=False, observed=True).sample(frac=share, random_state=seed).index
+    else:
+        picked = raw.sample(frac=share, random_state=seed).index
+    print(f"  Sample: {len(picked):,} of {len(raw):,} rows ({share:.1%} per {' x '.join(strata) or 'sheet'})", flush=True)
+    return raw.loc[picked.sort_values()].reset_index(drop=True)
+
+
+# ====== PART 1: UNDERSTANDING ======
+@stage('schema', ['raw'], uses=[schema])
+def resolve_schema(raw):
+    """Column roles and groups of Raw_data, resolved once per header."""
+    return schema.resolve(raw.columns)
+
+
+@stage('profile', ['raw'])
+def profile(raw):
+    print(f"Shape: {raw.shape}", flush=True)
+    print("Columns:", list(raw.columns), flush=True)
+    total_rows, total_cols = raw.shape
+    null_pct = (raw.isnull().sum() / total_rows * 100).round(2)
+    print(f"\nNull columns: {(null_pct > 0).sum()}", flush=True)
+    print("\nSample data types:\n", raw.dtypes, flush=True)
+    print("\nFirst 3 rows:\n", raw.head(3).to_string(), flush=True)
+    return {'rows': total_rows, 'cols': total_cols}
+
+
+def profiled(state):
+    """The DATA_QUALITY profile of a profiling.scan() (or merged) state, summed up in one line."""
+    prof = profiling.report(state)
+    cols, layouts, enc = prof['columns'], prof['layouts'], prof['encodings']
+    mixed = (layouts[layouts['Kind'] == 'other'])['Column'].nunique()
+    print(f"  {(cols['Nulls'] > 0).sum()} columns with nulls, {mixed} datetime columns in mixed layouts, "
+          f"{(~enc['Canonical']).sum()} non-canonical flag spellings ({enc.loc[~enc['Canonical'], 'Rows'].sum():,} rows)",
+          flush=True)
+    return prof
+
+
+@stage('quality', ['raw', 'typed', 'schema'], uses=[profiling, profiled])
+def quality(raw, typed, S):
+    """Column profile, datetime layouts, flag spellings and rule counts of Raw_data, in one pass over it
+    and without parsing a datetime (profiling.py); what the DATA_QUALITY sheet shows. Read from the
+    typed frame, the same values with its labels already coded."""
+    print("\n=== DATA QUALITY PROFILE ===", flush=True)
+    return profiled(profiling.scan(typed, S, dtypes=raw.dtypes))
+
+
+@stage('typed', ['raw', 'schema'], uses=[dtypes])
+def typed(raw, S):
+    """Raw_data with narrow integers and categorical labels; what every later stage reads."""
+    df = dtypes.optimize(raw, S)
+    print(f"\nMemory by column (MB):\n{dtypes.memory_report(raw, df).to_string()}", flush=True)
+    return df
+
+
+def datetime_columns(role):
+    return {p: role[p.lower()] for p in ['CLASS_START', 'CLASS_END', 'ACTUAL_START', 'ACTUAL_END'] if role[p.lower()]}
+
+
+def datetime_formats(raw, S):
+    """{column: layouts} of each datetime column of `raw`, most frequent first (dates.detect).
+
+    Passing these to clean() makes a slice of Raw_data (a chunk or a
+    partition) parse and count its layouts as the whole sheet does."""
+    return {col: dates.detect(raw[col]) for col in datetime_columns(S['roles']).values()}
+
+
+# ====== PART 2: CLEANING ======
+@stage('clean', ['typed', 'schema'], uses=[dates, normalize, rules, datetime_columns])
+def clean(raw, S, formats=None):
+    print("\n=== CLEANING ===", flush=True)
+    df = raw.copy(deep=False)
+    role, groups = S['roles'], S['groups']
+    dt_cols_map = datetime_columns(role)
+    derived_actual, layouts = [], {}
+
+    print("DateTime cols found:", dt_cols_map, flush=True)
+
+    # Parse datetimes
+    for prefix, col in dt_cols_map.items():
+        try:
+            parsed = dates.parse(df[col], (formats or {}).get(col))
+            df[col], layouts[col] = parsed.values, parsed.codes
+            df[f'{prefix}_DATE'] = df[col].dt.normalize()
+            df[f'{prefix}_TIME'] = df[col] - df[f'{prefix}_DATE']
+            if prefix.startswith('ACTUAL'): derived_actual += [f'{prefix}_DATE', f'{prefix}_TIME']
+            print(f"  Parsed {col}: {len(parsed.layouts)} layouts, "
+                  f"{(parsed.codes == dates.UNPARSED).sum():,} unparseable", flush=True)
+        except Exception as e:
+            print(f"  Error parsing {col}: {e}", flush=True)
+
+    # CLASS_DURATION_ACTUAL & CLASS_DELAY_MINS
+    if 'ACTUAL_START' in dt_cols_map and 'ACTUAL_END' in dt_cols_map:
+        try:
+            dur = (df[dt_cols_map['ACTUAL_END']] - df[dt_cols_map['ACTUAL_START']]).dt.total_seconds() / 60
+            df['CLASS_DURATION_ACTUAL_MINS'] = dur.round(2)
+            derived_actual.append('CLASS_DURATION_ACTUAL_MINS')
+            print("  Created CLASS_DURATION_ACTUAL_MINS", flush=True)
+        except: pass
+
+    if 'CLASS_START' in dt_cols_map and 'ACTUAL_START' in dt_cols_map:
+        try:
+            delay = (df[dt_cols_map['ACTUAL_START']] - df[dt_cols_map['CLASS_START']]).dt.total_seconds() / 60
+            df['CLASS_DELAY_MINS'] = delay.round(2)
+            print("  Created CLASS_DELAY_MINS", flush=True)
+        except: pass
+
+    # Rule masks: cancelled and absent rows
+    cancel_col, att_col = role['cancel'], role['attendance']
+    cancelled = np.zeros(len(df), dtype=bool)
+    if cancel_col:
+        cancelled = (normalize.canonical(df[cancel_col], normalize.CANCEL) == 'Cancelled').to_numpy()
+        print(f"  Cancelled rows cleaned: {cancelled.sum():,}", flush=True)
+    absent = np.zeros(len(df), dtype=bool)
+    if att_col:
+        att = normalize.canonical(df[att_col], normalize.ATTENDANCE)
+        absent, present = (att == 'Absent').to_numpy(), att == 'Present'
+        df['IS_PRESENT'] = present.astype(np.int8)
+        print(f"  Absent: {absent.sum():,}, Present: {present.sum():,}", flush=True)
+
+    # Numeric durations, scores and submission counts, then every cleaning rule in one pass
+    for c in [role['attempt_duration']] + groups['scores'] + groups['max_scores']:
+        if c: df[c] = pd.to_numeric(df[c], errors='coerce')
+    for c in [role['cw_submitted'], role['hw_submitted']]:
+        if c: df[c] = normalize.submission(df[c])
+    counts = rules.apply(df, rules.columns(S, derived_actual), {'raw': raw, 'layouts': layouts,
+                                                                     'absent': absent, 'cancelled': cancelled})
+    for r in rules.RULES:
+        print(f"  {r.name}: {counts[r.name]:,} rows — {r.text}", flush=True)
+    df.attrs['rules'] = counts
+
+    print("Cleaning done.", flush=True)
+    return df
+
+
+@stage('dq', ['clean'], uses=[rules])
+def dq(clean):
+    """Rows flagged per cleaning rule, as counted by clean(); what the Understanding sheet lists."""
+    return clean.attrs['rules']
+
+
+# ====== PART 3: TRANSFORMATION ======
+@stage('transform', ['clean', 'schema'], uses=[time_features, datetime_columns])
+def transform(clean, S, class_att=None, rating_max=None):
+    """The CLEANED_DATA frame: cleaned rows plus derived per-row columns.
+
+    ATTENDANCE_PCT and the rating scale of ENGAGEMENT_SCORE depend on other
+    rows; a chunked run passes them in, as per-class mean IS_PRESENT and the
+    top rating over every chunk."""
+    print("\n=== TRANSFORMATION ===", flush=True)
+    df = clean.copy(deep=False)
+    role = S['roles']
+    dt_cols_map = datetime_columns(role)
+
+    # Attendance % per class
+    class_id = role['class_id']
+    if class_id and 'IS_PRESENT' in df.columns:
+        att = df.groupby(class_id)['IS_PRESENT'].transform('mean') if class_att is None else df[class_id].map(class_att)
+        att_pct = att.astype(float) * 100
+        df['ATTENDANCE_PCT'] = att_pct.round(2)
+        print("  ATTENDANCE_PCT created", flush=True)
+
+    # Engagement score
+    engage = pd.Series(0.0, index=df.index)
+    n = 0
+    if 'IS_PRESENT' in df.columns:
+        engage += df['IS_PRESENT'] * 40; n += 1
+    cw_sub = role['cw_submitted']
+    if cw_sub:
+        df[cw_sub] = pd.to_numeric(df[cw_sub], errors='coerce').fillna(0)
+        engage += df[cw_sub].clip(0,1) * 30; n += 1
+    hw_sub = role['hw_submitted']
+    if hw_sub:
+        df[hw_sub] = pd.to_numeric(df[hw_sub], errors='coerce').fillna(0)
+        engage += df[hw_sub].clip(0,1) * 20; n += 1
+    rating_col = role['rating']
+    if rating_col:
+        r_norm = pd.to_numeric(df[rating_col], errors='coerce').fillna(0)
+        mx = r_norm.max() if rating_max is None else rating_max
+        if mx > 0:
+            engage += (r_norm / mx) * 10; n += 1
+    df['ENGAGEMENT_SCORE'] = engage.round(2)
+    print(f"  ENGAGEMENT_SCORE created (components: {n})", flush=True)
+
+    # Teacher punctuality
+    if 'CLASS_DELAY_MINS' in df.columns:
+        df['TEACHER_PUNCTUALITY'] = time_features.punctuality(df['CLASS_DELAY_MINS'])
+        print("  TEACHER_PUNCTUALITY created", flush=True)
+
+    # Week of month
+    if 'CLASS_START' in dt_cols_map:
+        dt = df[dt_cols_map['CLASS_START']]
+        df['WEEK_OF_MONTH'] = time_features.week_of_month(dt)
+        df['DAY_OF_WEEK'] = time_features.day_of_week(dt)
+        df['CLASS_HOUR_BUCKET'] = time_features.hour_bucket(dt)
+        print("  WEEK_OF_MONTH, DAY_OF_WEEK, CLASS_HOUR_BUCKET created", flush=True)
+
+    print("Transformation done.", flush=True)
+    return df
+
+
+# ====== PART 4: ANALYSIS ======
+@stage('features', ['typed', 'clean', 'schema'], uses=[normalize, rules, time_features])
+def features(raw, clean, S):
+    """Per-row inputs of the analysis tables.
+
+    Scores, submissions and ratings are taken from Raw_data, scores cleaned
+    by the score rules of rules.py alone (negative to 0, above their own max
+    to it), so cancelled sessions keep theirs; the parsed class start and
+    IS_PRESENT are shared with the cleaning stage."""
+    role = S['roles']
+    student, teacher, exam, grade = role['student'], role['teacher'], role['exam'], role['grade']
+    class_start = role['class_start']
+    cw_score, cw_max, hw_score, hw_max = role['cw_score'], role['cw_max'], role['hw_score'], role['hw_max']
+    rating, tutor, delay = role['rating'], role['tutor_rating'], role['delay']
+
+    df = raw[[student, teacher, exam, grade, tutor]].copy()
+    df[class_start] = clean[class_start]
+    df['IS_PRESENT'] = clean['IS_PRESENT']
+    cancel = role['cancel']
+    df['IS_CANCELLED'] = ((normalize.canonical(raw[cancel], normalize.CANCEL) == 'Cancelled').astype(np.int8)
+                          if cancel else np.int8(0))
+
+    # Clean scores
+    for c in [cw_score, cw_max, hw_score, hw_max]:
+        df[c] = pd.to_numeric(raw[c], errors='coerce')
+    cols = {'score_pairs': [(s, m) for s, m in [(cw_score, cw_max), (hw_score, hw_max)]],
+            'scores': [(s, None) for s in (cw_score, hw_score)]}
+    rules.apply(df, cols, {}, [r for r in rules.RULES if r.columns in cols])
+
+    # Score percentages
+    df['CW_SCORE_PCT'] = (df[cw_score] / df[cw_max] * 100).round(1)
+    df['HW_SCORE_PCT'] = (df[hw_score] / df[hw_max] * 100).round(1)
+
+    # Teacher punctuality
+    df[delay] = pd.to_numeric(raw[delay], errors='coerce')
+    df['TEACHER_PUNCTUALITY'] = time_features.punctuality(df[delay])
+
+    # Engagement score = 30*(attendance) + 20*(CW submit rate) + 20*(HW submit rate) + 15*(avg score %) + 15*(rating/5)
+    df['CW_SUBMIT_RATE'] = (normalize.submission(raw[role['cw_submitted']]).fillna(0) /
+                             pd.to_numeric(raw[role['cw_given']], errors='coerce').replace(0, np.nan)).fillna(0).clip(0,1)
+    df['HW_SUBMIT_RATE'] = (normalize.submission(raw[role['hw_submitted']]).fillna(0) /
+                             pd.to_numeric(raw[role['hw_given']], errors='coerce').replace(0, np.nan)).fillna(0).clip(0,1)
+    df[rating] = pd.to_numeric(raw[rating], errors='coerce')
+
+    df['ENGAGEMENT_SCORE'] = (
+        30 * df['IS_PRESENT'] +
+        20 * df['CW_SUBMIT_RATE'] +
+        20 * df['HW_SUBMIT_RATE'] +
+        15 * (df['CW_SCORE_PCT'].fillna(0) / 100) +
+        15 * (df[rating].fillna(0) / 5)
+    ).round(1)
+
+    # Grouping keys for the time-based and other-metric tables
+    df['HOUR_BUCKET'] = time_features.hour_bucket(df[class_start])
+    df['DAY'] = time_features.day_of_week(df[class_start])
+    df['WEEK'] = time_features.week_of_month(df[class_start])
+    df['ON_TIME'] = (df['TEACHER_PUNCTUALITY'] == 'On Time').astype(float)
+    df['TOTAL_SUBMIT_RATE'] = ((df['CW_SUBMIT_RATE'] + df['HW_SUBMIT_RATE']) / 2 * 100).round(0)
+    df['SUBMIT_BUCKET'] = pd.cut(df['TOTAL_SUBMIT_RATE'], bins=[0, 25, 50, 75, 100], labels=['0-25%','25-50%','50-75%','75-100%'])
+    return df
+
+
+def engine(S, only=None):
+    """Every per-entity table (or those named in `only`), registered up front and computed in one pass per key.
+
+    Columns named '_...' are only for the executive summary's tests (insights.py);
+    report() keeps them out of the sheets."""
+    role = S['roles']
+    rating, tutor, delay = role['rating'], role['tutor_rating'], role['delay']
+    eng = aggregate.Engine()
+    # every table below keyed on one of these is a rollup of one state over their combinations,
+    # and the keys the store's cube can be sliced by
+    eng.cube(role['exam'], role['grade'], role['teacher'], 'DAY', 'HOUR_BUCKET', 'WEEK', 'TEACHER_PUNCTUALITY')
+    eng.add('students', role['student'],
+        Total_Classes=('IS_PRESENT', 'count'),
+        Attended=('IS_PRESENT', 'sum'),
+        Att_Rate=('IS_PRESENT', 'mean'),
+        Avg_CW_Score_Pct=('CW_SCORE_PCT', 'mean'),
+        Avg_HW_Score_Pct=('HW_SCORE_PCT', 'mean'),
+        CW_Submit_Rate=('CW_SUBMIT_RATE', 'mean'),
+        HW_Submit_Rate=('HW_SUBMIT_RATE', 'mean'),
+        Avg_Engagement=('ENGAGEMENT_SCORE', 'mean'),
+    )
+    eng.add('teachers', role['teacher'],
+        Classes_Taken=('IS_PRESENT', 'count'),
+        Att_Rate=('IS_PRESENT', 'mean'),
+        Avg_Rating=(rating, 'mean'),
+        Avg_Tutor_Rating=(tutor, 'mean'),
+        Avg_Delay_Mins=(delay, 'mean'),
+        Avg_CW_Score=('CW_SCORE_PCT', 'mean'),
+        Avg_HW_Score=('HW_SCORE_PCT', 'mean'),
+        OnTime_Pct=('ON_TIME', 'mean'),
+    )
+    eng.add('exams', role['exam'],
+        Total_Sessions=('IS_PRESENT', 'count'),
+        Att_Rate=('IS_PRESENT', 'mean'),
+        Avg_CW_Score=('CW_SCORE_PCT', 'mean'),
+        Avg_HW_Score=('HW_SCORE_PCT', 'mean'),
+        CW_Submit_Rate=('CW_SUBMIT_RATE', 'mean'),
+        HW_Submit_Rate=('HW_SUBMIT_RATE', 'mean'),
+        Avg_Rating=(rating, 'mean'),
+        Avg_Engagement=('ENGAGEMENT_SCORE', 'mean'),
+        _Engagement_N=('ENGAGEMENT_SCORE', 'count'),
+        _Engagement_Std=('ENGAGEMENT_SCORE', 'std'),
+        _Cancel_Rate=('IS_CANCELLED', 'mean'),
+        _Rows=('IS_CANCELLED', 'size'),
+    )
+    eng.add('hours', 'HOUR_BUCKET',
+        Att_Rate=('IS_PRESENT','mean'),
+        Avg_Rating=(rating,'mean'),
+        Avg_Engagement=('ENGAGEMENT_SCORE','mean'),
+        _N=('IS_PRESENT','count'),
+    )
+    eng.add('days', 'DAY',
+        Att_Rate=('IS_PRESENT','mean'),
+        Avg_Engagement=('ENGAGEMENT_SCORE','mean'),
+    )
+    eng.add('punctuality', 'TEACHER_PUNCTUALITY', observed=False,
+        Avg_Rating=(rating,'mean'),
+        Att_Rate=('IS_PRESENT','mean'),
+        Count=('IS_PRESENT','count'),
+        _Rating_N=(rating,'count'),
+        _Rating_Std=(rating,'std'),
+    )
+    eng.add('grades', role['grade'],
+        Att_Rate=('IS_PRESENT', 'mean'),
+        Avg_CW_Score=('CW_SCORE_PCT', 'mean'),
+        Avg_Engagement=('ENGAGEMENT_SCORE', 'mean'),
+    )
+    eng.add('submit', 'SUBMIT_BUCKET', observed=False,
+        Avg_CW_Score=('CW_SCORE_PCT','mean'),
+        Avg_HW_Score=('HW_SCORE_PCT','mean'),
+        Att_Rate=('IS_PRESENT','mean'),
+        Count=('IS_PRESENT','count'),
+        _CW_Score_N=('CW_SCORE_PCT','count'),
+        _CW_Score_Std=('CW_SCORE_PCT','std'),
+    )
+    eng.add('weeks', 'WEEK',
+        Att_Rate=('IS_PRESENT','mean'),
+        Avg_Engagement=('ENGAGEMENT_SCORE','mean'),
+    )
+    if only is not None:
+        eng.tables = {name: t for name, t in eng.tables.items() if name in only}
+    return eng
+
+
+def report(tables):
+    """ANALYSIS_* frames from the engine's finalized tables.
+
+    Frames the executive summary reads keep their unrounded table, '_' columns
+    included, in .attrs['stats']."""
+    stats = tables
+    tables = {name: t[[c for c in t.columns if not c.startswith('_')]] for name, t in tables.items()}
+    results = {}
+
+    # 4.1 Student Behaviour (with scores!)
+    if 'students' in tables:
+        with instrument.span('4.1 Student behaviour', title="4.1 Student behaviour..."):
+            ss = tables['students'].round(2)
+            ss['Att_Rate'] = (ss['Att_Rate'] * 100).round(1)
+            ss['CW_Submit_Rate'] = (ss['CW_Submit_Rate'] * 100).round(1)
+            ss['HW_Submit_Rate'] = (ss['HW_Submit_Rate'] * 100).round(1)
+
+            # Attendance vs score correlation
+            att_buckets = pd.cut(ss['Att_Rate'], bins=[0,25,50,75,100], labels=['0-25%','25-50%','50-75%','75-100%'])
+            att_score = ss.groupby(att_buckets).agg(
+                Avg_CW_Score=('Avg_CW_Score_Pct', 'mean'),
+                Avg_HW_Score=('Avg_HW_Score_Pct', 'mean'),
+                Avg_CW_Submit=('CW_Submit_Rate', 'mean'),
+                Avg_HW_Submit=('HW_Submit_Rate', 'mean'),
+                Student_Count=('Total_Classes', 'count')
+            ).round(1)
+            results['AttendVsScores'] = att_score.reset_index()
+            results['AttendVsScores'].attrs['stats'] = (
+                stats['students']['Avg_CW_Score_Pct'].groupby(att_buckets, observed=False).agg(['count', 'mean', 'std'])
+                .rename(columns={'count': 'n'}))
+            print(f"  Attend vs Scores:\n{att_score}", flush=True)
+
+            # Top 10% students. Ranked exactly on the finalized table: a student's rate moves with every
+            # chunk or increment folded in, so a top-N kept per chunk can't be merged into the right one
+            top10pct = ss.nlargest(int(len(ss)*0.1), 'Att_Rate')
+            top_avg = top10pct.mean().round(1)
+            bot_avg = ss.nsmallest(int(len(ss)*0.1), 'Att_Rate').mean().round(1)
+            comparison = pd.DataFrame({'Top10%': top_avg, 'Bottom10%': bot_avg, 'Difference': (top_avg - bot_avg).round(1)})
+            results['Top10vsBottom10'] = comparison.reset_index()
+            print(f"  Top 10% vs Bottom 10%:\n{comparison}", flush=True)
+
+            results['StudentBehaviour'] = ss.reset_index().head(500)
+            results['StudentBehaviour'].attrs['stats'] = stats['students']
+            results['Top10pctStudents'] = top10pct.reset_index().head(100)
+
+    # 4.2 Teacher Performance (with scores + ratings!)
+    if 'teachers' in tables:
+        with instrument.span('4.2 Teacher performance', title="4.2 Teacher performance..."):
+            ts = tables['teachers'].round(2)
+            ts['Att_Rate'] = (ts['Att_Rate'] * 100).round(1)
+
+            # Punctuality rate
+            ts['OnTime_Pct'] = (tables['teachers']['OnTime_Pct'] * 100).round(1)
+
+            # Composite teacher score
+            ts['Teacher_Score'] = (
+                0.3 * ts['Att_Rate'] / ts['Att_Rate'].max() * 100 +
+                0.25 * ts['Avg_Rating'].fillna(0) / 5 * 100 +
+                0.2 * ts['OnTime_Pct'] / 100 * 100 +
+                0.15 * ts['Avg_CW_Score'].fillna(0) / ts['Avg_CW_Score'].max() * 100 +
+                0.1 * ts['Avg_HW_Score'].fillna(0) / ts['Avg_HW_Score'].max() * 100
+            ).round(1)
+
+            ts_r = ts.reset_index().sort_values('Teacher_Score', ascending=False)
+            results['TeacherPerformance'] = ts_r
+            results['Top10Teachers'] = ts_r.head(10)
+            results['Bottom10Teachers'] = ts_r.tail(10)
+
+    # 4.3 Exam Insights
+    if 'exams' in tables:
+        with instrument.span('4.3 Exam insights', title="4.3 Exam insights..."):
+            ei = tables['exams'].round(2)
+            ei['Att_Rate'] = (ei['Att_Rate'] * 100).round(1)
+            ei['CW_Submit_Rate'] = (ei['CW_Submit_Rate'] * 100).round(1)
+            ei['HW_Submit_Rate'] = (ei['HW_Submit_Rate'] * 100).round(1)
+            results['ExamInsights'] = ei.reset_index()
+            results['ExamInsights'].attrs['stats'] = stats['exams']
+            print(f"  Exam insights:\n{ei}", flush=True)
+
+    # 4.4 Time-Based
+    if 'hours' in tables:
+        with instrument.span('4.4 Time-based', title="4.4 Time-based..."):
+            time_att = tables['hours'].round(2)
+            time_att['Att_Rate'] = (time_att['Att_Rate']*100).round(1)
+            results['TimeAttendance'] = time_att.reset_index()
+            results['TimeAttendance'].attrs['stats'] = stats['hours']
+            print(f"  Time attendance:\n{time_att}", flush=True)
+
+            day_att = tables['days'].round(2)
+            day_att['Att_Rate'] = (day_att['Att_Rate']*100).round(1)
+            results['DayAttendance'] = day_att.reset_index()
+            results['DayAttendance'].attrs['stats'] = stats['days']
+
+            # Punctuality vs Rating
+            punct_rat = tables['punctuality'].round(2)
+            punct_rat['Att_Rate'] = (punct_rat['Att_Rate']*100).round(1)
+            results['PunctualityVsRating'] = punct_rat.reset_index()
+            results['PunctualityVsRating'].attrs['stats'] = stats['punctuality']
+            print(f"  Punctuality vs Rating:\n{punct_rat}", flush=True)
+
+    # 4.5 Other Metrics
+    if 'grades' in tables:
+        with instrument.span('4.5 Other metrics', title="4.5 Other metrics..."):
+            # Metric 1: Grade-wise attendance & performance
+            grade_stats = tables['grades'].round(2)
+            grade_stats['Att_Rate'] = (grade_stats['Att_Rate']*100).round(1)
+            results['GradeWiseStats'] = grade_stats.reset_index()
+
+            # Metric 2: Assignment completion vs score correlation
+            submit_score = tables['submit'].rename_axis('TOTAL_SUBMIT_RATE').round(1)
+            submit_score['Att_Rate'] = (submit_score['Att_Rate']*100).round(1)
+            results['SubmitVsScore'] = submit_score.reset_index()
+            results['SubmitVsScore'].attrs['stats'] = stats['submit'].rename_axis('TOTAL_SUBMIT_RATE')
+            print(f"  Submit vs Score:\n{submit_score}", flush=True)
+
+            # Metric 3: Week-of-month trends
+            week_stats = tables['weeks'].round(2)
+            week_stats['Att_Rate'] = (week_stats['Att_Rate']*100).round(1)
+            results['WeekTrends'] = week_stats.reset_index()
+
+    print("Analysis done.", flush=True)
+    return results
+
+
+@stage('analysis', ['features', 'schema'], uses=[aggregate, engine, report])
+def analysis(rows, S):
+    print("\n=== ANALYSIS ===", flush=True)
+    return report(engine(S).run(rows))
+
+
+@stage('longitudinal', ['features', 'schema'], uses=[longitudinal])
+def history(rows, S):
+    """Per-row student history (longitudinal.COLUMNS): streaks, trailing 4-week rates, previous class delay."""
+    role = S['roles']
+    return longitudinal.frame(rows[role['student']], rows[role['class_start']], rows['IS_PRESENT'],
+                              rows['CW_SCORE_PCT'], rows[role['delay']])
+
+
+def trend_rows(rows, hist):
+    """What trend_engine() groups: each class with what came before it for that student."""
+    # buckets kept here, in the trends stage's versioned source, so changing them recomputes it
+    streak_bins, streak_labels = [-1, 0, 2, 5, np.inf], ['0', '1-2', '3-5', '6+']
+    gap_bins, gap_labels = [0, 7, 14, 28, np.inf], ['<=7d', '8-14d', '15-28d', '>28d']
+    return pd.DataFrame({
+        'IS_PRESENT': rows['IS_PRESENT'], 'CW_SCORE_PCT': rows['CW_SCORE_PCT'],
+        'ATT_4W': hist['ATT_4W'],
+        'Prev_Class_Punctuality': time_features.punctuality(hist['PREV_DELAY']),
+        'Streak_Going_In': pd.cut(hist['PRIOR_STREAK'], bins=streak_bins, labels=streak_labels),
+        'Days_Since_Attended': pd.cut(hist['DAYS_SINCE_ATTENDED'], bins=gap_bins, labels=gap_labels,
+                                      include_lowest=True),
+    })
+
+
+def trend_engine():
+    eng = aggregate.Engine()
+    for name, key in [('DelayCarryover', 'Prev_Class_Punctuality'), ('AttendanceStreaks', 'Streak_Going_In'),
+                      ('AbsenceGap', 'Days_Since_Attended')]:
+        eng.add(name, key, observed=False,
+                Classes=('IS_PRESENT', 'count'),
+                Att_Rate=('IS_PRESENT', 'mean'),
+                Avg_4W_Att_Rate=('ATT_4W', 'mean'),
+                Avg_CW_Score_Pct=('CW_SCORE_PCT', 'mean'))
+    return eng
+
+
+def trend_report(tables):
+    """ANALYSIS_* frames from trend_engine()'s finalized tables, each unrounded in .attrs['stats']."""
+    results = {}
+    for name, stats in tables.items():
+        t = stats.copy()
+        t['Att_Rate'] = (t['Att_Rate'] * 100).round(1)
+        t['Avg_4W_Att_Rate'] = (t['Avg_4W_Att_Rate'] * 100).round(1)
+        t['Avg_CW_Score_Pct'] = t['Avg_CW_Score_Pct'].round(2)
+        results[name] = t.reset_index()
+        results[name].attrs['stats'] = stats
+    dc = results['DelayCarryover'].set_index('Prev_Class_Punctuality')['Att_Rate']
+    print(f"  Attendance after an on-time vs very late class: {dc.get('On Time')}% vs {dc.get('Very Late')}%", flush=True)
+    return results
+
+
+@stage('trends', ['features', 'longitudinal'], uses=[aggregate, time_features, trend_rows, trend_engine, trend_report])
+def trends(rows, hist):
+    """ANALYSIS_* tables of what a class's history says about its attendance.
+
+    Each class is grouped by what came before it for that student: the
+    teacher's punctuality in the previous class, the attendance streak going
+    in, and the days since the student last attended."""
+    print("\n=== TRENDS ===", flush=True)
+    return trend_report(trend_engine().run(trend_rows(rows, hist)))
+
+
+def incremental_results(run):
+    """(analysis, trends), cleaning only the rows appended since the saved state and folding them into it.
+
+    The state holds both engines' partial states and each student's history
+    carry (longitudinal.fold), so neither rereads the rows already folded.
+    Appended rows starting before their student's last folded class can't be
+    placed in that history and rebuild the state from every row."""
+    print("\n=== ANALYSIS + TRENDS (incremental) ===", flush=True)
+    raw, S = run.get('raw'), run.get('schema')
+    role = S['roles']
+    code = run.code_key('analysis') + run.code_key('trends') + code_version(incremental_results, [incremental, longitudinal])
+    inc = incremental.Incremental(run.xlsx, {'analysis': engine(S), 'trends': trend_engine()}, raw, code)
+
+    def appended():
+        new = raw[inc.pending()]
+        formats = inc.formats or datetime_formats(new, S)   # the layouts the saved rows were parsed with
+        with contextlib.redirect_stdout(io.StringIO()):
+            return features(new, clean(new, S, formats), S), formats
+
+    rows, formats = appended()
+    late = longitudinal.late(inc.carry, rows[role['student']], rows[role['class_start']])
+    if late:
+        print(f"  Incremental: {late:,} appended rows start before their student's last class, full rebuild", flush=True)
+        inc.reset()
+        rows, formats = appended()
+    hist, carry = longitudinal.fold(rows[role['student']], rows[role['class_start']], rows['IS_PRESENT'],
+                                    rows['CW_SCORE_PCT'], rows[role['delay']], inc.carry)
+    tables = inc.update({'analysis': rows, 'trends': trend_rows(rows, hist)}, formats, carry)
+    return report(tables['analysis']), trend_report(tables['trends'])
+
+
+def chunked_run(xlsx, chunk_rows):
+    """Profile info (with the DATA_QUALITY profile as 'quality'), cleaned rows and analysis results of `xlsx`,
+    reading Raw_data `chunk_rows` rows at a time.
+
+    Each chunk is cleaned and turned into analysis rows on its own, then
+    folded into the engine's partial state, so memory is bounded by the
+    chunk size plus one state row per student/teacher/class, and the five
+    columns per row the trends need (a student's history spans chunks).
+    Cleaned chunks are spooled to disk and transformed on their way into the
+    export, once class attendance and the top rating over all chunks are known."""
+    print(f"\n=== CHUNKED RUN ({chunk_rows:,} rows per chunk) ===", flush=True)
+    sheet = ingest.sheet_names(xlsx)[0]
+    stem = os.path.splitext(os.path.basename(xlsx))[0]
+    spool = chunked.Spool.create(os.path.join(ingest.cache_dir(xlsx), f'{stem}.{os.getpid()}.chunks'))
+    S = eng = None
+    states, classes, rating_max, counts, timeline, scans, t0 = {}, None, 0, [], [], [], time.time()
+    db = store.Writer(store_path(xlsx)) if STORE else None
+    try:
+        for raw in ingest.iter_raw(xlsx, sheet, chunk_rows):
+            if S is None:
+                S, info = schema.resolve(raw.columns), {'cols': raw.shape[1]}
+                formats = datetime_formats(raw, S)   # the sheet's first rows, so every chunk parses like the whole sheet
+                eng = engine(S)
+                role = S['roles']
+            # the stages' own progress lines, once per chunk, would drown the chunk lines
+            scans.append(profiling.scan(raw, S, mergeable=True))
+            with contextlib.redirect_stdout(io.StringIO()):
+                cleaned = clean(raw, S, formats)
+                rows = features(raw, cleaned, S)
+            states = {key: aggregate.merge([states.get(key), state]) for key, state in eng.partials(rows).items()}
+            if db:
+                db.facts(rows)
+            timeline.append(rows[[role['student'], role['class_start'], 'IS_PRESENT', 'CW_SCORE_PCT', role['delay']]])
+            if role['class_id'] and 'IS_PRESENT' in cleaned.columns:
+                classes = aggregate.merge([classes, aggregate.partial(cleaned, role['class_id'], ['IS_PRESENT'])])
+            if role['rating']:
+                rating_max = max(rating_max, pd.to_numeric(cleaned[role['rating']], errors='coerce').fillna(0).max())
+            counts.append(cleaned.attrs['rules'])
+            spool.append(cleaned)
+            print(f"  {len(spool):,} rows cleaned and folded ({time.time() - t0:.1f}s)", flush=True)
+        if db:
+            with instrument.span('store', title="\n=== STORE ==="):
+                db.close(states[eng.cubes[0]])
+    except BaseException:
+        # a failed chunk leaves neither the spool nor a half-built store behind
+        spool.remove()
+        if db:
+            db.abort()
+        raise
+
+    info.update(rows=len(spool), dq=rules.total(counts))
+    with instrument.span('quality', title="\n=== DATA QUALITY PROFILE ==="):
+        info['quality'] = profiled(profiling.merge(scans))
+    with instrument.span('analysis', title="\n=== ANALYSIS ==="):
+        results = report(eng.finalize(states))
+    with instrument.span('trends'):
+        timeline = pd.concat(timeline, ignore_index=True)
+        results.update(trends(timeline, history(timeline, S)))
+    class_att = None if classes is None else aggregate.finalize(classes, {'att': ('IS_PRESENT', 'mean')})['att']
+
+    def derive(part):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return transform(part, S, class_att, rating_max)
+    return info, spool.map(derive), results
+
+
+_task = {}   # in each worker: the typed frame, its partitions and what to compute, set once by _init_worker
+
+
+def _init_worker(typed, S, formats, parts, analyse):
+    _task.update(typed=typed, S=S, formats=formats, parts=parts, analyse=analyse)
+
+
+def _clean_partition(i):
+    """Cleaned rows of partition `i` and, when analysing, its engine partial states."""
+    S = _task['S']
+    raw = _task['typed'].iloc[_task['parts'][i]]
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned = clean(raw, S, _task['formats'])
+        states = engine(S).partials(features(raw, cleaned, S)) if _task['analyse'] else None
+    return cleaned, states
+
+
+def parallel_clean(typed, S, workers, analyse=True):
+    """(clean, analysis tables or None) computed by `workers` processes over partitions of STUDENT ID.
+
+    Rows are partitioned by a hash of the student key; each worker cleans
+    its partition and folds it into partial engine states. The parent puts
+    the cleaned rows back in their original order and adds the states up.
+    Every row of a student lands in one partition, in order, so per-student
+    tables match a serial run bit for bit; tables on other keys add
+    per-partition sums, which can only move a float sum in its last bits.
+    bench_parallel.py times it against the serial stages."""
+    print(f"\n=== CLEANING{' + ANALYSIS' if analyse else ''} ({workers} workers) ===", flush=True)
+    student = S['roles']['student']
+    if student:
+        part = pd.util.hash_pandas_object(typed[student], index=False).to_numpy() % workers
+    else:
+        part = np.arange(len(typed)) * workers // max(len(typed), 1)
+    parts = [p for p in (np.flatnonzero(part == i) for i in range(workers)) if len(p)] or [np.arange(len(typed))]
+    t0 = time.time()
+    with ProcessPoolExecutor(workers, initializer=_init_worker,
+                             initargs=(typed, S, datetime_formats(typed, S), parts, analyse)) as pool:
+        done = list(pool.map(_clean_partition, range(len(parts))))
+    order = np.argsort(np.concatenate(parts), kind='stable')
+    cleaned = pd.concat([c for c, _ in done]).iloc[order]
+    cleaned.attrs['rules'] = rules.total(c.attrs['rules'] for c, _ in done)
+    print(f"  {len(typed):,} rows in {len(parts)} partitions ({time.time() - t0:.1f}s)", flush=True)
+    if not analyse:
+        return cleaned, None
+    states = {key: aggregate.merge([s[key] for _, s in done]) for key in done[0][1]}
+    return cleaned, engine(S).finalize(states)
+
+
+class Run:
+    """One pipeline run over `xlsx`; stage keys and outputs are resolved lazily."""
+
+    def __init__(self, xlsx):
+        self.xlsx = xlsx
+        self.sheet = ingest.sheet_names(xlsx)[0]
+        stem = os.path.splitext(os.path.basename(xlsx))[0]
+        self.memo_dir = os.path.join(ingest.cache_dir(xlsx), f'{stem}.stages')
+        self._keys, self._values = {}, {}
+
+    def key(self, name):
+        if name not in self._keys:
+            if name == 'raw':
+                # parses the workbook when the ingest cache is cold
+                with instrument.span('ingest'):
+                    self._keys[name] = ingest.frame_key(self.xlsx, self.sheet)
+                if SAMPLE:   # a sample is memoized apart from the whole sheet
+                    self._keys[name] = hashlib.sha1(f'{self._keys[name]}|{SAMPLE}|{SAMPLE_SEED}'.encode()).hexdigest()
+            else:
+                fn, inputs, uses, _ = STAGES[name]
+                h = hashlib.sha1(code_version(fn, uses).encode())
+                for i in inputs:
+                    h.update(self.key(i).encode())
+                self._keys[name] = h.hexdigest()
+        return self._keys[name]
+
+    def code_key(self, name):
+        """key() without Raw_data: changes with the code of `name` and of the stages it reads only."""
+        if name == 'raw':
+            return ''
+        fn, inputs, uses, _ = STAGES[name]
+        h = hashlib.sha1(code_version(fn, uses).encode())
+        for i in inputs:
+            h.update(self.code_key(i).encode())
+        return h.hexdigest()
+
+    def _memo_path(self, name):
+        return os.path.join(self.memo_dir, f'{name}.{self.key(name)[:16]}.pkl')
+
+    def get(self, name):
+        if name in self._values:
+            return self._values[name]
+        if name == 'raw':
+            with instrument.span('raw', title="Reading...") as sp:
+                value = ingest.load_raw(self.xlsx, self.sheet)
+                if SAMPLE:
+                    value = sample(value, SAMPLE)
+        else:
+            fn, inputs, _, memo = STAGES[name]
+            path = self._memo_path(name)
+            if memo and os.path.exists(path):
+                with instrument.span(name, title=f"[{name}] up to date, loading {path}") as sp:
+                    value = pd.read_pickle(path)
+                    sp['memo'] = True
+            else:
+                if name in ('analysis', 'trends') and INCREMENTAL:
+                    with instrument.span(name) as sp:
+                        value = self._incremental(name)
+                else:
+                    args = [self.get(i) for i in inputs]
+                    with instrument.span(name) as sp:
+                        value = self._parallel_clean(*args) if name == 'clean' and WORKERS > 1 else fn(*args)
+                if memo:
+                    self._store(name, path, value)
+        if isinstance(value, pd.DataFrame):
+            sp['rows'] = len(value)
+        self._values[name] = value
+        return value
+
+    def results(self, sections):
+        """ANALYSIS_* frames of `sections` (SECTIONS keys): from the whole analysis when it is
+        saved or asked for, else from just their engine tables, unsaved."""
+        tables = [t for s in sections for t in SECTIONS[s][0]]
+        results = {}
+        if tables:
+            whole = len(tables) == sum(len(t) for t, _ in SECTIONS.values())
+            if whole or INCREMENTAL or os.path.exists(self._memo_path('analysis')):
+                results.update(self.get('analysis'))
+            else:
+                rows, S = self.get('features'), self.get('schema')
+                with instrument.span('analysis', title="\n=== ANALYSIS (" + ', '.join(sections) + ") ==="):
+                    results.update(report(engine(S, tables).run(rows)))
+        if '4.6' in sections:
+            results.update(self.get('trends'))
+        return results
+
+    def _parallel_clean(self, typed, S):
+        """clean from a worker pool, which also yields the analysis when that is due too."""
+        path = self._memo_path('analysis')
+        analyse = not INCREMENTAL and not os.path.exists(path)
+        value, tables = parallel_clean(typed, S, WORKERS, analyse)
+        if analyse:
+            with instrument.span('analysis', title="\n=== ANALYSIS ==="):
+                self._values['analysis'] = report(tables)
+            self._store('analysis', path, self._values['analysis'])
+        return value
+
+    def _incremental(self, name):
+        """analysis or trends from one incremental fold, which yields the other too; that one is kept and saved."""
+        values = dict(zip(('analysis', 'trends'), incremental_results(self)))
+        for other, value in values.items():
+            if other != name and other not in self._values:
+                self._values[other] = value
+                self._store(other, self._memo_path(other), value)
+        return values[name]
+
+    def _store(self, name, path, value):
+        os.makedirs(self.memo_dir, exist_ok=True)
+        pd.to_pickle(value, ingest.tmp_path(path))
+        os.replace(ingest.tmp_path(path), path)
+        # one generation per stage is enough; older keys can't be hit again unless code is reverted
+        for f in os.listdir(self.memo_dir):
+            if f.startswith(f'{name}.') and f.endswith('.pkl') and os.path.join(self.memo_dir, f) != path:
+                os.remove(os.path.join(self.memo_dir, f))
+
+
+# ====== PART 5: EXPORT ======
+def output_path(xlsx):
+    if FORMAT != 'xlsx':
+        return OUTPUT or f'{os.path.splitext(xlsx)[0]}_report'
+    return OUTPUT or xlsx
+
+
+def wanted(only=None):
+    """The SECTIONS and PARTS a run writes: `only`, or all, less CLEANED_DATA with SKIP_CLEANED."""
+    return [p for p in only or [*SECTIONS, *PARTS] if not (SKIP_CLEANED and p == 'cleaned')]
+
+
+def export_key(run):
+    h = hashlib.sha1(code_version(export, [insights, xlsx_package, xlsx_writer]).encode())
+    h.update(json.dumps([CLEANED_EXPORT, os.path.abspath(output_path(run.xlsx)), REPORT_RAW, wanted(ONLY), FORMAT]
+                        + [run.key(s) for s in ('profile', 'quality', 'dq', 'transform', 'analysis', 'trends')]).encode())
+    return h.hexdigest()
+
+
+def _export_marker(run):
+    return os.path.join(run.memo_dir, 'export.json')
+
+
+def up_to_date(run, key):
+    """True when the output workbook on disk is the one the export step last wrote for `key`."""
+    try:
+        with open(_export_marker(run)) as f:
+            mark = json.load(f)
+    except (OSError, ValueError):
+        return False
+    out = output_path(run.xlsx)
+    if mark.get('key') != key or not os.path.exists(out):
+        return False
+    st = os.stat(out)
+    if (mark['size'], mark['mtime_ns']) == (st.st_size, st.st_mtime_ns):
+        return True
+    return mark['size'] == st.st_size and mark['sha1'] == ingest.content_hash(out)
+
+
+def export(xlsx, info, df, results, out=None, sheets=None, summary=True, keep=False, quality=None):
+    """Build Understanding, DATA_QUALITY, CLEANED_DATA, EXECUTIVE_SUMMARY and ANALYSIS_* as one workbook to save to `out`.
+
+    `info` is the profile plus the per-rule counts of the cleaning ('dq').
+    `out` defaults to `xlsx`, whose other sheets are kept; for a separate
+    report they are kept only with REPORT_RAW, and with no `xlsx` (a batch)
+    never. `df` is the CLEANED_DATA frame, or a chunked.Spool of its parts
+    in a chunked run. `quality` is the profile (profiling.report) shown on
+    DATA_QUALITY and written beside `out` as JSON. A None `info`, `df` or
+    `quality` leaves its sheet out, as `sheets` (names of `results`) and
+    `summary` do the others; with `keep` the sheets left out are kept from
+    `out` as it is on disk."""
+    print("\n=== WRITING EXCEL ===", flush=True)
+    out = out or xlsx
+    in_place = xlsx is not None and os.path.abspath(out) == os.path.abspath(xlsx)
+    analysis_sheets = {f'ANALYSIS_{key}'[:31]: data for key, data in results.items()  # Excel max 31 chars
+                       if sheets is None or key in sheets}
+    if keep:
+        src = out
+        skip = ((['Understanding'] if info is not None else []) + (['DATA_QUALITY'] if quality is not None else []) +
+                (['EXECUTIVE_SUMMARY'] if summary else []) +
+                (['CLEANED_DATA', 'CLEANED_DATA_*'] if df is not None else []) + list(analysis_sheets))
+    else:
+        src = xlsx if xlsx and (in_place or REPORT_RAW) else None
+        skip = ['Understanding', 'DATA_QUALITY', 'CLEANED_DATA', 'CLEANED_DATA_*', 'ANALYSIS_*', 'EXECUTIVE_SUMMARY']
+    with instrument.span('package'):
+        wb = xlsx_package.Package(src, skip=skip, workers=WORKERS, replace=keep)
+
+    hdr_fill = PatternFill(start_color='1F4E79', end_color='1F4E79', fill_type='solid')
+    sub_fill = PatternFill(start_color='2E75B6', end_color='2E75B6', fill_type='solid')
+    alt_fill = PatternFill(start_color='DDEEFF', end_color='DDEEFF', fill_type='solid')
+    yel_fill = PatternFill(start_color='FFF2CC', end_color='FFF2CC', fill_type='solid')
+    red_fill = PatternFill(start_color='FFE0E0', end_color='FFE0E0', fill_type='solid')
+    grn_fill = PatternFill(start_color='E0FFE0', end_color='E0FFE0', fill_type='solid')
+    bw = Font(bold=True, color='FFFFFF', size=12)
+    bb = Font(bold=True, size=11)
+    nf = Font(size=10)
+    wrap = Alignment(wrap_text=True, vertical='top')
+    cell = xlsx_writer.styled
+
+    def add_row(ws, r, cells=(), height=None, merge=False):
+        # write-only sheets: row height and merges must be declared before the row streams out
+        if height: ws.row_dimensions[r].height = height
+        if merge: ws.merged_cells.add(f'A{r}:B{r}')
+        ws.append(list(cells))
+        return r + 1
+
+    # Understanding sheet
+    if info is not None:
+        with instrument.span('Understanding'):
+            ws = wb.create_sheet('Understanding')
+            ws.column_dimensions['A'].width = 45
+            ws.column_dimensions['B'].width = 80
+
+            r = add_row(ws, 1, [cell(ws, 'PART 1 — DATA UNDERSTANDING', hdr_fill, bw)], merge=True)
+            r = add_row(ws, r)
+
+            qa = [
+                ('1. What does each row represent?',
+                 f'Each row = one STUDENT × one CLASS SESSION interaction.\n'
+                 f'Captures attendance, scores, timing, teacher, and submission.\n'
+                 f'Total: {info["rows"]:,} rows × {info["cols"]} columns.'),
+                ('2. Major entities in data?',
+                 'STUDENT (learner), CLASS/SESSION (scheduled event),\n'
+                 'TEACHER/FACULTY (instructor), BATCH/EXAM (JEE/NEET/CBSE/Foundation),\n'
+                 'ASSIGNMENTS (classwork, homework), SCORES.'),
+                ('3. Which columns look messy?',
+                 'DATETIME cols (mixed formats), ATTENDANCE (Present/1/Y),\n'
+                 'SCORES (negatives, >max), DURATION (negatives for absent),\n'
+                 'SUBMISSION flags (0/1 vs Yes/No).'),
+            ]
+
+            for q, a in qa:
+                r = add_row(ws, r, [cell(ws, q, font=bb), cell(ws, a, font=nf, alignment=wrap)], height=55)
+
+            r = add_row(ws, r)
+            r = add_row(ws, r, [cell(ws, '4. Minimum 8 Data Quality Problems:', sub_fill, bw)], merge=True)
+            for i, issue in enumerate(rules.describe(info['dq'])):
+                r = add_row(ws, r, [cell(ws, issue, alt_fill if i % 2 == 0 else None, nf)], merge=True)
+
+    # DATA_QUALITY sheet: the profile's tables one under another, and all of it as JSON
+    if quality is not None:
+        with instrument.span('DATA_QUALITY'):
+            ws = wb.create_sheet('DATA_QUALITY')
+            for col, width in zip('ABCDEF', (40, 22, 14, 10, 10, 10)):
+                ws.column_dimensions[col].width = width
+            r = add_row(ws, 1, [cell(ws, f'DATA QUALITY PROFILE — {quality["rows"]:,} rows × {quality["cols"]} columns',
+                                     hdr_fill, bw)], merge=True)
+            for title, table in [('Rows flagged per cleaning rule', profiling.rule_table(quality['dq'])),
+                                 ('Columns', quality['columns']),
+                                 ('Datetime layouts (text shape, digits as 9)', quality['layouts']),
+                                 ('Flag encodings', quality['encodings'])]:
+                r = add_row(ws, r)
+                r = add_row(ws, r, [cell(ws, title, sub_fill, bw)], merge=True)
+                xlsx_writer.write_frame(ws, table, hdr_fill, Font(bold=True, color='FFFFFF', size=11))
+                r += len(table) + 1
+            side = f'{os.path.splitext(out)[0]}_DATA_QUALITY.json'
+            ingest.write_json(side, profiling.records(quality))
+            print(f"  DATA_QUALITY: {len(quality['columns'])} columns profiled, JSON in {side}", flush=True)
+
+    # CLEANED_DATA sheet(s)
+    if df is not None:
+        with instrument.span('CLEANED_DATA', rows=len(df)):
+            if CLEANED_EXPORT == 'sheets':
+                print(f"  Writing {len(df):,} rows to CLEANED_DATA...", flush=True)
+                names = xlsx_writer.write_split_frame(wb, 'CLEANED_DATA', df, hdr_fill, bw)
+                print(f"  {', '.join(names)} done", flush=True)
+            else:
+                side = f'{os.path.splitext(out)[0]}_CLEANED_DATA.{CLEANED_EXPORT}'
+                print(f"  Writing {len(df):,} rows to {side}...", flush=True)
+                xlsx_writer.write_sidecar(df, side, CLEANED_EXPORT)
+                xlsx_writer.write_link_sheet(wb.create_sheet('CLEANED_DATA'), side, df, hdr_fill, bw)
+
+    # EXECUTIVE_SUMMARY
+    if summary:
+        with instrument.span('EXECUTIVE_SUMMARY'):
+            ws = wb.create_sheet('EXECUTIVE_SUMMARY')
+            ws.column_dimensions['A'].width = 42
+            ws.column_dimensions['B'].width = 80
+
+            r = add_row(ws, 1, [cell(ws, 'EXECUTIVE SUMMARY — Infinity Learn Student Performance Report', hdr_fill, bw)],
+                        height=30, merge=True)
+            r = add_row(ws, r)
+
+            # every figure is derived from the results' stored stats (insights.py), nothing is rescanned
+            fills = [yel_fill, red_fill, grn_fill, grn_fill]
+            for si, (header, items) in enumerate(insights.summary(results)):
+                r = add_row(ws, r, [cell(ws, header, sub_fill, bw)], height=25, merge=True)
+                for title, detail in items:
+                    r = add_row(ws, r, [cell(ws, title, fills[si], bb), cell(ws, detail, font=nf, alignment=wrap)], height=40)
+                r = add_row(ws, r)
+
+            # Footer
+            add_row(ws, r, [cell(ws, "Computed from this run's ANALYSIS_* tables. Effects are Cohen's d (means) or h (rates); "
+                                     'p-values are two-sided.', font=Font(italic=True, size=9, color='666666'))])
+
+    # Analysis sheets
+    hdr_bw = Font(bold=True, color='FFFFFF', size=11)
+    for sname, data in analysis_sheets.items():
+        with instrument.span(sname, rows=len(data)):
+            ws = wb.create_sheet(sname)
+            xlsx_writer.write_frame(ws, data, hdr_fill, hdr_bw)
+    return wb
+
+
+def write_tables(out, info, df, results, sheets=None, summary=True, quality=None):
+    """The output as one FORMAT file per table in the directory `out`: CLEANED_DATA, ANALYSIS_*,
+    EXECUTIVE_SUMMARY (section, item, detail), DQ_RULES (the Understanding sheet's rule counts) and
+    the DATA_QUALITY profile's tables, with the profile as DATA_QUALITY.json."""
+    print(f"\n=== WRITING {FORMAT.upper()} TABLES ===", flush=True)
+    os.makedirs(out, exist_ok=True)
+    tables = {f'ANALYSIS_{key}': data for key, data in results.items() if sheets is None or key in sheets}
+    if summary:
+        tables['EXECUTIVE_SUMMARY'] = pd.DataFrame(
+            [(header, title, detail) for header, items in insights.summary(results) for title, detail in items],
+            columns=['Section', 'Item', 'Detail'])
+    if info is not None:
+        tables['DQ_RULES'] = profiling.rule_table(info['dq'])
+    if quality is not None:
+        tables.update({f'DATA_QUALITY_{k.upper()}': quality[k] for k in ('columns', 'layouts', 'encodings')})
+        ingest.write_json(os.path.join(out, 'DATA_QUALITY.json'), profiling.records(quality))
+    if df is not None:
+        tables['CLEANED_DATA'] = df
+    for name, data in tables.items():
+        with instrument.span(name, rows=len(data)):
+            xlsx_writer.write_sidecar(data, os.path.join(out, f'{name}.{FORMAT}'), FORMAT)
+    return list(tables)
+
+
+def write_output(xlsx, out, info, df, results, want, keep=False, quality=None):
+    """Write the parts and sections `want` names to `out`: a workbook, returned, or with a FORMAT other
+    than 'xlsx' a directory of tables (None is returned)."""
+    sheets = [name for part in want if part in SECTIONS for name in SECTIONS[part][1]]
+    with instrument.span('export'):
+        if FORMAT != 'xlsx':
+            names = write_tables(out, info, df, results, sheets, 'summary' in want, quality)
+            print(f"✅ DONE! Tables in {out}: {names}", flush=True)
+            return None
+        wb = export(xlsx, info, df, results, out, sheets, 'summary' in want, keep, quality)
+    save(wb, out)
+    print(f"✅ DONE! Sheets: {wb.sheetnames}", flush=True)
+    return wb
+
+
+def report_path(xlsx):
+    """A new run report path in the workbook's reports dir, which keeps the last REPORTS_KEPT runs."""
+    stem = os.path.splitext(os.path.basename(xlsx))[0]
+    d = os.path.join(ingest.cache_dir(xlsx), f'{stem}.reports')
+    if os.path.isdir(d):
+        runs = sorted({os.path.splitext(f)[0] for f in os.listdir(d) if f.startswith('run-')})
+        for old in runs[:max(0, len(runs) - REPORTS_KEPT + 1)]:
+            for ext in ('.json', '.prof'):
+                if os.path.exists(os.path.join(d, old + ext)):
+                    os.remove(os.path.join(d, old + ext))
+    # to the microsecond, so runs in one process within a second (batch, bench loops) get a report each
+    now = time.time()
+    stamp = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now % 1 * 1e6):06d}"
+    return os.path.join(d, f"run-{stamp}-{os.getpid()}.json")
+
+
+def save(wb, xlsx):
+    with instrument.span('save', title=f"\nSaving to: {xlsx}"):
+        xlsx_writer.save(wb, xlsx)
+
+
+def run(xlsx=XLSX, report_to=None):
+    """Bring the output (`xlsx`, or the OUTPUT report) up to date and write the run report
+    (to `report_to` or the cache's reports dir)."""
+    instrument.reset()
+    try:
+        _run(xlsx)
+    finally:
+        instrument.save(report_to or report_path(xlsx), xlsx=xlsx, output=output_path(xlsx), workers=WORKERS,
+                        chunk_rows=CHUNK_ROWS, incremental=INCREMENTAL, cleaned_export=CLEANED_EXPORT,
+                        only=ONLY, sample=SAMPLE, format=FORMAT, skip_cleaned=SKIP_CLEANED)
+
+
+def store_path(xlsx):
+    if isinstance(STORE, str):
+        return STORE
+    stem = os.path.splitext(os.path.basename(xlsx))[0]
+    return os.path.join(ingest.cache_dir(xlsx), f'{stem}.sqlite')
+
+
+def write_store(path, rows, S, key=None):
+    """The analysis `rows` and their cube state written to the store at `path`."""
+    eng = engine(S)
+    cols, squares = eng.columns()[eng.cubes[0]]
+    with instrument.span('store', title="\n=== STORE ===", rows=len(rows)):
+        db = store.Writer(path)
+        try:
+            db.facts(rows)
+            db.close(aggregate.partial(rows, eng.cubes[0], cols, squares), key)
+        except BaseException:
+            db.abort()
+            raise
+
+
+def update_store(r):
+    """write_store for a Run, unless the store was built from the same rows and code."""
+    path, S = store_path(r.xlsx), r.get('schema')
+    key = hashlib.sha1((r.key('features') + incremental.spec_key(engine(S)) + code_version(store.Writer)).encode())
+    if store.current(path, key.hexdigest()):
+        print(f"[store] up to date: {path}", flush=True)
+        return
+    write_store(path, r.get('features'), S, key.hexdigest())
+
+
+def _run(xlsx):
+    out = output_path(xlsx)
+    # writing into the source changes its bytes but not Raw_data; re-stamp the ingest cache for it
+    in_place = os.path.abspath(out) == os.path.abspath(xlsx)
+    if CHUNK_ROWS:
+        want = wanted()
+        with instrument.span('chunked') as sp:
+            info, cleaned, results = chunked_run(xlsx, CHUNK_ROWS)
+            sp['rows'] = info['rows']
+        wb = write_output(xlsx, out, info, cleaned if 'cleaned' in want else None, results, want,
+                          quality=info['quality'] if 'quality' in want else None)
+        cleaned.remove()
+        if in_place and wb:
+            ingest.mark_fresh(xlsx, ingest.sheet_names(xlsx)[0], wb.sheetnames)
+        return
+    r = Run(xlsx)
+    if STORE:
+        update_store(r)
+    want = wanted(ONLY)
+    key = export_key(r)
+    if ONLY is None and FORMAT == 'xlsx' and up_to_date(r, key):
+        print(f"✅ {out} is up to date, nothing to do", flush=True)
+        return
+    info = dict(r.get('profile'), dq=r.get('dq')) if 'understanding' in want else None
+    prof = r.get('quality') if 'quality' in want else None
+    df = r.get('transform') if 'cleaned' in want else None
+    # the summary reads every section
+    results = r.results(list(SECTIONS) if 'summary' in want else [p for p in want if p in SECTIONS])
+    wb = write_output(xlsx, out, info, df, results, want, keep=ONLY is not None, quality=prof)
+    if wb is None:
+        return
+    if in_place:
+        ingest.mark_fresh(xlsx, r.sheet, wb.sheetnames)
+    if ONLY is None:
+        os.makedirs(r.memo_dir, exist_ok=True)
+        st = os.stat(out)
+        ingest.write_json(_export_marker(r), {'key': key, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns,
+                                              'sha1': ingest.content_hash(out)})
+
+
+def batch_run(spec, out, report_to=None):
+    """One report `out` over every workbook `spec` names (batch.paths), duplicate sessions dropped.
+
+    Each workbook is read through its own ingest cache, WORKERS at a time;
+    the stacked rows go through the same stages as one workbook's, unmemoized,
+    and the store (with STORE) goes next to `out`."""
+    instrument.reset()
+    try:
+        files = batch.paths(spec)
+        with instrument.span('ingest', title=f"=== BATCH: {len(files)} workbooks -> {out} ===") as sp:
+            raw = batch.load(files, WORKERS)
+            S = resolve_schema(raw)
+            role = S['roles']
+            keys = [role[r] for r in ('student', 'class_id', 'class_start') if role[r]]
+            raw = batch.dedupe(raw, keys, role['class_start'])
+            sp['rows'] = len(raw)
+        info = profile(raw)
+        with instrument.span('typed'):
+            t = typed(raw, S)
+        with instrument.span('quality'):
+            prof = quality(raw, t, S)
+        with instrument.span('clean', rows=len(t)):
+            cleaned, tables = parallel_clean(t, S, WORKERS) if WORKERS > 1 else (clean(t, S), None)
+        info['dq'] = dq(cleaned)
+        df = None
+        if not SKIP_CLEANED:
+            with instrument.span('transform'):
+                df = transform(cleaned, S)
+        with instrument.span('features'):
+            rows = features(t, cleaned, S)
+        with instrument.span('analysis'):
+            # the workers' engine tables, when they computed them, make the same sheets as analysis()
+            results = analysis(rows, S) if tables is None else report(tables)
+        with instrument.span('trends'):
+            results.update(trends(rows, history(rows, S)))
+        if STORE:
+            write_store(STORE if isinstance(STORE, str) else f'{os.path.splitext(out)[0]}.sqlite', rows, S)
+        write_output(None, out, info, df, results, wanted(), quality=prof)
+    finally:
+        instrument.save(report_to or report_path(out), batch=spec, output=out, workers=WORKERS,
+                        cleaned_export=CLEANED_EXPORT)
+
+
+def _only(text):
+    parts = [p.strip().lower() for p in text.split(',') if p.strip()]
+    bad = [p for p in parts if p not in SECTIONS and p not in PARTS]
+    if bad or not parts:
+        raise argparse.ArgumentTypeError(f"{', '.join(bad) or 'nothing'}: choose from {', '.join([*SECTIONS, *PARTS])}")
+    return parts
+
+
+def _share(text):
+    share = float(text[:-1]) / 100 if text.endswith('%') else float(text)
+    if not 0 < share <= 1:
+        raise argparse.ArgumentTypeError(f'{text}: a percentage (5%) or a fraction in (0, 1]')
+    return share
+
+
+def main(argv=None):
+    global WORKERS, OUTPUT, REPORT_RAW, STORE, ONLY, SKIP_CLEANED, FORMAT, SAMPLE
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument('input', nargs='?', default=XLSX, help=f'source workbook (default {XLSX})')
+    ap.add_argument('out', metavar='output', nargs='?', help='report workbook, or directory with --format parquet/csv (same as --output)')
+    ap.add_argument('--workers', type=int, default=WORKERS,
+                    help=f'processes cleaning and aggregating Raw_data partitions (default {WORKERS}: in this process)')
+    ap.add_argument('--output', metavar='XLSX',
+                    help='write the derived sheets to this report workbook and leave the source untouched')
+    ap.add_argument('--batch', metavar='DIR|GLOB', nargs='+',
+                    help='combine every workbook in a directory or matching a glob into one --output report')
+    ap.add_argument('--with-raw', action='store_true',
+                    help="with --output: copy the source's own sheets (Raw_data, ...) into the report")
+    ap.add_argument('--store', nargs='?', const=True, metavar='SQLITE',
+                    help='also write the analytics store (facts + cube) for store.py; default .ingest_cache/<workbook>.sqlite')
+    ap.add_argument('--only', type=_only, metavar='4.2,4.4',
+                    help=f"write only these sections ({', '.join(SECTIONS)}) and parts ({', '.join(PARTS)}), "
+                         'updating an existing report in place and computing from the cached stages')
+    ap.add_argument('--skip-cleaned-data', action='store_true', help='leave out the CLEANED_DATA sheet')
+    ap.add_argument('--sample', type=_share, metavar='SHARE',
+                    help='analyse a share of the rows (5%% or 0.05), drawn within every exam x grade (for a quick look)')
+    ap.add_argument('--format', choices=['xlsx', 'parquet', 'csv'], default=FORMAT,
+                    help='xlsx: one workbook; parquet/csv: one file per table in a directory')
+    ap.add_argument('--report', help='run report JSON path (default .ingest_cache/<workbook>.reports/run-<time>.json)')
+    ap.add_argument('--profile', metavar='SPAN', help="run one span under cProfile, e.g. 'clean' or 'export/CLEANED_DATA'")
+    ap.add_argument('--tracemalloc', metavar='SPAN', help='trace allocations of one span with tracemalloc')
+    args = ap.parse_args(argv)
+    WORKERS = max(1, args.workers)
+    OUTPUT, REPORT_RAW = args.out or args.output or OUTPUT, args.with_raw or REPORT_RAW
+    STORE = args.store or STORE
+    ONLY, SKIP_CLEANED, FORMAT = args.only or ONLY, args.skip_cleaned_data or SKIP_CLEANED, args.format
+    SAMPLE = args.sample or SAMPLE
+    if args.batch:
+        if not OUTPUT:
+            ap.error('--batch needs --output')
+        batch_run(args.batch, OUTPUT, report_to=args.report)
+        return
+    instrument.PROFILE, instrument.TRACEMALLOC = args.profile, args.tracemalloc
+    run(args.input, report_to=args.report)
+
+
+if __name__ == '__main__':
+    main()
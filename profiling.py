@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Data quality profile of Raw_data, from one pass over its columns and no datetime parsing.
+
+    prof = profiling.report(profiling.scan(typed, S, dtypes=raw.dtypes))
+    prof['columns']     # per column: nulls, distinct values, numbers vs text, min / max, most frequent
+    prof['layouts']     # per datetime column: rows in each layout (the shape of its text, digits as 9)
+    prof['encodings']   # per flag column: rows of each spelling and what it reads as
+    prof['dq']          # rows each cleaning rule (rules.RULES) flags
+
+Each column is factorized once (a categorical of the typed frame is
+already) and everything else is worked out per distinct value and weighted
+by its rows. Up to EXACT_DISTINCT values are kept (the flag spellings, and
+exact distinct counts over chunks); a scan of one frame counts its distinct
+values exactly however many there are. A `mergeable` scan (a chunk) keeps a
+HyperLogLog (sketch.Distinct) of the columns past that instead, so its state
+stays small and the states of several chunks merge() into the profile of
+all.
+The rule counts come from rules.apply with nothing fixed, on the numbers
+and flags clean() reads. A datetime's layout is its text shape, which is
+its strftime layout for zero-padded text; DQ1 (not in the column's main
+layout) is counted from the rows of every combination of shapes, once the
+main layouts of the whole input are known.
+"""
+import json
+import numpy as np
+import pandas as pd
+import dates, normalize, rules, sketch
+
+EXACT_DISTINCT = 10_000   # distinct values kept per column; past it a mergeable scan keeps a HyperLogLog
+DATETIME_ROLES = ('class_start', 'class_end', 'actual_start', 'actual_end')
+# flag role -> the labels its spellings read as, or None for submission counts
+FLAGS = {'attendance': normalize.ATTENDANCE, 'cancel': normalize.CANCEL, 'cw_submitted': None, 'hw_submitted': None}
+SHAPE = str.maketrans('0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ', '9' * 10 + 'a' * 52)
+SHAPE_BYTES = np.frombuffer(bytes(range(256)).decode('latin-1').translate(SHAPE).encode('latin-1'), dtype=np.uint8)
+NATIVE, BLANK = 'datetime', 'blank'   # layouts of Excel date cells and of empty cells
+
+
+def _shapes(u, text):
+    """The layout of each value in `u`: its text shape, NATIVE, BLANK or <type name>."""
+    out = np.empty(len(u), dtype=object)
+    t = u[text]
+    try:
+        # ASCII text mapped a byte at a time, in one array
+        b = t.astype('S')
+        codes, shapes = pd.factorize(SHAPE_BYTES[b.view(np.uint8)].view(b.dtype))
+        shaped = np.array([k.decode() for k in shapes], dtype=object)[codes]
+    except UnicodeEncodeError:
+        shaped = np.array([v.translate(SHAPE) for v in t], dtype=object)
+    # text reading as a missing datetime (only text shaped like one can be)
+    maybe = np.flatnonzero(np.isin(shaped, list({v.translate(SHAPE) for v in dates.NAT_STRINGS})))
+    shaped[maybe[np.isin(t[maybe], list(dates.NAT_STRINGS))]] = BLANK
+    out[text] = shaped
+    out[~text] = [NATIVE if hasattr(v, 'year') else f'<{type(v).__name__}>' for v in u[~text]]
+    return out
+
+
+def _parses(shape):
+    # text with no digit in it is in no datetime layout; other cells go to pd.to_datetime as they are
+    return shape != BLANK and (shape == NATIVE or shape.startswith('<') or '9' in shape)
+
+
+def _column(s, datetime=False, mergeable=False):
+    """The state of one column and, for a datetime, each row's shape code and the shapes they index."""
+    if isinstance(s.dtype, pd.CategoricalDtype):   # the typed frame: its categories are the values
+        codes, uniques, dtype = s.cat.codes.to_numpy(), s.cat.categories, s.cat.categories.dtype
+    else:
+        (codes, uniques), dtype = pd.factorize(s), s.dtype
+    counts = np.bincount(codes + 1, minlength=len(uniques) + 1)[1:]   # code -1 (null) lands in the dropped bin
+    st = {'dtype': str(dtype), 'rows': len(s), 'nulls': int((codes < 0).sum()), 'numbers': 0, 'texts': 0,
+          'num': None, 'text': None, 'values': None, 'hll': None, 'shapes': None, 'distinct': len(uniques),
+          'top': (uniques[counts.argmax()], int(counts.max())) if len(uniques) else (None, None)}
+    u = np.asarray(uniques, dtype=object)
+    if pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+        numeric, text = np.ones(len(u), dtype=bool), np.zeros(len(u), dtype=bool)
+    else:
+        # classified per type, and the types of a column are few
+        tcodes, types = pd.factorize(pd.Series(u, dtype=object).map(type))
+        kinds = np.array([[issubclass(t, (int, float, np.number)) and not issubclass(t, (bool, np.bool_)),
+                           issubclass(t, str)] for t in types] + [[False, False]], dtype=bool)
+        numeric, text = kinds[tcodes, 0], kinds[tcodes, 1]
+    st['numbers'], st['texts'] = int(counts[numeric].sum()), int(counts[text].sum())
+    if numeric.any():
+        num = u[numeric].astype(float)
+        cast = int if s.dtype.kind in 'iu' else float
+        st['num'] = (cast(num.min()), cast(num.max()))
+    if text.any() and not datetime:   # across layouts a datetime's text min / max says nothing
+        st['text'] = (min(u[text]), max(u[text]))
+    if len(u) <= EXACT_DISTINCT:
+        st['values'] = dict(zip(u.tolist(), counts.tolist()))
+    elif mergeable:
+        st['hll'] = sketch.Distinct().update(u)
+    if not datetime:
+        return st, None
+    # the trailing BLANK is the shape of code -1 (null)
+    shape_codes, shapes = pd.factorize(np.append(_shapes(u, text), BLANK))
+    rows = np.bincount(shape_codes, weights=np.append(counts, st['nulls']), minlength=len(shapes)).astype(np.int64)
+    first = np.unique(shape_codes, return_index=True)[1]
+    st['shapes'] = {k: [int(n), u[i] if i < len(u) else None] for k, n, i in zip(shapes, rows, first) if n}
+    return st, (shape_codes[codes], list(shapes))
+
+
+def scan(raw, S, mergeable=False, dtypes=None):
+    """The profile state of `raw`: all of Raw_data, or with `mergeable` a slice to merge() with the others.
+
+    `raw` may be the typed frame, with Raw_data's own `dtypes` to report."""
+    role = S['roles']
+    dt = [role[r] for r in DATETIME_ROLES if role[r]]
+    columns, shapes = {}, {}
+    for c in raw.columns:
+        columns[c], row_shapes = _column(raw[c], c in dt, mergeable)
+        if dtypes is not None:
+            columns[c]['dtype'] = str(dtypes[c])
+        if row_shapes is not None:
+            shapes[c] = row_shapes
+
+    # what the rules read, as clean() has it; a datetime is 1.0 where it parses, and in layout 0 or none
+    df, layouts = raw.copy(deep=False), {}
+    for c, (row, names) in shapes.items():
+        code = np.array([0 if _parses(k) else dates.BLANK if k == BLANK else dates.UNPARSED for k in names],
+                        dtype=np.int8)[row]
+        layouts[c] = code
+        df[c] = np.where(code == 0, 1.0, np.nan)
+    for c in [role['attempt_duration']] + S['groups']['scores'] + S['groups']['max_scores']:
+        if c: df[c] = pd.to_numeric(df[c], errors='coerce')
+    for c in [role['cw_submitted'], role['hw_submitted']]:
+        if c: df[c] = normalize.submission(df[c])
+    none = np.zeros(len(raw), dtype=bool)
+    ctx = {'raw': raw, 'layouts': layouts,
+           'cancelled': (normalize.canonical(raw[role['cancel']], normalize.CANCEL) == 'Cancelled').to_numpy()
+           if role['cancel'] else none,
+           'absent': (normalize.canonical(raw[role['attendance']], normalize.ATTENDANCE) == 'Absent').to_numpy()
+           if role['attendance'] else none}
+    dq = rules.apply(df, rules.columns(S), ctx, [r for r in rules.RULES if r.when != 'other_layout'], fix=False)
+    names = [names for _, names in shapes.values()]
+    combos = {}
+    if shapes:
+        # rows of each combination of shapes, one bincount over the combined codes
+        dims = [len(n) for n in names]
+        n = np.bincount(np.ravel_multi_index([row for row, _ in shapes.values()], dims), minlength=int(np.prod(dims)))
+        combos = {tuple(n_[i] for n_, i in zip(names, key)): int(n[k])
+                  for k, key in zip(np.flatnonzero(n), zip(*np.unravel_index(np.flatnonzero(n), dims)))}
+    return {'rows': len(raw), 'roles': {c: r for r, c in role.items() if c}, 'columns': columns,
+            'datetimes': list(shapes), 'dq': dq, 'combos': combos}
+
+
+def _span(a, b):
+    # (min, max) over two ranges, either of which may be None
+    return a or b if a is None or b is None else (min(a[0], b[0]), max(a[1], b[1]))
+
+
+def _merge_column(a, b):
+    out = dict(a, rows=a['rows'] + b['rows'], nulls=a['nulls'] + b['nulls'], numbers=a['numbers'] + b['numbers'],
+               texts=a['texts'] + b['texts'], num=_span(a['num'], b['num']), text=_span(a['text'], b['text']))
+    if a['values'] is not None and b['values'] is not None:
+        values = dict(a['values'])
+        for v, n in b['values'].items():
+            values[v] = values.get(v, 0) + n
+        if len(values) <= EXACT_DISTINCT:
+            out['values'], out['hll'] = values, None
+            out['distinct'], out['top'] = len(values), max(values.items(), key=lambda kv: kv[1])
+            return _merge_shapes(out, a, b)
+    out['values'], out['top'] = None, (None, None)
+    out['hll'] = sketch.Distinct()
+    for side in (a, b):
+        if side['hll'] is not None:
+            out['hll'].merge(side['hll'])
+        else:
+            out['hll'].update(np.asarray(list(side['values']), dtype=object))
+    return _merge_shapes(out, a, b)
+
+
+def _merge_shapes(out, a, b):
+    if a['shapes'] is not None:
+        out['shapes'] = {k: list(v) for k, v in a['shapes'].items()}
+        for k, (n, example) in b['shapes'].items():
+            out['shapes'].setdefault(k, [0, example])[0] += n
+    return out
+
+
+def merge(states):
+    """One state for the slices whose states are `states`, as scan() of them stacked would give."""
+    out = None
+    for st in states:
+        if out is None:
+            out = dict(st, combos=dict(st['combos']))
+            continue
+        out['rows'] += st['rows']
+        out['columns'] = {c: _merge_column(out['columns'][c], st['columns'][c]) for c in out['columns']}
+        for k, n in st['combos'].items():
+            out['combos'][k] = out['combos'].get(k, 0) + n
+        out['dq'] = rules.total([out['dq'], st['dq']])
+    return out
+
+
+def _distinct(st):
+    return (st['hll'].count(), False) if st['hll'] is not None else (st['distinct'], True)
+
+
+def report(state):
+    """The profile tables of a scan() or merge() state; 'dq' as {rule name: rows}, DQ1 included."""
+    roles, rows = state['roles'], state['rows']
+    table = []
+    for c, st in state['columns'].items():
+        distinct, exact = _distinct(st)
+        lo, hi = st['num'] or st['text'] or (None, None)
+        top = st['top']
+        table.append((c, roles.get(c), st['dtype'], st['rows'], st['nulls'], round(100 * st['nulls'] / max(st['rows'], 1), 2),
+                      distinct, exact, st['numbers'], st['texts'], lo, hi, top[0], top[1]))
+    columns = pd.DataFrame(table, columns=['Column', 'Role', 'Dtype', 'Rows', 'Nulls', 'Null_Pct', 'Distinct',
+                                           'Distinct_Exact', 'Numbers', 'Text', 'Min', 'Max', 'Top_Value', 'Top_Rows'])
+
+    # each datetime's main layout: its most frequent one that parses, ties to native cells as in dates.parse
+    main, table = {}, []
+    for c in state['datetimes']:
+        shapes = sorted(state['columns'][c]['shapes'].items(), key=lambda kv: (-kv[1][0], kv[0] != NATIVE, kv[0]))
+        main[c] = next((k for k, _ in shapes if _parses(k)), None)
+        for k, (n, example) in shapes:
+            kind = 'main' if k == main[c] else 'other' if _parses(k) else 'missing' if k == BLANK else 'unparseable'
+            table.append((c, k, kind, n, round(100 * n / max(rows, 1), 2), example))
+    layouts = pd.DataFrame(table, columns=['Column', 'Layout', 'Kind', 'Rows', 'Pct', 'Example'])
+    other = sum(n for combo, n in state['combos'].items()
+                if any(k != main[c] and _parses(k) for c, k in zip(state['datetimes'], combo)))
+
+    table = []
+    for role, labels in FLAGS.items():
+        c = next((c for c, r in roles.items() if r == role), None)
+        if c is None or state['columns'][c]['values'] is None:
+            continue
+        values = state['columns'][c]['values']
+        u = pd.Series(list(values), dtype=object)
+        if labels is None:
+            reads, odd = normalize.submission(u), normalize.textual(u)
+        else:
+            reads, odd = normalize.canonical(u, labels).astype(object).fillna('(other)'), normalize.misspelled(u, labels)
+        # text as repr, so '1' and 1 or 'present ' and 'present' tell apart
+        table += [(c, repr(v) if isinstance(v, str) else v, n, r, not o)
+                  for v, n, r, o in zip(values, values.values(), reads, odd)]
+    encodings = pd.DataFrame(table, columns=['Column', 'Value', 'Rows', 'Reads_As', 'Canonical'])
+    encodings = (encodings.assign(_v=encodings['Value'].astype(str))   # ties in value order, however the input was coded
+                 .sort_values(['Column', 'Rows', '_v'], ascending=[True, False, True], ignore_index=True).drop(columns='_v'))
+
+    dq = {r.name: other if r.when == 'other_layout' else state['dq'].get(r.name, 0) for r in rules.RULES}
+    return {'rows': rows, 'cols': len(columns), 'columns': columns, 'layouts': layouts, 'encodings': encodings, 'dq': dq}
+
+
+def rule_table(dq):
+    """{rule name: rows} as the rule, its problem and the rows it flags."""
+    return pd.DataFrame([(r.name, r.text, dq.get(r.name, 0)) for r in rules.RULES], columns=['Rule', 'Problem', 'Rows'])
+
+
+def records(prof):
+    """`prof` as JSON-ready values: its tables as lists of row dicts, with the rule problems alongside."""
+    out = {k: json.loads(v.to_json(orient='records', date_format='iso', default_handler=str))
+           if isinstance(v, pd.DataFrame) else v for k, v in prof.items()}
+    out['rules'] = {r.name: r.text for r in rules.RULES}
+    return out
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Row cleaning rules: declared once, flagged as vectorized masks in one pass, counted per rule.
+
+A rule names the data quality problem it covers (DQ1..DQ10 on the
+Understanding sheet), the set of columns it checks, the condition that
+flags a cell and the fix, if any. Scores are compared with their own
+maximum only (SCORE_PAIRS), never with every max column.
+
+    counts = rules.apply(df, rules.columns(S, derived), ctx)
+
+Every mask is taken on the frame as it stands before any fix, then each
+fixed column is assigned once; where two rules fix the same cell the one
+listed later wins, so cancelled sessions end up blank whatever else they
+were flagged for.
+"""
+from collections import namedtuple
+import numpy as np
+import dates, normalize
+
+Rule = namedtuple('Rule', 'name text columns when fix')
+
+# score role -> the max role it is clamped to
+SCORE_PAIRS = [('cw_score', 'cw_max'), ('hw_score', 'hw_max')]
+
+RULES = [
+    Rule('DQ1', "Mixed datetime formats across CLASS/ACTUAL datetime columns (not in the column's main layout)",
+         'datetimes', 'other_layout', None),
+    Rule('DQ2', 'Missing ACTUAL datetimes for non-cancelled classes', 'actual_datetimes', 'missing', None),
+    Rule('DQ3', 'Negative attempt durations (impossible)', 'duration', 'negative', 'nan'),
+    Rule('DQ4', 'Absent students with an attempt duration recorded', 'duration', 'absent', 'nan'),
+    Rule('DQ5', 'Scores exceeding their max score', 'score_pairs', 'above_max', 'max'),
+    Rule('DQ6', 'Negative scores', 'scores', 'negative', 'zero'),
+    Rule('DQ7', 'Absent students with classwork/homework marked submitted', 'submitted', 'absent_submitted', 'zero'),
+    Rule('DQ8', 'Cancelled classes with actual data populated', 'actual', 'cancelled', 'nan'),
+    Rule('DQ9', 'Inconsistent attendance encoding (Present/1/Y/Yes)', 'attendance', 'misspelled', None),
+    Rule('DQ10', 'Mixed submission flag types (0/1 vs Yes/No vs True/False)', 'submitted', 'text', None),
+    Rule('unparsed', 'Datetimes in no recognisable layout', 'datetimes', 'unparsed', None),
+    Rule('cancelled', 'Cancelled classes with attempt or assessment data', 'session', 'cancelled', 'nan'),
+]
+
+
+def _layout(v, ctx):
+    # per-row dates.parse codes; a column that failed to parse counts as blank
+    return ctx['layouts'].get(v.name, np.full(len(v), dates.BLANK, dtype=np.int8))
+
+
+# name -> fn(values, paired max or None, ctx) giving the flagged cells; ctx holds the
+# pre-cleaning frame ('raw'), the datetime layout codes ('layouts') and the row masks
+# 'absent' and 'cancelled'
+CONDITIONS = {
+    'other_layout':     lambda v, mx, ctx: _layout(v, ctx) > 0,
+    'unparsed':         lambda v, mx, ctx: _layout(v, ctx) == dates.UNPARSED,
+    'missing':          lambda v, mx, ctx: ~ctx['cancelled'] & (_layout(v, ctx) == dates.BLANK),
+    'negative':         lambda v, mx, ctx: v.lt(0).to_numpy(),
+    'above_max':        lambda v, mx, ctx: v.gt(mx).to_numpy(),
+    'absent':           lambda v, mx, ctx: ctx['absent'] & v.notna().to_numpy(),
+    'absent_submitted': lambda v, mx, ctx: ctx['absent'] & v.gt(0).to_numpy(),
+    'cancelled':        lambda v, mx, ctx: ctx['cancelled'] & v.notna().to_numpy(),
+    'misspelled':       lambda v, mx, ctx: normalize.misspelled(ctx['raw'][v.name], normalize.ATTENDANCE),
+    'text':             lambda v, mx, ctx: normalize.textual(ctx['raw'][v.name]),
+}
+
+# name -> fn(values, paired max or None) giving the replacement for flagged cells
+FIXES = {'nan': lambda v, mx: np.nan, 'zero': lambda v, mx: 0, 'max': lambda v, mx: mx}
+
+
+def columns(S, derived=()):
+    """{column set: [(column, paired max column or None)]} the rules refer to, for this schema.
+
+    `derived` are the columns clean() computes from the ACTUAL datetimes,
+    blanked with them for cancelled classes."""
+    role, groups = S['roles'], S['groups']
+
+    def cols(names):
+        return [(c, None) for c in names if c]
+    return {
+        'datetimes': cols(role[r] for r in ('class_start', 'class_end', 'actual_start', 'actual_end')),
+        'actual_datetimes': cols(role[r] for r in ('actual_start', 'actual_end')),
+        'duration': cols([role['attempt_duration']]),
+        'score_pairs': [(role[s], role[m]) for s, m in SCORE_PAIRS if role[s] and role[m]],
+        'scores': cols(groups['scores']),
+        'submitted': cols([role['cw_submitted'], role['hw_submitted']]),
+        'attendance': cols([role['attendance']]),
+        'actual': cols(groups['actual'] + list(derived)),
+        'session': cols(groups['attempt'] + groups['assessment']),
+    }
+
+
+def apply(df, cols, ctx, rules=RULES, fix=True):
+    """Flag and fix `df` in place by `rules` (only count with `fix` off); returns {rule name: rows flagged}.
+
+    Rows are counted once per rule however many of its columns they fail."""
+    counts, fixes = {}, {}
+    for rule in rules:
+        flagged = np.zeros(len(df), dtype=bool)
+        for col, ref in cols[rule.columns]:
+            v, mx = df[col], None if ref is None else df[ref]
+            mask = CONDITIONS[rule.when](v, mx, ctx)
+            flagged |= mask
+            if fix and rule.fix and mask.any():
+                fixes.setdefault(col, []).append((mask, FIXES[rule.fix](v, mx)))
+        counts[rule.name] = int(flagged.sum())
+    for col, todo in fixes.items():
+        s = df[col]
+        for mask, value in todo:
+            s = s.mask(mask, value)
+        df[col] = s
+    return counts
+
+
+def total(counts):
+    """Per-rule counts of several slices of a frame (chunks, partitions) added up."""
+    out = {}
+    for c in counts:
+        for name, n in c.items():
+            out[name] = out.get(name, 0) + n
+    return out
+
+
+def describe(counts):
+    """The Understanding sheet's data quality lines: each DQ rule with the rows it flagged."""
+    return [f'{r.name}: {r.text} — {counts.get(r.name, 0):,} rows' for r in RULES if r.name.startswith('DQ')]
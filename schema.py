@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Schema resolution: map logical roles to Raw_data columns in one pass over the header"""
+import re
+
+# role -> alternatives tried in order; each is (keywords that must all match, keywords that must not)
+ROLES = {
+    'student':        [(('STUDENT', 'ID'), ()), (('STUDENT', 'NAME'), ()), (('STUDENT',), ('SCORE',))],
+    'teacher':        [(('TEACHER', 'ID'), ()), (('TEACHER', 'NAME'), ()), (('TEACHER',), ('LATE',)),
+                       (('FACULTY',), ())],
+    'exam':           [(('EXAM',), ()), (('COURSE',), ()), (('BATCH',), ()), (('PROGRAM',), ())],
+    'grade':          [(('GRADE',), ()), (('STANDARD',), ())],
+    'class_id':       [(('CLASS', 'ID'), ())],
+    'class_start':    [(('CLASS', 'START', 'DATE'), ()), (('CLASS', 'START', 'TIME'), ()), (('CLASS', 'START'), ())],
+    'class_end':      [(('CLASS', 'END', 'DATE'), ()), (('CLASS', 'END', 'TIME'), ()), (('CLASS', 'END'), ())],
+    'actual_start':   [(('ACTUAL', 'START', 'DATE'), ()), (('ACTUAL', 'START', 'TIME'), ()), (('ACTUAL', 'START'), ())],
+    'actual_end':     [(('ACTUAL', 'END', 'DATE'), ()), (('ACTUAL', 'END', 'TIME'), ()), (('ACTUAL', 'END'), ())],
+    'attendance':     [(('ATTENDANCE',), ())],
+    'cancel':         [(('CANCEL',), ()), (('STATUS',), ())],
+    'attempt_duration': [(('ATTEMPT', 'DURATION'), ()), (('ATTEMPT',), ())],
+    'delay':          [(('LATE', 'MINS'), ()), (('DELAY',), ())],
+    'rating':         [(('RATING',), ('TUTOR',)), (('RATE', 'EXPERIENCE'), ()), (('RATE',), ('TUTOR',))],
+    'tutor_rating':   [(('TUTOR', 'HELP'), ()), (('TUTOR', 'RATING'), ())],
+    'cw_score':       [(('CW', 'SCORE'), ('MAX',)), (('CLASSWORK', 'SCORE'), ('MAX',))],
+    'cw_max':         [(('CW', 'MAX'), ()), (('CLASSWORK', 'MAX'), ())],
+    'hw_score':       [(('HOMEWORK', 'SCORE'), ('MAX',)), (('HW', 'SCORE'), ('MAX',)),
+                       (('ASSIGNMENT', 'SCORE'), ('MAX',)), (('SCORE',), ('MAX', 'CW', 'CLASSWORK'))],
+    'hw_max':         [(('HOMEWORK', 'MAX'), ()), (('HW', 'MAX'), ()), (('ASSIGNMENT', 'MAX'), ()),
+                       (('MAX', 'SCORE'), ('CW', 'CLASSWORK'))],
+    'cw_submitted':   [(('CW', 'SUBMIT'), ()), (('CLASSWORK', 'SUBMIT'), ())],
+    'cw_given':       [(('CW', 'GIVEN'), ()), (('CLASSWORK', 'GIVEN'), ())],
+    'hw_submitted':   [(('HOMEWORK', 'SUBMIT'), ()), (('HW', 'SUBMIT'), ()), (('ASSIGNMENT', 'SUBMIT'), ('CW',))],
+    'hw_given':       [(('HOMEWORK', 'GIVEN'), ()), (('HW', 'GIVEN'), ()), (('ASSIGNMENT', 'GIVEN'), ('CW',))],
+}
+
+# group -> alternatives whose matches are all collected, in header order
+GROUPS = {
+    'actual':     [(('ACTUAL',), ())],
+    'attempt':    [(('ATTEMPT',), ()), (('DURATION',), ('CLASS',))],
+    'assessment': [(('SCORE',), ()), (('ASSIGN',), ()), (('CLASSWORK',), ()), (('HOMEWORK',), ())],
+    'scores':     [(('SCORE',), ('MAX',))],
+    'max_scores': [(('MAX', 'SCORE'), ())],
+    'submitted':  [(('SUBMIT',), ())],
+}
+
+def tokens(col):
+    return [t for t in re.split(r'[^0-9A-Z]+', str(col).upper()) if t]
+
+
+class HeaderIndex:
+    """Token index over a header: keyword -> positions of columns having a
+    token that starts with it ('SUBMIT' matches NO_OF_..._SUBMITTED)."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self._postings = {}
+        for i, c in enumerate(self.columns):
+            for t in tokens(c):
+                self._postings.setdefault(t, set()).add(i)
+        self._memo = {}
+
+    def _with(self, kw):
+        if kw not in self._memo:
+            self._memo[kw] = set().union(*[p for t, p in self._postings.items() if t.startswith(kw)])
+        return self._memo[kw]
+
+    def match(self, keywords, exclude=()):
+        hit = set.intersection(*[self._with(k) for k in keywords])
+        for k in exclude:
+            hit -= self._with(k)
+        return sorted(hit)
+
+    def first(self, alternatives):
+        for keywords, exclude in alternatives:
+            hit = self.match(keywords, exclude)
+            if hit:
+                return self.columns[hit[0]]
+        return None
+
+    def all(self, alternatives):
+        hit = set()
+        for keywords, exclude in alternatives:
+            hit.update(self.match(keywords, exclude))
+        return [self.columns[i] for i in sorted(hit)]
+
+
+def resolve(columns):
+    """{'roles': {role: column or None}, 'groups': {group: [columns]}} for this header."""
+    idx = HeaderIndex(columns)
+    return {'roles': {r: idx.first(alts) for r, alts in ROLES.items()},
+            'groups': {g: idx.all(alts) for g, alts in GROUPS.items()}}
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Local analytics store: the analysis rows and the engine's cube state in one SQLite file.
+
+    python store.py .ingest_cache/Assignment_data_dictionary.sqlite DAY HOUR_BUCKET
+
+Tables:
+    facts  one row per Raw_data row, as pipeline.features() computes it
+    cube   the cube's partial state (aggregate.partial): one row per observed
+           combination of its keys, with '__rows' and '<col>|n' / '<col>|sum'
+           (and '<col>|sumsq') per value column
+    meta   what the file was built from, so an unchanged run skips the write
+
+Any slice over the cube keys is a GROUP BY over the cube's few thousand
+rows, finalized the way the ANALYSIS_* tables are; anything else can be
+asked of facts.
+"""
+import json, os, sqlite3, sys, time
+import pandas as pd
+import aggregate
+
+BATCH = 50_000   # fact rows per executemany
+
+
+def _connect(path):
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=OFF')
+    conn.execute('PRAGMA synchronous=OFF')
+    return conn
+
+
+def meta(path):
+    """The meta row of the store at `path`, or None."""
+    if not os.path.exists(path):
+        return None
+    try:
+        with sqlite3.connect(path) as conn:
+            key, dims, built = conn.execute('SELECT key, dims, built FROM meta').fetchone()
+    except (sqlite3.Error, TypeError):
+        return None
+    return {'key': key, 'dims': json.loads(dims), 'built': built}
+
+
+def current(path, key):
+    return key is not None and (meta(path) or {}).get('key') == key
+
+
+def _sqlable(df):
+    # categories and datetimes as text, so the file reads back without pandas
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            s = s.astype(object)
+        elif pd.api.types.is_datetime64_any_dtype(s.dtype):
+            s = s.dt.strftime('%Y-%m-%d %H:%M:%S')
+        out[c] = s.astype(object).where(s.notna(), None)
+    return pd.DataFrame(out)
+
+
+class Writer:
+    """Builds the store beside `path` and moves it into place on close(), so readers never see half a file."""
+
+    def __init__(self, path):
+        self.path, self.tmp = path, f'{path}.{os.getpid()}.tmp'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+        self.conn, self.rows = _connect(self.tmp), 0
+
+    def facts(self, df):
+        """Append analysis rows (a whole frame, or one chunk at a time)."""
+        df = _sqlable(df)
+        cols = ', '.join(f'"{c}"' for c in df.columns)
+        if not self.rows:
+            self.conn.execute(f'CREATE TABLE facts ({cols})')
+        sql = f'INSERT INTO facts VALUES ({", ".join("?" * len(df.columns))})'
+        for i in range(0, len(df), BATCH):
+            self.conn.executemany(sql, df.iloc[i:i + BATCH].itertuples(index=False, name=None))
+        self.rows += len(df)
+
+    def close(self, cube, key=None):
+        """Write the cube state (indexed by its keys) and the meta row, and publish the file."""
+        dims = list(cube.index.names)
+        _sqlable(cube.reset_index()).to_sql('cube', self.conn, index=False)
+        for d in dims:
+            self.conn.execute(f'CREATE INDEX "cube_{d}" ON cube ("{d}")')
+        self.conn.execute('CREATE TABLE meta (key TEXT, dims TEXT, built TEXT)')
+        self.conn.execute('INSERT INTO meta VALUES (?, ?, ?)',
+                          (key, json.dumps(dims), time.strftime('%Y-%m-%d %H:%M:%S')))
+        self.conn.commit()
+        self.conn.close()
+        os.replace(self.tmp, self.path)
+        print(f"  Store: {self.rows:,} fact rows, {len(cube):,} cube cells -> {self.path}", flush=True)
+
+    def abort(self):
+        """Drop the half-built store; the published one, if any, is left as it was."""
+        self.conn.close()
+        if os.path.exists(self.tmp):
+            os.remove(self.tmp)
+
+
+def state(path, by):
+    """The cube state rolled up to the keys `by`, summed in SQLite (null keys are labels of their own)."""
+    by = [by] if isinstance(by, str) else list(by)
+    with sqlite3.connect(path) as conn:
+        cols = [r[1] for r in conn.execute('PRAGMA table_info(cube)')]
+        dims = json.loads(conn.execute('SELECT dims FROM meta').fetchone()[0])
+        unknown = [b for b in by if b not in dims]
+        if unknown:
+            raise ValueError(f'{unknown} not in the cube; slice by any of {dims}')
+        values = [c for c in cols if c not in dims]
+        keys = ', '.join(f'"{b}"' for b in by)
+        sums = ', '.join(f'SUM("{c}") AS "{c}"' for c in values)
+        df = pd.read_sql(f'SELECT {keys}, {sums} FROM cube GROUP BY {keys} ORDER BY {keys}', conn)
+    return df.set_index(by)
+
+
+def table(path, by, spec=None):
+    """Table of the store's cube by `by`: `spec` as aggregate.finalize takes it, or rows plus every column's mean."""
+    st = state(path, by)
+    if spec is None:
+        spec = {'Rows': ('', 'size')}
+        spec.update({c[:-2]: (c[:-2], 'mean') for c in st.columns if c.endswith('|n')})
+    return aggregate.finalize(st, spec)
+
+
+def main(argv):
+    if len(argv) < 2:
+        sys.exit(__doc__.splitlines()[2].strip())
+    path, by = argv[0], argv[1:]
+    t = time.perf_counter()
+    out = table(path, by)
+    with pd.option_context('display.max_rows', 200, 'display.max_columns', None, 'display.width', 200):
+        print(out.round(3))
+    print(f"{len(out):,} rows in {(time.perf_counter() - t) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Synthetic Raw_data workbooks: the real sheet's schema with its data quality problems.
+
+Usage: python synth.py rows out.xlsx [seed]
+
+Every problem listed on the Understanding sheet is present: mixed datetime
+formats (three text layouts plus native Excel dates), missing actual times,
+negative and over-max scores, negative attempt durations, absent students
+with durations and submissions, cancelled classes with actual times, and
+mixed attendance and submission encodings.
+"""
+import sys
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+import xlsx_writer
+
+COLUMNS = ['STUDENT ID', 'CLASS_ID', 'TEACHER_NAME', 'EXAM', 'GRADE', 'CLASS_START_DATETIME', 'CLASS_END_DATETIME',
+           'ACTUAL_START_DATETIME', 'ACTUAL_END_DATETIME', 'CLASS_STATUS', 'CLASS_ATTENDANCE', 'ATTEMPT_DURATION_MINS',
+           'TEACHER_IS_LATE_BY_MINS', 'NUM_OF_CW_ASSIGNMENTS_GIVEN', 'NO_OF_CW_ASSIGNMENTS_SUBMITTED',
+           'CW_STUDENT_SCORE_ACHIEVED', 'CW_MAX_ACHIEVABLE_SCORE', 'NUM_OF_ASSIGNMENTS_GIVEN',
+           'NO_OF_ASSIGNMENTS_SUBMITTED', 'STUDENT_SCORE_ACHIEVED', 'MAX_ACHIEVABLE_SCORE',
+           'PLEASE_RATE_YOUR_OVERALL_EXPERIENCE', 'DID_THE_TUTOR_HELP_YOU_UNDERSTAND_THE_TOPIC_OF_THE_CLASS']
+EXAMS = ['JEE', 'NEET', 'CBSE', 'Foundation']
+ATTENDANCE = ['Present', '1', 'Y', 'Yes', 'present ', 'Absent', '0', 'N', 'No']
+# datetime layouts in order of frequency; the first one is each column's main layout
+DATETIME_FORMATS = ['%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M', '%Y/%m/%d %I:%M %p']
+
+
+def raw_frame(n, seed=0):
+    """`n` Raw_data rows, reproducible for a given `seed`."""
+    rng = np.random.default_rng(seed)
+    cls = rng.integers(1, max(n // 30, 2), n)
+    start = pd.Series(pd.Timestamp('2024-01-01') + pd.to_timedelta(cls % 60, unit='D')
+                      + pd.to_timedelta(8 + cls % 13, unit='h'))
+    delay = rng.normal(6, 8, n).round(1)
+    actual = start + pd.to_timedelta(delay.round(), unit='min')
+    layout = rng.choice(len(DATETIME_FORMATS) + 1, n, p=[0.7, 0.15, 0.05, 0.1])
+    cancelled = rng.random(n) < 0.05
+
+    def stamp(dt, missing=None):
+        # one layout per row; the last "layout" leaves a native Excel datetime
+        out = dt.astype(object)
+        for k, fmt in enumerate(DATETIME_FORMATS):
+            out[layout == k] = dt[layout == k].dt.strftime(fmt)
+        return out if missing is None else out.where(~missing, None)
+
+    no_actual = ~cancelled & (rng.random(n) < 0.02)
+    cw_given = rng.integers(0, 4, n)
+    cw_sub = (rng.random(n) * (cw_given + 1)).astype(int)
+    flag = rng.random(n)
+    cw_sub = (pd.Series(cw_sub, dtype=object)
+              .where(flag > 0.1, np.where(cw_sub > 0, 'Yes', 'No'))
+              .where((flag <= 0.1) | (flag > 0.15), np.where(cw_sub > 0, 'True', 'False')))
+    return pd.DataFrame(dict(zip(COLUMNS, [
+        rng.integers(1, max(n // 20, 2), n),
+        pd.Series(cls).map('C{}'.format),
+        pd.Series(cls % 40).map('Teacher {}'.format),
+        np.array(EXAMS)[cls % 4],
+        8 + cls % 5,
+        stamp(start),
+        stamp(start + pd.Timedelta(hours=1)),
+        stamp(actual, no_actual),
+        stamp(actual + pd.Timedelta(minutes=55), no_actual),
+        np.where(cancelled, rng.choice(['Cancelled', 'Canceled'], n), 'Completed'),
+        rng.choice(ATTENDANCE, n),
+        rng.normal(40, 20, n).round(1),
+        delay,
+        cw_given,
+        cw_sub,
+        rng.normal(7, 4, n).round(1),
+        10,
+        2,
+        rng.integers(0, 3, n),
+        rng.normal(15, 8, n).round(1),
+        20,
+        pd.Series(rng.integers(1, 6, n)).where(rng.random(n) > 0.3),
+        pd.Series(rng.integers(1, 6, n)).where(rng.random(n) > 0.4),
+    ])))
+
+
+def write_workbook(path, n, seed=0):
+    """Write a Raw_data + Data_dictionary workbook of `n` rows to `path`."""
+    wb = Workbook(write_only=True)
+    xlsx_writer.write_frame(wb.create_sheet('Raw_data'), raw_frame(n, seed))
+    xlsx_writer.write_frame(wb.create_sheet('Data_dictionary'),
+                            pd.DataFrame({'Column': COLUMNS, 'Meaning': ['synthetic'] * len(COLUMNS)}))
+    xlsx_writer.save(wb, path)
+    return path
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        sys.exit(__doc__.split('\n\n')[1])
+    write_workbook(sys.argv[2], int(sys.argv[1]), int(sys.argv[3]) if len(sys.argv) > 3 else 0)
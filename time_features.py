@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""Calendar and punctuality features, vectorized over whole columns"""
+import numpy as np
+import pandas as pd
+
+WEEKS = ['W1', 'W2', 'W3', 'W4']
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+HOUR_BUCKETS = ['Morning', 'Afternoon', 'Evening']   # before 12, 12-17, 17 onwards
+HOUR_EDGES = [12, 17]
+PUNCTUALITY_BINS = [-9999, 5, 15, 99999]             # delay in minutes
+PUNCTUALITY = ['On Time', 'Late', 'Very Late']
+
+
+def _from_codes(codes, valid, labels, index):
+    codes = np.where(valid, codes, -1).astype(np.int8)
+    return pd.Series(pd.Categorical.from_codes(codes, labels), index=index)
+
+
+def week_of_month(dt):
+    """W1..W4 by day of month; days 29-31 fold into W4."""
+    day = dt.dt.day.to_numpy(dtype=float, na_value=np.nan)
+    valid = ~np.isnan(day)
+    return _from_codes(np.minimum((np.nan_to_num(day, nan=1) - 1) // 7, 3), valid, WEEKS, dt.index)
+
+
+def day_of_week(dt):
+    wd = dt.dt.weekday.to_numpy(dtype=float, na_value=np.nan)
+    return _from_codes(np.nan_to_num(wd, nan=0), ~np.isnan(wd), DAYS, dt.index)
+
+
+def hour_bucket(dt):
+    hour = dt.dt.hour.to_numpy(dtype=float, na_value=np.nan)
+    return _from_codes(np.searchsorted(HOUR_EDGES, hour, side='right'), ~np.isnan(hour), HOUR_BUCKETS, dt.index)
+
+
+def punctuality(delay_mins):
+    return pd.cut(delay_mins, bins=PUNCTUALITY_BINS, labels=PUNCTUALITY)
@@ -0,0 +1,553 @@
+#!/usr/bin/env python3
+"""xlsx output assembled from independently rendered parts.
+
+Package(src, skip) stands in for the write-only openpyxl workbook the export
+used to fill: create_sheet() returns Sheets taking the same calls (append,
+column/row dimensions, merged cells, styled cells, hyperlinks), but each one
+is rendered straight to worksheet XML with inline strings. Frames appended to
+a sheet are rendered in blocks of ROW_BLOCK rows at save time, on `workers`
+processes when there are several, and streamed into the zip in order.
+
+save() copies every part of `src` the kept sheets still reach (Raw_data's
+sheet XML, shared strings, theme, docProps, ...) byte for byte, so untouched
+sheets are never parsed or re-serialized. Only workbook.xml, its rels, the
+content types and styles.xml are rewritten; styles the new sheets need are
+matched against the source's by content and appended only when missing, so
+source cells keep their style indices and repeated exports don't pile up
+duplicates.
+"""
+import os, posixpath, re, shutil, tempfile, zipfile
+import datetime as _dt
+import decimal
+import xml.etree.ElementTree as ET
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+from types import SimpleNamespace
+from xml.sax.saxutils import escape, quoteattr, unescape
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell.cell import Cell, ILLEGAL_CHARACTERS_RE
+from openpyxl.styles import numbers
+from openpyxl.styles.cell_style import CellStyle
+from openpyxl.styles.numbers import BUILTIN_FORMATS_MAX_SIZE
+from openpyxl.styles.stylesheet import write_stylesheet
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.xml.functions import tostring
+import instrument
+
+ROW_BLOCK = 20_000   # rows rendered per task
+COMPRESSLEVEL = 6    # zlib level for every part written
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_RELS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+NS_TYPES = 'http://schemas.openxmlformats.org/package/2006/content-types'
+REL_DOC = NS_R + '/officeDocument'
+REL_SHEET = NS_R + '/worksheet'
+REL_STYLES = NS_R + '/styles'
+REL_CALC_CHAIN = NS_R + '/calcChain'
+REL_HYPERLINK = NS_R + '/hyperlink'
+CT = 'application/vnd.openxmlformats-officedocument.spreadsheetml.'
+CT_SHEET, CT_WORKBOOK, CT_STYLES = CT + 'worksheet+xml', CT + 'sheet.main+xml', CT + 'styles+xml'
+XML_DECL = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+# the formats openpyxl gives date/time cells, so output matches what it used to write
+DATE_FORMATS = {'datetime': numbers.FORMAT_DATE_DATETIME, 'date': numbers.FORMAT_DATE_YYYYMMDD2,
+                'time': numbers.FORMAT_DATE_TIME6, 'timedelta': numbers.FORMAT_DATE_TIMEDELTA}
+EPOCH = _dt.datetime(1899, 12, 30)
+EPOCH64 = np.datetime64('1899-12-30', 'ns')
+NS_PER_DAY = 86_400 * 10**9
+
+
+# ------------------------------------------------------------------ cells
+
+def _text(s):
+    s = ILLEGAL_CHARACTERS_RE.sub('', s)
+    space = ' xml:space="preserve"' if s != s.strip() else ''
+    return f' t="inlineStr"><is><t{space}>{escape(s)}</t></is></c>'
+
+
+def _scalar(v):
+    """(tail of the <c> element after its r/s attributes, date format kind or None); None for an empty cell."""
+    if v is None or v is pd.NA or v is pd.NaT:
+        return None
+    if isinstance(v, (bool, np.bool_)):
+        return f' t="b"><v>{int(v)}</v></c>', None
+    if isinstance(v, (int, np.integer)):
+        return f'><v>{int(v)}</v></c>', None
+    if isinstance(v, (float, np.floating, decimal.Decimal)):
+        v = float(v)
+        return (f'><v>{v!r}</v></c>', None) if np.isfinite(v) else None
+    if isinstance(v, _dt.datetime):
+        v = v.replace(tzinfo=None) - EPOCH
+        return f'><v>{v.days + v.seconds / 86400 + v.microseconds / 864e8!r}</v></c>', 'datetime'
+    if isinstance(v, _dt.date):
+        return f'><v>{(v - EPOCH.date()).days}</v></c>', 'date'
+    if isinstance(v, _dt.time):
+        return f'><v>{(v.hour * 3600 + v.minute * 60 + v.second + v.microsecond / 1e6) / 86400!r}</v></c>', 'time'
+    if isinstance(v, _dt.timedelta):
+        return f'><v>{v.days + v.seconds / 86400 + v.microseconds / 864e8!r}</v></c>', 'timedelta'
+    return _text(v if isinstance(v, str) else str(v)), None
+
+
+def _tail(v, date_styles, xf=0):
+    x = _scalar(v)
+    if x is None:
+        return None
+    tail, kind = x
+    xf = xf or (date_styles[kind] if kind else 0)
+    return f' s="{xf}"{tail}' if xf else tail
+
+
+def _numbers(vals, mask=None, xf=0):
+    style = f' s="{xf}"' if xf else ''
+    out = np.array([f'{style}><v>{v!r}</v></c>' for v in vals.tolist()], dtype=object)
+    if mask is not None:
+        out[mask] = None
+    return out
+
+
+def column_tails(s, date_styles):
+    """Cell element tails for one column in bulk (None for empty cells).
+
+    Numbers, datetimes and timedeltas are formatted vectorised per column,
+    categoricals once per category and other columns once per distinct value."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = column_tails(pd.Series(s.cat.categories), date_styles)
+        return np.append(cats, None)[s.cat.codes.to_numpy()]
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        s = s.dt.tz_localize(None)
+    if s.dtype.kind == 'M':
+        mask = s.isna().to_numpy()
+        ns = (s.to_numpy('datetime64[ns]') - EPOCH64).astype('int64')
+        if not mask.all() and (ns[~mask] % NS_PER_DAY == 0).all():   # date-only columns are written as dates
+            return _numbers(ns // NS_PER_DAY, mask, date_styles['date'])
+        return _numbers(ns / NS_PER_DAY, mask, date_styles['datetime'])
+    if s.dtype.kind == 'm':
+        mask = s.isna().to_numpy()
+        return _numbers(s.to_numpy('timedelta64[ns]').astype('int64') / NS_PER_DAY, mask, date_styles['timedelta'])
+    if s.dtype.kind == 'b':
+        return np.where(s.to_numpy(), ' t="b"><v>1</v></c>', ' t="b"><v>0</v></c>').astype(object)
+    if s.dtype.kind in 'iu':
+        return _numbers(s.to_numpy())
+    if s.dtype.kind == 'f':
+        vals = s.to_numpy()
+        return _numbers(vals, ~np.isfinite(vals))
+    try:
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+    except TypeError:   # unhashable values
+        return np.array([_tail(v, date_styles) for v in s.tolist()], dtype=object)
+    tails = [_tail(v, date_styles) for v in np.asarray(uniques, dtype=object).tolist()]
+    return np.array(tails + [None], dtype=object)[codes]
+
+
+def render_rows(frame, first_row, date_styles):
+    """<row> elements for `frame`'s rows, numbered from `first_row`, as UTF-8 bytes."""
+    letters = [get_column_letter(i + 1) for i in range(frame.shape[1])]
+    cols = [column_tails(frame.iloc[:, i], date_styles) for i in range(frame.shape[1])]
+    out = []
+    for r, tails in zip(range(first_row, first_row + len(frame)), zip(*cols)):
+        out.append(f'<row r="{r}">' + ''.join([f'<c r="{c}{r}"{t}' for c, t in zip(letters, tails)
+                                               if t is not None]) + '</row>')
+    return ''.join(out).encode('utf-8')
+
+
+def _render_block(task):
+    return render_rows(*task)
+
+
+def _rendered(tasks, workers):
+    """render_rows over `tasks` in order, on up to `workers` processes, at most 2 blocks per worker in flight."""
+    if workers <= 1 or len(tasks) < 2:
+        yield from map(_render_block, tasks)
+        return
+    with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+        todo, pending = iter(tasks), deque()
+        for task in todo:
+            pending.append(pool.submit(_render_block, task))
+            if len(pending) == 2 * workers:
+                break
+        while pending:
+            done = pending.popleft().result()
+            task = next(todo, None)
+            if task is not None:
+                pending.append(pool.submit(_render_block, task))
+            yield done
+
+
+# ------------------------------------------------------------------ sheets
+
+class _Dim:
+    width = height = None
+
+
+class Sheet:
+    """One output worksheet; takes the calls made on a write-only openpyxl sheet.
+
+    Rows given to append() are rendered at once (they are the small, styled
+    ones); frames given to append_frame() are rendered at save time, or at
+    once into a temp file when `defer` is off (parts streamed from disk)."""
+
+    def __init__(self, package, title):
+        self.package, self.title = package, title
+        self.parent = package.styles   # styled cells register their styles through ws.parent
+        self.column_dimensions, self.row_dimensions = defaultdict(_Dim), defaultdict(_Dim)
+        self.merged_cells, self.hyperlinks = set(), []
+        self.rows = self.cols = 0
+        self.segments = []   # lists of row XML, render_rows() argument tuples, or temp files of rendered rows
+
+    def append(self, row):
+        self.rows += 1
+        r, cells = self.rows, []
+        for i, v in enumerate(row):
+            xf = 0
+            if isinstance(v, Cell):
+                if v.hyperlink is not None:
+                    self.hyperlinks.append((f'{get_column_letter(i + 1)}{r}', v.hyperlink.target))
+                xf = self.package.xf(v.style_id) if v.has_style else 0
+                v = v.value
+            tail = _tail(v, self.package.date_styles, xf)
+            if tail is not None:
+                cells.append(f'<c r="{get_column_letter(i + 1)}{r}"{tail}')
+        self.cols = max(self.cols, len(row))
+        h = self.row_dimensions[r].height if r in self.row_dimensions else None
+        ht = f' ht="{h}" customHeight="1"' if h else ''
+        xml = f'<row r="{r}"{ht}>{"".join(cells)}</row>'
+        if self.segments and isinstance(self.segments[-1], list):
+            self.segments[-1].append(xml)
+        else:
+            self.segments.append([xml])
+
+    def append_frame(self, frame, defer=True):
+        """Append `frame`'s rows as data rows (no header)."""
+        first = self.rows + 1
+        self.rows += len(frame)
+        self.cols = max(self.cols, frame.shape[1])
+        blocks = [(frame.iloc[s:s + ROW_BLOCK], first + s, self.package.date_styles)
+                  for s in range(0, len(frame), ROW_BLOCK)]
+        if defer:
+            self.segments.extend(blocks)
+            return
+        if not (self.segments and hasattr(self.segments[-1], 'write')):
+            self.segments.append(tempfile.TemporaryFile())
+        for block in blocks:
+            self.segments[-1].write(_render_block(block))
+
+    def blocks(self):
+        return [seg for seg in self.segments if isinstance(seg, tuple)]
+
+    def write(self, f, rendered):
+        """Write the worksheet part to the binary stream `f`, taking deferred blocks from `rendered`."""
+        ref = f'A1:{get_column_letter(self.cols)}{self.rows}' if self.rows and self.cols else 'A1'
+        widths = sorted((column_index_from_string(k), d.width) for k, d in self.column_dimensions.items() if d.width)
+        cols = ''.join(f'<col min="{i}" max="{i}" width="{w}" customWidth="1"/>' for i, w in widths)
+        f.write((f'{XML_DECL}<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_R}"><dimension ref="{ref}"/>'
+                 + (f'<cols>{cols}</cols>' if cols else '') + '<sheetData>').encode())
+        for seg in self.segments:
+            if isinstance(seg, list):
+                f.write(''.join(seg).encode('utf-8'))
+            elif isinstance(seg, tuple):
+                f.write(next(rendered))
+            else:
+                seg.seek(0)
+                shutil.copyfileobj(seg, f, 1 << 20)
+                seg.close()
+        tail = '</sheetData>'
+        if self.merged_cells:
+            tail += (f'<mergeCells count="{len(self.merged_cells)}">'
+                     + ''.join(f'<mergeCell ref="{m}"/>' for m in sorted(self.merged_cells)) + '</mergeCells>')
+        if self.hyperlinks:
+            tail += ('<hyperlinks>' + ''.join(f'<hyperlink ref="{ref}" r:id="rId{i}"/>'
+                                              for i, (ref, _) in enumerate(self.hyperlinks, 1)) + '</hyperlinks>')
+        f.write((tail + '</worksheet>').encode())
+
+    def rels(self):
+        return _rels_xml([(f'rId{i}', REL_HYPERLINK, target, 'External')
+                          for i, (_, target) in enumerate(self.hyperlinks, 1)])
+
+
+# ------------------------------------------------------------------ package parts
+
+def _attrs(tag):
+    return {k: unescape(v, {'&quot;': '"'}) for k, v in re.findall(r'([\w:]+)="([^"]*)"', tag)}
+
+
+def _rels_path(part):
+    d, name = posixpath.split(part)
+    return f'{d}/_rels/{name}.rels' if d else f'_rels/{name}.rels'
+
+
+def _resolve(part, target):
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+
+def _read_rels(z, part):
+    """[(Id, Type, Target, TargetMode)] of `part`'s relationships, [] if it has none."""
+    try:
+        root = ET.fromstring(z.read(_rels_path(part)))
+    except KeyError:
+        return []
+    return [(r.get('Id'), r.get('Type'), r.get('Target'), r.get('TargetMode'))
+            for r in root.iter(f'{{{NS_RELS}}}Relationship')]
+
+
+def _rels_xml(rels):
+    return (f'{XML_DECL}<Relationships xmlns="{NS_RELS}">'
+            + ''.join(f'<Relationship Id={quoteattr(i)} Type={quoteattr(t)} Target={quoteattr(target)}'
+                      + (f' TargetMode={quoteattr(mode)}' if mode else '') + '/>'
+                      for i, t, target, mode in rels) + '</Relationships>')
+
+
+# styles.xml containers in schema order, with their child element
+STYLE_CONTAINERS = {'numFmts': 'numFmt', 'fonts': 'font', 'fills': 'fill', 'borders': 'border',
+                    'cellStyleXfs': 'xf', 'cellXfs': 'xf'}
+
+
+def _container(xml, p, tag):
+    """Match of the <tag> container element in `xml` (prefix `p`), or None."""
+    return re.search(rf'<{p}{tag}\b([^>]*?)(?:/>|>(.*?)</{p}{tag}>)', xml, re.S)
+
+
+def _children(xml, p, tag):
+    """The child elements of `xml`'s <tag> container, as text."""
+    m = _container(xml, p, tag)
+    child = STYLE_CONTAINERS[tag]
+    return re.findall(rf'<{p}{child}\b(?:[^>]*?/>|.*?</{p}{child}>)', m.group(2) or '', re.S) if m else []
+
+
+def _extend(xml, p, tag, items):
+    """`xml` with `items` appended to its <tag> container, created in schema order if missing."""
+    if not items:
+        return xml
+    m = _container(xml, p, tag)
+    if m is None:
+        order = list(STYLE_CONTAINERS)
+        later = [_container(xml, p, t) for t in order[order.index(tag) + 1:]]
+        at = min([c.start() for c in later if c] or [xml.rindex(f'</{p}styleSheet>')])
+        return f'{xml[:at]}<{p}{tag} count="{len(items)}">{"".join(items)}</{p}{tag}>{xml[at:]}'
+    body = m.group(2) or ''
+    n = len(_children(xml, p, tag)) + len(items)
+    attrs = re.sub(r'\s*count="\d*"', '', m.group(1))
+    return f'{xml[:m.start()]}<{p}{tag} count="{n}"{attrs}>{body}{"".join(items)}</{p}{tag}>{xml[m.end():]}'
+
+
+class Package:
+    """The workbook being written: the kept sheets of `src` plus the sheets created here.
+
+    `skip` holds sheet names or fnmatch patterns (e.g. 'CLEANED_DATA*') of
+    source sheets to leave out. New sheets follow the kept ones; with
+    `replace`, one named like a skipped sheet takes its place instead."""
+
+    def __init__(self, src=None, skip=(), workers=1, replace=False):
+        self.src = src if src and os.path.exists(src) else None
+        self.replace = replace
+        self.workers = workers
+        self.styles = Workbook(write_only=True)   # openpyxl's style registry; never saved itself
+        self.sheets, self.kept, self.src_sheets = [], [], []
+        self.wb_part, self.styles_part, self.src_styles = 'xl/workbook.xml', None, None
+        if self.src:
+            with zipfile.ZipFile(self.src) as z:
+                self.wb_part = next(_resolve('', t) for _, typ, t, _ in _read_rels(z, '') if typ == REL_DOC)
+                self.wb_xml = z.read(self.wb_part).decode('utf-8')
+                self.wb_rels = _read_rels(z, self.wb_part)
+                targets = {i: _resolve(self.wb_part, t) for i, _, t, _ in self.wb_rels}
+                self.styles_part = next((targets[i] for i, typ, _, _ in self.wb_rels if typ == REL_STYLES), None)
+                if self.styles_part:
+                    self.src_styles = z.read(self.styles_part).decode('utf-8')
+            for tag in re.findall(r'<(?:\w+:)?sheet\b[^>]*?(?:/>|>\s*</(?:\w+:)?sheet>)', self.wb_xml):
+                a = _attrs(tag)
+                rid = next(v for k, v in a.items() if k.endswith(':id') and not k.startswith('xmlns'))
+                sheet = SimpleNamespace(name=a['name'], tag=tag, rid=rid, sheet_id=int(a['sheetId']),
+                                        part=targets.get(rid))
+                self.src_sheets.append(sheet)
+                if not any(fnmatch(sheet.name, pat) for pat in skip):
+                    self.kept.append(sheet)
+        # a workbook without styles gets openpyxl's defaults to build on
+        self.base_styles = self.src_styles or XML_DECL + tostring(write_stylesheet(Workbook(write_only=True))).decode()
+        self.prefix = re.match(r'(?:<\?.*?\?>)?\s*<(\w+:)?styleSheet\b', self.base_styles, re.S).group(1) or ''
+        self.style_items = {tag: {item: i for i, item in enumerate(_children(self.base_styles, self.prefix, tag))}
+                            for tag in ('fonts', 'fills', 'borders', 'cellXfs')}
+        self.num_fmts = {unescape(a['formatCode'], {'&quot;': '"'}): int(a['numFmtId'])
+                         for a in map(_attrs, _children(self.base_styles, self.prefix, 'numFmts'))}
+        self.added, self.xfs = defaultdict(list), {}
+        self.date_styles = {}
+        for kind, fmt in DATE_FORMATS.items():
+            c = Cell(SimpleNamespace(parent=self.styles))
+            c.number_format = fmt
+            self.date_styles[kind] = self.xf(c.style_id)
+
+    def _item(self, tag, obj):
+        """Index of `obj` (an openpyxl style object) in styles.xml container `tag`.
+
+        An identical element already there is reused, so re-exporting over
+        our own output doesn't grow the stylesheet; otherwise it is appended."""
+        item = tostring(obj.to_tree()).decode()
+        if self.prefix:
+            item = re.sub(r'<(/?)(?=[A-Za-z])', rf'<\1{self.prefix}', item)
+        items = self.style_items[tag]
+        if item not in items:
+            items[item] = len(items)
+            self.added[tag].append(item)
+        return items[item]
+
+    def _num_fmt(self, fmt_id):
+        if fmt_id < BUILTIN_FORMATS_MAX_SIZE:
+            return fmt_id
+        code = self.styles._number_formats[fmt_id - BUILTIN_FORMATS_MAX_SIZE]
+        if code not in self.num_fmts:
+            self.num_fmts[code] = max(list(self.num_fmts.values()) + [BUILTIN_FORMATS_MAX_SIZE - 1]) + 1
+            self.added['numFmts'].append(f'<{self.prefix}numFmt numFmtId="{self.num_fmts[code]}" '
+                                         f'formatCode={quoteattr(code)}/>')
+        return self.num_fmts[code]
+
+    def xf(self, style_id):
+        """Cell format index in the saved styles.xml of an openpyxl style id (0 = default)."""
+        if not style_id:
+            return 0
+        if style_id not in self.xfs:
+            wb, style = self.styles, self.styles._cell_styles[style_id]
+            xf = CellStyle.from_array(style)
+            xf.fontId = self._item('fonts', wb._fonts[style.fontId])
+            xf.fillId = self._item('fills', wb._fills[style.fillId])
+            xf.borderId = self._item('borders', wb._borders[style.borderId])
+            xf.numFmtId, xf.xfId = self._num_fmt(style.numFmtId), 0
+            if style.alignmentId:
+                xf.alignment = wb._alignments[style.alignmentId]
+            if style.protectionId:
+                xf.protection = wb._protections[style.protectionId]
+            self.xfs[style_id] = self._item('cellXfs', xf)
+        return self.xfs[style_id]
+
+    def _styles_xml(self):
+        xml = self.base_styles
+        for tag in ('numFmts', 'fonts', 'fills', 'borders', 'cellXfs'):
+            xml = _extend(xml, self.prefix, tag, self.added[tag])
+        return xml
+
+    def _order(self):
+        # the final sheet order, as kept source sheets and new Sheets
+        new = {ws.title: ws for ws in self.sheets} if self.replace else {}
+        out = [s if s in self.kept else new.pop(s.name) for s in self.src_sheets if s in self.kept or s.name in new]
+        return out + [ws for ws in self.sheets if ws.title in new or not self.replace]
+
+    @property
+    def sheetnames(self):
+        return [s.title if isinstance(s, Sheet) else s.name for s in self._order()]
+
+    def create_sheet(self, title):
+        ws = Sheet(self, title)
+        self.sheets.append(ws)
+        return ws
+
+    def save(self, path):
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED, compresslevel=COMPRESSLEVEL) as out:
+            if self.src:
+                with zipfile.ZipFile(self.src) as z:
+                    self._write(out, z)
+            else:
+                self._write(out, None)
+
+    def _write(self, out, z):
+        dropped = {s.rid for s in self.src_sheets} - {s.rid for s in self.kept}
+        rels = [r for r in (self.wb_rels if z else [])
+                if r[0] not in dropped and r[1] != REL_CALC_CHAIN]
+        # every source part still reachable from the package root without going through a dropped sheet
+        copied, stack = set(), [_resolve('', t) for _, _, t, mode in (_read_rels(z, '') if z else []) if mode != 'External']
+        stack += [_resolve(self.wb_part, t) for _, _, t, mode in rels if mode != 'External']
+        names = set(z.namelist()) if z else set()
+        while stack:
+            part = stack.pop()
+            if part in copied or part not in names or part in (self.wb_part, self.styles_part):
+                continue
+            copied.add(part)
+            if _rels_path(part) in names:
+                copied.add(_rels_path(part))
+                stack += [_resolve(part, t) for _, _, t, mode in _read_rels(z, part) if mode != 'External']
+        if z:
+            copied.add('_rels/.rels')
+
+        taken, parts, n = copied | {self.wb_part, self.styles_part}, [], 0
+        for _ in self.sheets:
+            n += 1
+            while f'xl/worksheets/sheet{n}.xml' in taken:
+                n += 1
+            parts.append(f'xl/worksheets/sheet{n}.xml')
+        used = [int(i[3:]) for i, *_ in rels if re.fullmatch(r'rId\d+', i)]
+        rid = max(used + [0])
+        new_rels = [(f'rId{rid + i}', REL_SHEET, '/' + part, None) for i, part in enumerate(parts, 1)]
+        styles_part = self.styles_part or 'xl/styles.xml'
+        if not any(t == REL_STYLES for _, t, _, _ in rels):
+            new_rels.append((f'rId{rid + len(parts) + 1}', REL_STYLES, '/' + styles_part, None))
+
+        out.writestr('[Content_Types].xml', self._content_types(z, copied, parts, styles_part))
+        with instrument.span('copy', rows=len(copied)):
+            for part in sorted(copied):
+                info = z.getinfo(part)
+                with z.open(info) as src, out.open(part, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as dst:
+                    shutil.copyfileobj(src, dst, 1 << 20)
+        if not z:
+            out.writestr('_rels/.rels', _rels_xml([('rId1', REL_DOC, '/' + self.wb_part, None)]))
+        out.writestr(self.wb_part, self._workbook_xml(new_rels))
+        out.writestr(_rels_path(self.wb_part), _rels_xml(rels + new_rels))
+        out.writestr(styles_part, self._styles_xml())
+
+        rendered = _rendered([b for ws in self.sheets for b in ws.blocks()], self.workers)
+        for ws, part in zip(self.sheets, parts):
+            with instrument.span(ws.title, rows=ws.rows):
+                big = ws.rows * max(ws.cols, 1) * 64 > zipfile.ZIP64_LIMIT
+                with out.open(part, 'w', force_zip64=big) as f:
+                    ws.write(f, rendered)
+                if ws.hyperlinks:
+                    out.writestr(_rels_path(part), ws.rels())
+
+    def _content_types(self, z, copied, parts, styles_part):
+        defaults = {'rels': 'application/vnd.openxmlformats-package.relationships+xml', 'xml': 'application/xml'}
+        src = {}
+        if z:
+            root = ET.fromstring(z.read('[Content_Types].xml'))
+            defaults.update((d.get('Extension'), d.get('ContentType')) for d in root.iter(f'{{{NS_TYPES}}}Default'))
+            src = {o.get('PartName').lstrip('/'): o.get('ContentType') for o in root.iter(f'{{{NS_TYPES}}}Override')}
+        overrides = {part: t for part, t in src.items() if part in copied}
+        overrides[self.wb_part] = src.get(self.wb_part, CT_WORKBOOK)   # keeps .xlsm's macro-enabled type
+        overrides[styles_part] = CT_STYLES
+        overrides.update((part, CT_SHEET) for part in parts)
+        return (f'{XML_DECL}<Types xmlns="{NS_TYPES}">'
+                + ''.join(f'<Default Extension={quoteattr(e)} ContentType={quoteattr(t)}/>' for e, t in defaults.items())
+                + ''.join(f'<Override PartName={quoteattr("/" + p)} ContentType={quoteattr(t)}/>'
+                          for p, t in overrides.items()) + '</Types>')
+
+    def _workbook_xml(self, new_rels):
+        """workbook.xml listing the kept sheets then the new ones; sheet-scoped names follow their sheet."""
+        new = [f'<sheet xmlns:r="{NS_R}" name={quoteattr(ws.title)} sheetId="{{}}" r:id="{rid}"/>'
+               for ws, (rid, *_) in zip(self.sheets, new_rels)]
+        if not self.src:
+            ids = range(1, len(new) + 1)
+            return (f'{XML_DECL}<workbook xmlns="{NS_MAIN}"><bookViews><workbookView/></bookViews><sheets>'
+                    + ''.join(s.format(i) for s, i in zip(new, ids)) + '</sheets></workbook>')
+        xml = self.wb_xml
+        p = re.search(r'<(\w+:)?workbook\b', xml).group(1) or ''
+        if p:
+            new = [s.replace('<sheet ', f'<{p}sheet ', 1) for s in new]
+        first = max([s.sheet_id for s in self.src_sheets] + [0]) + 1
+        tags = {id(ws): tag.format(first + i) for i, (ws, tag) in enumerate(zip(self.sheets, new))}
+        order = self._order()
+        sheets = ''.join(tags.get(id(s)) or s.tag for s in order)
+        xml = re.sub(rf'<{p}sheets\b[^>]*?(?:/>|>.*?</{p}sheets>)',
+                     lambda m: f'<{p}sheets>{sheets}</{p}sheets>', xml, count=1, flags=re.S)
+        position = {self.src_sheets.index(s): i for i, s in enumerate(order) if s in self.kept}
+
+        def local(m):
+            a = _attrs(m.group(0)[:m.group(0).index('>')])
+            if 'localSheetId' not in a:
+                return m.group(0)
+            i = position.get(int(a['localSheetId']))
+            return '' if i is None else re.sub(r'localSheetId="\d+"', f'localSheetId="{i}"', m.group(0), count=1)
+
+        xml = re.sub(rf'<{p}definedName\b[^>]*?(?:/>|>.*?</{p}definedName>)', local, xml, flags=re.S)
+        xml = re.sub(rf'<{p}definedNames\b[^>]*>\s*</{p}definedNames>|<{p}definedNames\s*/>', '', xml)
+        xml = re.sub(r'\b(activeTab|firstSheet)="\d+"', r'\1="0"', xml)
+        return xml
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""Streaming xlsx output to openpyxl write-only sheets or xlsx_package sheets"""
+import datetime as _dt
+import decimal, os
+import numpy as np
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+import ingest
+
+EXCEL_MAX_ROWS = 1_048_576   # per sheet, header row included
+CHUNK_ROWS = 50_000          # rows converted to Python values at a time
+
+# Values openpyxl can store as-is; anything else is written as str(value)
+EXCEL_TYPES = (str, bool, int, float, decimal.Decimal,
+               _dt.datetime, _dt.date, _dt.time, _dt.timedelta)
+
+
+def _excel_value(v):
+    if isinstance(v, EXCEL_TYPES):
+        return v
+    if isinstance(v, np.generic):
+        return v.item()
+    return str(v)
+
+
+def column_values(s):
+    """Convert one column to openpyxl-ready Python values in bulk.
+
+    Nulls become None, numpy scalars become int/float, tz-aware datetimes are
+    made naive (Excel has no time zones), categoricals are converted per
+    category and only object-like columns are inspected value by value."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # convert each category once; code -1 (null) picks up the trailing None
+        cats = column_values(pd.Series(s.cat.categories))
+        return np.append(cats, None)[s.cat.codes.to_numpy()]
+    if isinstance(s.dtype, pd.DatetimeTZDtype):
+        s = s.dt.tz_localize(None)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype) and s.notna().any() and (s.dt.normalize() == s).all():
+        s = s.dt.date   # date-only columns are written as dates, not midnight datetimes
+    mask = s.isna().to_numpy()
+    vals = s.to_numpy(dtype=object)
+    if not (pd.api.types.is_numeric_dtype(s.dtype) or pd.api.types.is_bool_dtype(s.dtype)
+            or pd.api.types.is_datetime64_any_dtype(s.dtype) or pd.api.types.is_timedelta64_dtype(s.dtype)):
+        vals = np.array([_excel_value(v) for v in vals], dtype=object)
+    vals[mask] = None
+    return vals
+
+
+def iter_rows(dataframe, chunk=CHUNK_ROWS):
+    """Yield rows as tuples of Excel-ready values.
+
+    Conversion runs column by column over `chunk` rows at a time, so only one
+    chunk of Python objects is alive however long the frame is."""
+    for start in range(0, len(dataframe), chunk):
+        part = dataframe.iloc[start:start + chunk]
+        yield from zip(*[column_values(part.iloc[:, i]) for i in range(part.shape[1])])
+
+
+def styled(ws, value, fill=None, font=None, alignment=None):
+    c = WriteOnlyCell(ws, value=value)
+    if fill is not None: c.fill = fill
+    if font is not None: c.font = font
+    if alignment is not None: c.alignment = alignment
+    return c
+
+
+def _parts(data):
+    """A DataFrame as its only part, or the parts of a chunked.Spool in order."""
+    return [data] if isinstance(data, pd.DataFrame) else data
+
+
+def _header(ws, columns, hdr_fill=None, hdr_font=None):
+    ws.append([styled(ws, str(col), hdr_fill, hdr_font) for col in columns])
+
+
+def _append_rows(ws, dataframe, defer=True):
+    if hasattr(ws, 'append_frame'):   # xlsx_package.Sheet renders whole blocks of rows itself
+        ws.append_frame(dataframe, defer)
+        return
+    for row in iter_rows(dataframe):
+        ws.append(row)
+
+
+def write_frame(ws, dataframe, hdr_fill=None, hdr_font=None):
+    """Stream `dataframe` into a write-only sheet under a styled header row."""
+    _header(ws, dataframe.columns, hdr_fill, hdr_font)
+    _append_rows(ws, dataframe)
+
+
+def write_split_frame(wb, base, dataframe, hdr_fill=None, hdr_font=None, max_rows=EXCEL_MAX_ROWS - 1):
+    """Write `dataframe` (or a chunked.Spool of its parts) in full as sheet
+    `base`, or `base_1..N` if it needs more than `max_rows` data rows.
+    Returns the sheet names written."""
+    n = max(1, -(-len(dataframe) // max_rows))
+    names = [base] if n == 1 else [f'{base}_{i}' for i in range(1, n + 1)]
+    sheets, room = [], 0
+
+    def next_sheet():
+        ws = wb.create_sheet(names[len(sheets)])
+        _header(ws, dataframe.columns, hdr_fill, hdr_font)
+        sheets.append(ws)
+        return ws
+
+    for part in _parts(dataframe):
+        while len(part):
+            if room == 0:
+                ws, room = next_sheet(), max_rows
+            take, part = part.iloc[:room], part.iloc[room:]
+            # a spool's parts are rendered as they are read, not kept until save
+            _append_rows(ws, take, defer=isinstance(dataframe, pd.DataFrame))
+            room -= len(take)
+    while len(sheets) < len(names):   # no rows at all: still a sheet with the header
+        next_sheet()
+    return names
+
+
+def _arrow_schema(dataframe, mixed):
+    import pyarrow as pa
+    # typed from the whole column, so an all-null first chunk can't pin a column to null type
+    return pa.schema([pa.field(c, pa.string()) if c in mixed
+                      else pa.Schema.from_pandas(dataframe[[c]], preserve_index=False).field(0)
+                      for c in dataframe.columns])
+
+
+def _part_schema(part):
+    """Arrow schema for every part of a spool, taken from its first part:
+    integers widen to float64 and untyped (all-null) columns to strings,
+    since later parts may hold nulls or text there."""
+    import pyarrow as pa
+    fields = []
+    for f in _arrow_schema(part, ingest.mixed_columns(part)):
+        if pa.types.is_integer(f.type):
+            f = pa.field(f.name, pa.float64())
+        elif pa.types.is_null(f.type):
+            f = pa.field(f.name, pa.string())
+        fields.append(f)
+    return pa.schema(fields)
+
+
+def write_sidecar(dataframe, path, fmt='parquet', chunk=CHUNK_ROWS):
+    """Stream `dataframe` (or a chunked.Spool of its parts) to a CSV or Parquet file `chunk` rows at a time."""
+    tmp = ingest.tmp_path(path)
+    if fmt == 'csv':
+        pd.DataFrame(columns=dataframe.columns).to_csv(tmp, index=False)
+        for part in _parts(dataframe):
+            for start in range(0, len(part), chunk):
+                part.iloc[start:start + chunk].to_csv(tmp, mode='a', header=False, index=False)
+    elif fmt == 'parquet':
+        import pyarrow as pa, pyarrow.parquet as pq
+        if isinstance(dataframe, pd.DataFrame):
+            text = ingest.mixed_columns(dataframe)
+            schema = _arrow_schema(dataframe, text)
+        else:
+            schema = _part_schema(dataframe.head)
+            text = [f.name for f in schema if f.type == pa.string()]
+        as_str = {c: (lambda part, c=c: part[c].map(str, na_action='ignore')) for c in text}
+        with pq.ParquetWriter(tmp, schema) as writer:
+            for part in _parts(dataframe):
+                for start in range(0, len(part), chunk):
+                    piece = part.iloc[start:start + chunk].assign(**as_str)
+                    writer.write_table(pa.Table.from_pandas(piece, schema=schema, preserve_index=False))
+    else:
+        raise ValueError(f'Unknown sidecar format: {fmt!r}')
+    os.replace(tmp, path)
+    return path
+
+
+def write_link_sheet(ws, path, dataframe, hdr_fill=None, hdr_font=None):
+    """Small sheet pointing at a sidecar export instead of holding the rows."""
+    ws.column_dimensions['A'].width = 20
+    ws.column_dimensions['B'].width = 60
+    ws.append([styled(ws, 'Exported to', hdr_fill, hdr_font), styled(ws, 'Value', hdr_fill, hdr_font)])
+    link = styled(ws, os.path.basename(path))
+    link.hyperlink = os.path.basename(path)
+    ws.append(['File', link])
+    ws.append(['Format', os.path.splitext(path)[1].lstrip('.')])
+    ws.append(['Rows', len(dataframe)])
+    ws.append(['Columns', dataframe.shape[1]])
+    ws.append([])
+    ws.append([styled(ws, 'Column', hdr_fill, hdr_font), styled(ws, 'Type', hdr_fill, hdr_font)])
+    for col, dtype in dataframe.dtypes.items():
+        ws.append([str(col), str(dtype)])
+
+
+def save(wb, path):
+    """Save via a temp file so a failed write never truncates `path`."""
+    tmp = ingest.tmp_path(path)
+    wb.save(tmp)
+    os.replace(tmp, path)